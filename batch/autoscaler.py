@@ -0,0 +1,237 @@
+"""
+Queue-Depth Autoscaling
+This module defines an AutoscalingSupervisor that sizes the number of local
+consumer processes to the backlog of the RabbitMQ queue. A QueueProbe polls the
+queue depth with a passive 'queue_declare', and a ScalingPolicy turns the depth
+and the age of the backlog into a number of consumers between a minimum and a
+maximum, scaling up quickly during bursts and down slowly once the queue drains.
+"""
+
+import math
+import time
+
+import pika
+
+from supervisor import WorkerSupervisor
+
+
+class QueueProbe:
+    """
+    Reads the number of ready messages of a queue and the age of its backlog.
+
+    RabbitMQ does not report the age of the oldest message through AMQP, so the
+    backlog age is measured as the time since the queue was last seen empty.
+    """
+
+    def __init__(self, connection_params: pika.ConnectionParameters, queue_name: str):
+        """
+        Initialize the QueueProbe.
+
+        Args:
+            connection_params (pika.ConnectionParameters): Parameters of the RabbitMQ connection.
+            queue_name (str): Name of the queue to observe.
+        """
+        self.connection_params = connection_params
+        self.queue_name = queue_name
+        self.connection = None
+        self.channel = None
+        self._empty_at = time.time()
+
+    def _connect(self):
+        """
+        Open the probe's connection and channel if they are not open.
+        """
+        if self.connection is None or self.connection.is_closed:
+            self.connection = pika.BlockingConnection(self.connection_params)
+            self.channel = None
+        if self.channel is None or self.channel.is_closed:
+            self.channel = self.connection.channel()
+
+    def sample(self) -> tuple:
+        """
+        Read the current depth of the queue.
+
+        Returns:
+            tuple: The number of ready messages and the backlog age in seconds.
+
+        Raises:
+            pika.exceptions.AMQPError: If RabbitMQ cannot be reached.
+        """
+        self._connect()
+        try:
+            result = self.channel.queue_declare(queue=self.queue_name, passive=True)
+            depth = result.method.message_count
+        except pika.exceptions.ChannelClosedByBroker:
+            # The queue does not exist yet, no consumer has declared it
+            depth = 0
+
+        now = time.time()
+        if depth == 0:
+            self._empty_at = now
+        return depth, now - self._empty_at
+
+    def close(self):
+        """
+        Close the probe's connection.
+        """
+        if self.connection and self.connection.is_open:
+            self.connection.close()
+
+
+class ScalingPolicy:
+    """
+    Decides the number of consumer processes from the queue depth, with hysteresis.
+
+    The supervisor scales up as soon as the backlog exceeds 'messages_per_worker'
+    per consumer or grows older than 'max_backlog_age'. It scales down one
+    consumer at a time, and only after the backlog has stayed below the lower
+    threshold for 'scale_down_delay' seconds, so short lulls between bursts do
+    not stop and restart consumers.
+    """
+
+    def __init__(
+        self,
+        min_workers: int = 1,
+        max_workers: int = 4,
+        messages_per_worker: int = 5,
+        scale_down_ratio: float = 0.5,
+        max_backlog_age: float = 60.0,
+        scale_up_cooldown: float = 10.0,
+        scale_down_delay: float = 120.0,
+    ):
+        """
+        Initialize the ScalingPolicy.
+
+        Args:
+            min_workers (int): Lower bound of consumer processes. Default is 1.
+            max_workers (int): Upper bound of consumer processes. Default is 4.
+            messages_per_worker (int): Ready messages per consumer above which
+                consumers are added. Default is 5.
+            scale_down_ratio (float): Fraction of 'messages_per_worker' per consumer
+                below which consumers are removed. Default is 0.5.
+            max_backlog_age (float): Seconds a backlog may persist before a consumer
+                is added regardless of its depth. Default is 60.
+            scale_up_cooldown (float): Minimum seconds between two scale-ups. Default is 10.
+            scale_down_delay (float): Seconds the backlog must stay low before a
+                consumer is removed. Default is 120.
+        """
+        self.min_workers = min_workers
+        self.max_workers = max_workers
+        self.messages_per_worker = messages_per_worker
+        self.scale_down_ratio = scale_down_ratio
+        self.max_backlog_age = max_backlog_age
+        self.scale_up_cooldown = scale_up_cooldown
+        self.scale_down_delay = scale_down_delay
+        self._last_scale_up = float("-inf")
+        self._low_since = None
+
+    def _clamp(self, worker_count: int) -> int:
+        return max(self.min_workers, min(self.max_workers, worker_count))
+
+    def desired_workers(self, current: int, depth: int, backlog_age: float, now: float) -> int:
+        """
+        Number of consumer processes to run.
+
+        Args:
+            current (int): Number of consumer processes running.
+            depth (int): Number of ready messages in the queue.
+            backlog_age (float): Seconds since the queue was last empty.
+            now (float): The current time.
+
+        Returns:
+            int: The number of consumer processes to run.
+        """
+        scale_up_target = math.ceil(depth / self.messages_per_worker)
+        if depth > 0 and backlog_age > self.max_backlog_age:
+            scale_up_target = max(scale_up_target, current + 1)
+        scale_up_target = self._clamp(scale_up_target)
+
+        if scale_up_target > current:
+            self._low_since = None
+            if now - self._last_scale_up < self.scale_up_cooldown:
+                return current
+            self._last_scale_up = now
+            return scale_up_target
+
+        scale_down_target = self._clamp(
+            math.ceil(depth / (self.messages_per_worker * self.scale_down_ratio))
+        )
+        if scale_down_target >= current:
+            self._low_since = None
+            return current
+
+        if self._low_since is None:
+            self._low_since = now
+        if now - self._low_since < self.scale_down_delay:
+            return current
+
+        # Wait a full delay again before removing the next consumer
+        self._low_since = now
+        return current - 1
+
+
+class AutoscalingSupervisor(WorkerSupervisor):
+    """
+    WorkerSupervisor whose number of consumer processes follows the queue depth.
+    """
+
+    def __init__(
+        self,
+        worker_kwargs: dict,
+        policy: ScalingPolicy,
+        probe: QueueProbe,
+        scale_interval: float = 5.0,
+        shutdown_timeout: float = 300.0,
+        poll_interval: float = 1.0,
+    ):
+        """
+        Initialize the AutoscalingSupervisor.
+
+        Args:
+            worker_kwargs (dict): Keyword arguments passed to each RabbitMQWorker.
+            policy (ScalingPolicy): Decides the number of consumer processes.
+            probe (QueueProbe): Reads the queue depth.
+            scale_interval (float): Seconds between two queue depth readings. Default is 5.
+            shutdown_timeout (float): Seconds to wait for consumers to finish their
+                current message before they are killed. Default is 300.
+            poll_interval (float): Seconds between health checks of the consumers.
+                Default is 1.
+        """
+        super().__init__(worker_kwargs, policy.min_workers, shutdown_timeout, poll_interval)
+        self.policy = policy
+        self.probe = probe
+        self.scale_interval = scale_interval
+        self._last_scale_check = 0.0
+
+    def _poll(self):
+        """
+        Supervise the consumers and resize the pool every scale interval.
+        """
+        super()._poll()
+
+        now = time.time()
+        if now - self._last_scale_check < self.scale_interval:
+            return
+        self._last_scale_check = now
+
+        try:
+            depth, backlog_age = self.probe.sample()
+        except pika.exceptions.AMQPError as e:
+            print(f"Could not read the depth of queue {self.probe.queue_name}: {e}")
+            return
+
+        current = len(self.processes)
+        desired = self.policy.desired_workers(current, depth, backlog_age, now)
+        if desired != current:
+            print(
+                f"Scaling consumers from {current} to {desired} "
+                f"({depth} messages ready, backlog age {backlog_age:.0f}s)"
+            )
+            self.scale_to(desired)
+
+    def shutdown(self):
+        """
+        Stop all consumer processes and close the queue probe.
+        """
+        super().shutdown()
+        self.probe.close()
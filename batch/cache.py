@@ -0,0 +1,175 @@
+"""
+Result Cache for Batch Jobs
+This module defines a ResultCache that stores processed output files under a key
+derived from the uploaded file's contents, the requested output format and the
+current model/encoder artifacts. When the same spreadsheet is uploaded again and
+the models did not change, the cached output is hardlinked (or copied) into place
+instead of recomputing every prediction. The cache is bounded by a number of
+entries and a total size, evicting the least recently used outputs first.
+"""
+
+import os
+import shutil
+import hashlib
+import threading
+from typing import Optional
+
+from checkpoint import compute_file_digest
+
+
+class ResultCache:
+    """
+    Content-addressed store of processed output files with LRU eviction.
+    """
+
+    def __init__(
+        self,
+        cache_directory: str,
+        ml_data_path: str,
+        max_entries: int = 1000,
+        max_bytes: int = 1 << 30,
+    ):
+        """
+        Initialize the ResultCache.
+
+        Args:
+            cache_directory (str): Directory where the cached outputs are stored.
+            ml_data_path (str): Directory of the model and encoder artifacts; their
+                contents are part of every cache key.
+            max_entries (int): Maximum number of cached outputs. Default is 1000.
+            max_bytes (int): Maximum total size of the cached outputs. Default is 1 GiB.
+        """
+        self.cache_directory = cache_directory
+        self.ml_data_path = ml_data_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._artifact_digests = {}
+        self._lock = threading.Lock()
+        os.makedirs(cache_directory, exist_ok=True)
+
+    def model_version(self) -> Optional[str]:
+        """
+        Fingerprint of the model and encoder artifacts.
+
+        File digests are kept per (path, size, mtime), so unchanged artifacts are
+        not read again.
+
+        Returns:
+            Optional[str]: The fingerprint, or None if no artifacts are available.
+        """
+        version = hashlib.sha256()
+        found = False
+
+        for sub_directory in ("models", "encoder"):
+            directory = f"{self.ml_data_path}/{sub_directory}"
+            if not os.path.isdir(directory):
+                continue
+            for name in sorted(os.listdir(directory)):
+                # Skip artifacts the ETL is still writing under a temporary name
+                if name.startswith("."):
+                    continue
+                path = f"{directory}/{name}"
+                stat = os.stat(path)
+                signature = (path, stat.st_size, stat.st_mtime_ns)
+                with self._lock:
+                    digest = self._artifact_digests.get(signature)
+                if digest is None:
+                    digest = compute_file_digest(path)
+                    with self._lock:
+                        self._artifact_digests[signature] = digest
+                version.update(f"{sub_directory}/{name}:{digest}".encode())
+                found = True
+
+        return version.hexdigest() if found else None
+
+    def make_key(self, file_digest: str, output_format: str) -> Optional[str]:
+        """
+        Build the cache key of a job.
+
+        Args:
+            file_digest (str): SHA-256 digest of the uploaded file.
+            output_format (str): Format of the processed file.
+
+        Returns:
+            Optional[str]: The key, or None if the model version cannot be determined,
+            in which case the job must not be cached.
+        """
+        model_version = self.model_version()
+        if model_version is None:
+            print("Model artifacts not found, result cache disabled for this job")
+            return None
+        key = hashlib.sha256(f"{file_digest}:{model_version}".encode()).hexdigest()
+        return f"{key}.{output_format}"
+
+    def fetch(self, key: str, output_path: str) -> bool:
+        """
+        Place the cached output of a key at the output path.
+
+        Args:
+            key (str): The cache key.
+            output_path (str): Where the processed file is expected.
+
+        Returns:
+            bool: True on a cache hit.
+        """
+        cached_path = f"{self.cache_directory}/{key}"
+        try:
+            # Mark the entry as recently used
+            os.utime(cached_path)
+            _link_or_copy(cached_path, output_path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def store(self, key: str, output_path: str):
+        """
+        Add a processed output file to the cache and evict old entries.
+
+        Args:
+            key (str): The cache key.
+            output_path (str): The processed file.
+        """
+        _link_or_copy(output_path, f"{self.cache_directory}/{key}")
+        self._evict()
+
+    def _evict(self):
+        """
+        Remove the least recently used entries until the cache is within its bounds.
+        """
+        entries = []
+        for name in os.listdir(self.cache_directory):
+            if name.startswith("."):
+                continue
+            try:
+                stat = os.stat(f"{self.cache_directory}/{name}")
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+
+        while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+            _, size, name = entries.pop(0)
+            try:
+                os.remove(f"{self.cache_directory}/{name}")
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+            print(f"Evicted cached result {name}")
+
+
+def _link_or_copy(source: str, destination: str):
+    """
+    Atomically place a file at the destination, as a hardlink when possible.
+
+    The destination is replaced through a temporary name, so readers never see a
+    partial file and an existing hardlinked file is never modified in place.
+    """
+    directory, file_name = os.path.split(destination)
+    temporary = f"{directory}/.{file_name}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        os.link(source, temporary)
+    except OSError:
+        shutil.copy2(source, temporary)
+    os.replace(temporary, destination)
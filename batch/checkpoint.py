@@ -0,0 +1,191 @@
+"""
+Checkpoints for Batch Jobs
+This module defines a Checkpoint class that records the progress of a batch job
+in a sidecar file next to the uploaded file, so that a job interrupted by a crash
+or a redeployment resumes from the last finished chunk when the message is
+redelivered.
+
+The sidecar is an append-only JSON lines file: a header with the job key and one
+record per finished chunk with its predictions. It is deleted once the output file
+has been written. Deliveries of the same file are processed one at a time, under
+the lock of lock_file, so they never append to the same sidecar concurrently.
+"""
+
+import os
+import json
+import fcntl
+import hashlib
+from contextlib import contextmanager
+from typing import Optional
+
+import numpy as np
+
+
+def compute_file_digest(file_path: str, block_size: int = 1 << 20) -> str:
+    """
+    Compute the SHA-256 digest of a file's contents.
+
+    Args:
+        file_path (str): Path to the file.
+        block_size (int): Number of bytes read at a time. Default is 1 MiB.
+
+    Returns:
+        str: The hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@contextmanager
+def lock_file(file_path: str):
+    """
+    Hold an exclusive lock on a file, across threads and processes.
+
+    The lock is taken on the uploaded file itself, so no lock file is left behind.
+    A missing file is not locked; loading it fails later on.
+
+    Args:
+        file_path (str): Path to the file.
+    """
+    try:
+        file = open(file_path, "rb")
+    except FileNotFoundError:
+        yield
+        return
+
+    with file:
+        # Released when the file is closed
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        yield
+
+
+class Checkpoint:
+    """
+    Progress of one batch job, persisted in a sidecar file next to the upload.
+    """
+
+    def __init__(self, checkpoint_path: str, job_key: str, chunk_size: int):
+        """
+        Initialize an empty checkpoint.
+
+        Args:
+            checkpoint_path (str): Path of the sidecar file.
+            job_key (str): Idempotency key of the job (digest of the uploaded file).
+            chunk_size (int): Number of rows per chunk.
+        """
+        self.checkpoint_path = checkpoint_path
+        self.job_key = job_key
+        self.chunk_size = chunk_size
+        self.completed_chunks = {}
+
+    @classmethod
+    def load(
+        cls, file_directory: str, file_name: str, job_key: str, chunk_size: int
+    ) -> "Checkpoint":
+        """
+        Load the checkpoint of a job, or start a new one.
+
+        The previous progress is discarded when the sidecar belongs to another
+        version of the file or was written with another chunk size. Chunks with
+        rows that could not be predicted are not loaded.
+
+        Args:
+            file_directory (str): Directory where the uploaded file is located.
+            file_name (str): Name of the uploaded file.
+            job_key (str): Idempotency key of the job.
+            chunk_size (int): Number of rows per chunk.
+
+        Returns:
+            Checkpoint: The loaded or new checkpoint.
+        """
+        checkpoint = cls(
+            f"{file_directory}/.{file_name}.checkpoint", job_key, chunk_size
+        )
+        records = checkpoint._read_records()
+
+        header = records[0] if records else {}
+        if header.get("job_key") != job_key or header.get("chunk_size") != chunk_size:
+            checkpoint._start()
+            return checkpoint
+
+        for record in records[1:]:
+            if "chunk" in record:
+                predictions = np.asarray(record["predictions"], dtype="float64")
+                # Chunks with failed rows are predicted again
+                if not np.isnan(predictions).any():
+                    checkpoint.completed_chunks[record["chunk"]] = predictions
+
+        return checkpoint
+
+    def _read_records(self) -> list:
+        """
+        Read the records of the sidecar file, ignoring a partially written last line.
+
+        Returns:
+            list: The decoded records, empty if there is no sidecar file.
+        """
+        if not os.path.exists(self.checkpoint_path):
+            return []
+
+        records = []
+        with open(self.checkpoint_path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+        return records
+
+    def _append(self, record: dict, mode: str = "a"):
+        """
+        Durably append a record to the sidecar file.
+
+        Args:
+            record (dict): The record to write.
+            mode (str): File mode; 'w' starts a new sidecar file.
+        """
+        with open(self.checkpoint_path, mode, encoding="utf-8") as file:
+            file.write(json.dumps(record) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _start(self):
+        """
+        Start a new sidecar file for this job.
+        """
+        self._append({"job_key": self.job_key, "chunk_size": self.chunk_size}, mode="w")
+
+    def get_chunk(self, chunk_index: int) -> Optional[np.ndarray]:
+        """
+        Get the predictions of a finished chunk.
+
+        Args:
+            chunk_index (int): Index of the chunk.
+
+        Returns:
+            Optional[np.ndarray]: The predictions, or None if the chunk is not finished.
+        """
+        return self.completed_chunks.get(chunk_index)
+
+    def save_chunk(self, chunk_index: int, predictions: np.ndarray):
+        """
+        Record the predictions of a finished chunk, whose rows were all predicted.
+
+        Args:
+            chunk_index (int): Index of the chunk.
+            predictions (np.ndarray): The predictions of the rows of the chunk.
+        """
+        self._append({"chunk": chunk_index, "predictions": predictions.tolist()})
+        self.completed_chunks[chunk_index] = predictions
+
+    def remove(self):
+        """
+        Delete the sidecar file once the job's output has been written.
+        """
+        try:
+            os.remove(self.checkpoint_path)
+        except FileNotFoundError:
+            pass
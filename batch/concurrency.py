@@ -0,0 +1,121 @@
+"""
+Adaptive Concurrency Control
+This module defines an AdaptiveConcurrencyLimiter that sizes the number of
+in-flight requests to the ML service with AIMD (additive increase, multiplicative
+decrease): the window grows by one request per healthy window and is cut when
+the service answers 429, 502, 503 or 504, times out, or its p95 latency spikes.
+"""
+
+import time
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Thread-safe AIMD limit on the number of concurrent requests.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 1,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        latency_threshold: float = 0.5,
+        backoff_factor: float = 0.5,
+        sample_size: int = 100,
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            initial_limit (int): Starting number of concurrent requests. Default is 1.
+            min_limit (int): Lower bound of the window. Default is 1.
+            max_limit (int): Upper bound of the window. Default is 32.
+            latency_threshold (float): p95 latency in seconds above which the window
+                is cut. Default is 0.5.
+            backoff_factor (float): Factor applied to the window when it is cut.
+                Default is 0.5.
+            sample_size (int): Number of recent latencies used for the p95. Default is 100.
+        """
+        self.limit = initial_limit
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_threshold = latency_threshold
+        self.backoff_factor = backoff_factor
+        self.latencies = deque(maxlen=sample_size)
+        self.in_flight = 0
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> float:
+        """
+        Block until a request may be sent.
+
+        Returns:
+            float: The time the request was admitted, to pass back to 'release'.
+        """
+        with self._condition:
+            while self.in_flight >= self.limit:
+                self._condition.wait()
+            self.in_flight += 1
+            return time.time()
+
+    def release(self, admitted_at: float, overloaded: bool):
+        """
+        Record the outcome of a request and adjust the window.
+
+        Args:
+            admitted_at (float): The value returned by 'acquire'.
+            overloaded (bool): True if the service answered 429, 502, 503 or 504, or the
+                request timed out or could not connect.
+        """
+        latency = time.time() - admitted_at
+
+        with self._condition:
+            self.in_flight -= 1
+
+            if overloaded:
+                self._decrease(admitted_at)
+            else:
+                self.latencies.append(latency)
+                self._successes += 1
+
+                # Additive increase once per full window of healthy responses
+                if self._successes >= self.limit:
+                    self._successes = 0
+                    if self.p95_latency() > self.latency_threshold:
+                        self._decrease(admitted_at)
+                    elif self.limit < self.max_limit:
+                        self.limit += 1
+
+            self._condition.notify_all()
+
+    def _decrease(self, admitted_at: float):
+        """
+        Cut the window, at most once per round of requests.
+
+        Requests admitted before the last cut were sent with the old window and
+        do not trigger another cut.
+        """
+        if admitted_at < self._last_decrease:
+            return
+
+        self.limit = max(self.min_limit, int(self.limit * self.backoff_factor))
+        self._successes = 0
+        self.latencies.clear()
+        self._last_decrease = time.time()
+
+    def p95_latency(self) -> float:
+        """
+        The 95th percentile of the recent request latencies.
+
+        Returns:
+            float: The p95 latency in seconds, 0 if no latency was recorded yet.
+        """
+        if not self.latencies:
+            return 0.0
+        return float(np.percentile(self.latencies, 95))
@@ -0,0 +1,89 @@
+"""
+Batch Job Messages
+This module defines the Job class describing a file to process. The interface
+publishes jobs as JSON metadata (file name, size, estimated row count, requested
+output format) on a priority queue; messages that only contain a bare file name
+are still accepted.
+"""
+
+import os
+import json
+
+# Highest message priority; the queue is declared with this 'x-max-priority'
+MAX_PRIORITY = 10
+
+OUTPUT_FORMATS = ("xlsx", "csv")
+
+
+class Job:
+    """
+    A batch job read from a RabbitMQ message.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        file_size: int = 0,
+        row_estimate: int = 0,
+        output_format: str = "xlsx",
+        priority: int = 0,
+    ):
+        """
+        Initialize the Job.
+
+        Args:
+            filename (str): Name of the uploaded file.
+            file_size (int): Size of the uploaded file in bytes.
+            row_estimate (int): Estimated number of rows in the file.
+            output_format (str): Format of the processed file, 'xlsx' or 'csv'.
+            priority (int): Message priority, higher values are consumed first.
+        """
+        self.filename = filename
+        self.file_size = file_size
+        self.row_estimate = row_estimate
+        self.output_format = output_format
+        self.priority = priority
+
+    @classmethod
+    def from_message(cls, body: bytes) -> "Job":
+        """
+        Parse a job from a message body.
+
+        Args:
+            body (bytes): JSON job metadata, or a bare file name.
+
+        Returns:
+            Job: The parsed job.
+
+        Raises:
+            ValueError: If the file name is missing or the output format is unknown.
+        """
+        text = body.decode()
+        try:
+            metadata = json.loads(text)
+        except json.JSONDecodeError:
+            metadata = {"filename": text.strip()}
+        if not isinstance(metadata, dict):
+            metadata = {"filename": text.strip()}
+
+        filename = os.path.basename(metadata.get("filename") or "")
+        if not filename:
+            raise ValueError("Invalid message format: 'filename' missing")
+
+        output_format = (metadata.get("output_format") or "xlsx").lower()
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {output_format}")
+
+        return cls(
+            filename=filename,
+            file_size=int(metadata.get("file_size") or 0),
+            row_estimate=int(metadata.get("row_estimate") or 0),
+            output_format=output_format,
+            priority=int(metadata.get("priority") or 0),
+        )
+
+    def __repr__(self) -> str:
+        return (
+            f"Job(filename={self.filename!r}, rows~{self.row_estimate}, "
+            f"format={self.output_format}, priority={self.priority})"
+        )
@@ -1,12 +1,15 @@
 import os
 
-from worker import RabbitMQWorker
+import pika
+
+from autoscaler import AutoscalingSupervisor, QueueProbe, ScalingPolicy
+from supervisor import WorkerSupervisor
 
 
 def main():
     # Load environment variables for RabbitMQ
     host = os.getenv("RABBITMQ_HOST")
-    port = os.getenv("RABBITMQ_PORT")
+    port = int(os.getenv("RABBITMQ_PORT", "5672"))
     username = os.getenv("RABBITMQ_USER")
     password = os.getenv("RABBITMQ_PASSWORD")
     queue_name = os.getenv("RABBITMQ_QUEUE")
@@ -14,13 +17,89 @@ def main():
 
     # ML env variables
     ml_url = os.getenv("ML_URL")
+    inference_mode = os.getenv("INFERENCE_MODE", "http")
+    ml_data_path = os.getenv("ML_DATA_PATH", "/ml/data")
+    chunk_size = int(os.getenv("CHUNK_SIZE", "1000"))
+    ml_max_concurrency = int(os.getenv("ML_MAX_CONCURRENCY", "32"))
+    ml_latency_threshold = float(os.getenv("ML_LATENCY_THRESHOLD", "0.5"))
+    ml_timeout = float(os.getenv("ML_REQUEST_TIMEOUT", "10"))
+
+    # Result cache env variables (set RESULT_CACHE_DIR to an empty string to disable)
+    result_cache_directory = os.getenv("RESULT_CACHE_DIR", f"{file_path}/.result_cache")
+    result_cache_max_entries = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1000"))
+    result_cache_max_bytes = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(1 << 30)))
+
+    # Job status env variables
+    status_exchange = os.getenv("STATUS_EXCHANGE", "job_status")
+    progress_every_rows = int(os.getenv("PROGRESS_EVERY_ROWS", "1000"))
+    progress_every_seconds = float(os.getenv("PROGRESS_EVERY_SECONDS", "5"))
+
+    # Tracing env variables (spans are dropped when TRACE_FILE is not set)
+    trace_file = os.getenv("TRACE_FILE")
+
+    # Concurrency env variables
+    worker_count = int(os.getenv("WORKER_COUNT", os.cpu_count() or 1))
+    prefetch_count = int(os.getenv("PREFETCH_COUNT", "1"))
+    heartbeat = int(os.getenv("RABBITMQ_HEARTBEAT", "60"))
+
+    # Autoscaling env variables (WORKER_COUNT is ignored when AUTOSCALE is enabled)
+    autoscale = os.getenv("AUTOSCALE", "false").lower() in ("1", "true", "yes")
+    min_workers = int(os.getenv("MIN_WORKERS", "1"))
+    max_workers = int(os.getenv("MAX_WORKERS", os.cpu_count() or 1))
+    messages_per_worker = int(os.getenv("SCALE_MESSAGES_PER_WORKER", "5"))
+    max_backlog_age = float(os.getenv("SCALE_MAX_BACKLOG_AGE", "60"))
+    scale_up_cooldown = float(os.getenv("SCALE_UP_COOLDOWN", "10"))
+    scale_down_delay = float(os.getenv("SCALE_DOWN_DELAY", "120"))
+    scale_interval = float(os.getenv("SCALE_INTERVAL", "5"))
+
+    worker_kwargs = {
+        "queue_name": queue_name,
+        "host": host,
+        "port": port,
+        "username": username,
+        "password": password,
+        "file_path": file_path,
+        "ml_url": ml_url,
+        "prefetch_count": prefetch_count,
+        "heartbeat": heartbeat,
+        "inference_mode": inference_mode,
+        "ml_data_path": ml_data_path,
+        "chunk_size": chunk_size,
+        "ml_max_concurrency": ml_max_concurrency,
+        "ml_latency_threshold": ml_latency_threshold,
+        "ml_timeout": ml_timeout,
+        "result_cache_directory": result_cache_directory,
+        "result_cache_max_entries": result_cache_max_entries,
+        "result_cache_max_bytes": result_cache_max_bytes,
+        "status_exchange": status_exchange,
+        "progress_every_rows": progress_every_rows,
+        "progress_every_seconds": progress_every_seconds,
+        "trace_file": trace_file,
+    }
 
-    # Start the RabbitMQ worker
-    worker = RabbitMQWorker(
-        queue_name, host, port, username, password, file_path, ml_url
-    )
-    worker.connect()
-    worker.start_consuming()
+    # Start the RabbitMQ workers
+    if autoscale:
+        policy = ScalingPolicy(
+            min_workers=min_workers,
+            max_workers=max_workers,
+            messages_per_worker=messages_per_worker,
+            max_backlog_age=max_backlog_age,
+            scale_up_cooldown=scale_up_cooldown,
+            scale_down_delay=scale_down_delay,
+        )
+        probe = QueueProbe(
+            pika.ConnectionParameters(
+                host=host,
+                port=port,
+                credentials=pika.PlainCredentials(username, password),
+                heartbeat=heartbeat,
+            ),
+            queue_name,
+        )
+        supervisor = AutoscalingSupervisor(worker_kwargs, policy, probe, scale_interval)
+    else:
+        supervisor = WorkerSupervisor(worker_kwargs, worker_count)
+    supervisor.run()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,335 @@
+"""
+Predictors for the Batch Processor
+This module defines the predictors the FileProcessor uses to get price predictions
+for the rows of a file. The HttpPredictor sends each row to the ML service with an
+adaptive number of requests in flight, the EmbeddedPredictor loads the ONNX models and encoders from disk and runs the
+inference in-process, one vectorized call per model group.
+
+Predictors return a DataFrame with the PREDICTION_COLUMNS: the predicted price (NaN
+if the row could not be predicted), the reason a row failed, and whether the failure
+is temporary (the ML service was overloaded or unreachable) and worth retrying.
+"""
+
+import os
+import time
+import pickle
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from ml.inference.const import CategoricalColumns, NumericalColumns
+from ml.inference.encoding import encode_features
+from ml.inference.tracing import TraceContext
+
+from concurrency import AdaptiveConcurrencyLimiter
+
+# Statuses of an overloaded or restarting ML service; other errors are not retried
+RETRYABLE_STATUS_CODES = {429, 502, 503, 504}
+
+# Columns of the DataFrames returned by the predictors
+PREDICTION_COLUMNS = ["predicted_price", "prediction_error", "retryable"]
+
+
+class HttpPredictor:
+    """
+    Gets predictions by calling the ML service over HTTP, one request per row.
+
+    Rows are sent concurrently. The number of requests in flight is adjusted by an
+    AdaptiveConcurrencyLimiter, so the predictor runs at the highest rate the ML
+    service sustains. Rows rejected with 429, 502, 503 or 504, or whose request timed
+    out or could not connect, are retried with backoff.
+    """
+
+    def __init__(
+        self,
+        ml_url: str,
+        max_concurrency: int = 32,
+        latency_threshold: float = 0.5,
+        max_retries: int = 3,
+        timeout: float = 10.0,
+    ):
+        """
+        Initialize the HttpPredictor.
+
+        Args:
+            ml_url (str): URL of the machine learning service prediction endpoint.
+            max_concurrency (int): Upper bound of requests in flight. Default is 32.
+            latency_threshold (float): p95 latency in seconds above which fewer
+                requests are sent. Default is 0.5.
+            max_retries (int): Retries of a row answered with a retryable status, or
+                whose request timed out or could not connect. Default is 3.
+            timeout (float): Seconds to wait for the ML service to connect or
+                respond. Default is 10.
+        """
+        self.ml_url = ml_url
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.limiter = AdaptiveConcurrencyLimiter(
+            max_limit=max_concurrency, latency_threshold=latency_threshold
+        )
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="ml-client"
+        )
+        self.session = requests.Session()
+        self.session.mount(
+            "http://", HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        )
+        # Let the ML service schedule these requests behind real-time traffic
+        self.session.headers["X-Traffic-Class"] = "batch"
+
+    def _predict_row(self, index, row: dict, headers: Optional[dict] = None) -> tuple:
+        """
+        Send one row to the ML service, retrying while the service is overloaded or
+        unreachable.
+
+        Args:
+            index: Index of the row, used in log messages.
+            row (dict): The feature values of the row.
+            headers (Optional[dict]): Additional request headers, e.g. 'traceparent'.
+
+        Returns:
+            tuple: The predicted price (NaN if the row could not be predicted), the
+            error (None on success) and whether the error is temporary.
+        """
+        for attempt in range(self.max_retries + 1):
+            admitted_at = self.limiter.acquire()
+            try:
+                response = self.session.post(
+                    self.ml_url, json=row, headers=headers, timeout=self.timeout
+                )
+            except (requests.Timeout, requests.ConnectionError) as e:
+                self.limiter.release(admitted_at, overloaded=True)
+                if attempt == self.max_retries:
+                    print(f"Request error for row {index}: {e}")
+                    return np.nan, f"Request error: {e}", True
+                time.sleep(0.1 * 2**attempt)
+                continue
+            except requests.RequestException as e:
+                self.limiter.release(admitted_at, overloaded=False)
+                print(f"Request error for row {index}: {e}")
+                return np.nan, f"Request error: {e}", False
+
+            overloaded = response.status_code in RETRYABLE_STATUS_CODES
+            self.limiter.release(admitted_at, overloaded=overloaded)
+
+            if response.status_code == 200:
+                return response.json().get("predicted_price", np.nan), None, False
+            if not overloaded or attempt == self.max_retries:
+                print(f"Error for row {index}: {response.status_code} - {response.text}")
+                return np.nan, f"HTTP {response.status_code}: {response.text}", overloaded
+
+            time.sleep(0.1 * 2**attempt)
+
+        return np.nan, "No attempts made", True
+
+    def predict(
+        self,
+        data_frame: pd.DataFrame,
+        trace: Optional[TraceContext] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> pd.Series:
+        """
+        Predict the price of every row in the DataFrame.
+
+        Args:
+            data_frame (pd.DataFrame): The rows to predict.
+            trace (Optional[TraceContext]): Trace context sent to the ML service in
+                the 'traceparent' header. Default is None.
+            on_progress (Optional[Callable[[int, int], None]]): Called on the calling
+                thread with the number of rows predicted so far and the number of
+                them that failed, after every row. Default is None.
+
+        Returns:
+            pd.DataFrame: The PREDICTION_COLUMNS, aligned with the DataFrame index.
+        """
+        rows = data_frame.to_dict("records")
+        headers = {"traceparent": trace.traceparent()} if trace else None
+        results, errors = [], 0
+        for result in self.executor.map(
+            self._predict_row, data_frame.index, rows, [headers] * len(rows)
+        ):
+            results.append(result)
+            errors += result[1] is not None
+            if on_progress:
+                on_progress(len(results), errors)
+        print(
+            f"ML client window: {self.limiter.limit} requests in flight, "
+            f"p95 latency {self.limiter.p95_latency() * 1000:.1f} ms"
+        )
+
+        predictions = pd.DataFrame(results, index=data_frame.index, columns=PREDICTION_COLUMNS)
+        return predictions.astype({"predicted_price": "float64", "retryable": bool})
+
+
+class EmbeddedPredictor:
+    """
+    Gets predictions by running the ONNX models in-process with onnxruntime.
+
+    Models and encoders are loaded from the ML data directory the first time a
+    model group is seen, and reloaded when the ETL replaces their files.
+    """
+
+    def __init__(self, ml_data_path: str):
+        """
+        Initialize the EmbeddedPredictor.
+
+        Args:
+            ml_data_path (str): Directory containing the 'models' and 'encoder' artifacts.
+        """
+        import onnxruntime
+
+        self.onnxruntime = onnxruntime
+        self.ml_data_path = ml_data_path
+        self.categorical_columns = CategoricalColumns().to_list()
+        self.numerical_columns = NumericalColumns().to_list()
+        self._artifacts = {}  # model group -> (file signatures, session, encoder)
+        self._lock = threading.Lock()
+
+    def _load_artifacts(self, model_group: str) -> tuple:
+        """
+        Load the ONNX session and the encoder for a model group.
+
+        The files are stat'ed on every call and reloaded when one of them was
+        replaced, so that the predictions match the model version the result cache
+        keys them with.
+
+        Args:
+            model_group (str): The model group to load.
+
+        Returns:
+            tuple: The onnxruntime InferenceSession and the OrdinalEncoder.
+        """
+        model_path = f"{self.ml_data_path}/models/model_{model_group}.onnx"
+        encoder_path = f"{self.ml_data_path}/encoder/ordinal_encoder_{model_group}.pkl"
+
+        with self._lock:
+            signatures = tuple(
+                (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+                for stat in (os.stat(model_path), os.stat(encoder_path))
+            )
+            loaded = self._artifacts.get(model_group)
+            if loaded is None or loaded[0] != signatures:
+                session = self.onnxruntime.InferenceSession(
+                    model_path, providers=["CPUExecutionProvider"]
+                )
+                with open(encoder_path, "rb") as encoder_file:
+                    encoder = pickle.load(encoder_file)
+
+                action = "Loaded" if loaded is None else "Reloaded"
+                self._artifacts[model_group] = (signatures, session, encoder)
+                print(f"{action} embedded model and encoder for model group {model_group}")
+
+            return self._artifacts[model_group][1:]
+
+    def _unknown_categories(self, data_frame: pd.DataFrame, encoder) -> pd.Series:
+        """
+        Find the rows with categories the encoder was not fitted on.
+
+        Args:
+            data_frame (pd.DataFrame): The rows of one model group.
+            encoder (OrdinalEncoder): The encoder of the model group.
+
+        Returns:
+            pd.Series: The error of every row, None for rows that can be encoded.
+        """
+        errors = pd.Series(None, index=data_frame.index, dtype="object")
+        for column, categories in zip(self.categorical_columns, encoder.categories_):
+            unknown = ~data_frame[column].isin(categories)
+            for index in data_frame.index[unknown & errors.isna()]:
+                errors[index] = (
+                    f"Unknown category {data_frame.at[index, column]!r} in column {column}"
+                )
+        return errors
+
+    def predict(
+        self,
+        data_frame: pd.DataFrame,
+        trace: Optional[TraceContext] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> pd.DataFrame:
+        """
+        Predict the price of every row in the DataFrame.
+
+        Rows with categories unknown to their encoder are left out of the model
+        input and reported as failed.
+
+        Args:
+            data_frame (pd.DataFrame): The rows to predict.
+            trace (Optional[TraceContext]): Unused; inference runs in-process and is
+                covered by the caller's span.
+            on_progress (Optional[Callable[[int, int], None]]): Called with the number
+                of rows predicted so far and the number of them that failed, after
+                every model group. Default is None.
+
+        Returns:
+            pd.DataFrame: The PREDICTION_COLUMNS, aligned with the DataFrame index.
+        """
+        predictions = pd.DataFrame(
+            {"predicted_price": np.nan, "prediction_error": None, "retryable": False},
+            index=data_frame.index,
+            columns=PREDICTION_COLUMNS,
+        )
+        rows_done, errors = 0, 0
+
+        for model_group, group_df in data_frame.groupby(
+            "model_group", sort=False, observed=True
+        ):
+            try:
+                session, encoder = self._load_artifacts(model_group)
+                row_errors = self._unknown_categories(group_df, encoder)
+                predictions.loc[group_df.index, "prediction_error"] = row_errors
+                known_df = group_df[row_errors.isna()]
+                if len(known_df):
+                    input_data = encode_features(
+                        known_df, encoder, self.categorical_columns, self.numerical_columns
+                    )
+                    output = session.run(None, {"float_input": input_data})[0]
+                    predictions.loc[known_df.index, "predicted_price"] = output.reshape(-1)
+            except Exception as e:
+                print(f"Inference error for model group {model_group}: {e}")
+                predictions.loc[group_df.index, "prediction_error"] = f"Inference error: {e}"
+
+            rows_done += len(group_df)
+            errors += int(predictions.loc[group_df.index, "prediction_error"].notna().sum())
+            if on_progress:
+                on_progress(rows_done, errors)
+
+        return predictions
+
+
+def create_predictor(
+    inference_mode: str,
+    ml_url: str,
+    ml_data_path: str,
+    max_concurrency: int = 32,
+    latency_threshold: float = 0.5,
+    timeout: float = 10.0,
+):
+    """
+    Create the predictor for the configured inference mode.
+
+    Args:
+        inference_mode (str): Either 'http' (call the ML service) or 'embedded'
+            (run the models in-process).
+        ml_url (str): URL of the machine learning service, used in 'http' mode.
+        ml_data_path (str): Directory of the ML artifacts, used in 'embedded' mode.
+        max_concurrency (int): Upper bound of requests in flight in 'http' mode.
+        latency_threshold (float): p95 latency target in seconds in 'http' mode.
+        timeout (float): Timeout of a request to the ML service in 'http' mode.
+
+    Returns:
+        HttpPredictor | EmbeddedPredictor: The predictor.
+
+    Raises:
+        ValueError: If the inference mode is unknown.
+    """
+    if inference_mode == "http":
+        return HttpPredictor(ml_url, max_concurrency, latency_threshold, timeout=timeout)
+    if inference_mode == "embedded":
+        return EmbeddedPredictor(ml_data_path)
+    raise ValueError(f"Unknown inference mode: {inference_mode}")
@@ -1,78 +1,435 @@
 """
 File Processor Module
 This module defines a FileProcessor class that handles the processing of files.
-It includes methods for loading files, sending data to a machine learning service,
-and saving the processed files.
+It includes methods for loading files, getting predictions from a predictor
+(the machine learning service or the embedded models), and saving the processed files.
+Rows with identical features are predicted only once, and the predictions are made in
+chunks whose progress is checkpointed next to the file and reported as job events.
+Deliveries of the same file are processed one at a time. Chunks with rows that
+could not be predicted are not checkpointed, and the checkpoint is deleted once the
+output is written. When rows failed
+for a temporary reason (the ML service was overloaded or unreachable) the job fails
+with an IncompletePredictionsError so that its message can be redelivered; otherwise
+the output is written with the failed rows marked in a 'prediction_error' column.
+The load, inference (per chunk) and write stages are recorded as spans of the job's trace.
+Files are written back with all their columns; the features the model uses are
+predicted from a compact copy, categorical columns as pandas 'category' and numerical
+columns as int32/float32. Rows with a feature that is not a number are not predicted
+and are marked like the rows that failed.
 """
 
+import os
 import time
+from typing import Callable, Optional, Tuple
 
-import requests
+import numpy as np
 import pandas as pd
 
+from ml.inference.const import CategoricalColumns, Columns, NumericalColumns
+from ml.inference.tracing import TraceContext, Tracer
+
+from cache import ResultCache
+from checkpoint import Checkpoint, compute_file_digest, lock_file
+from progress import ProgressReporter
+
+# Columns that determine a prediction; rows that agree on all of them share a price
+FEATURE_COLUMNS = ["model_group"] + Columns.X
+
+# Columns loaded with the pandas 'category' dtype
+CATEGORY_DTYPE_COLUMNS = ["model_group"] + CategoricalColumns().to_list()
+
+
+class IncompletePredictionsError(Exception):
+    """
+    Raised when some rows of a file could not be predicted for a temporary reason.
+    """
+
 
 class FileProcessor:
     """
     A class to handle file processing tasks, including reading, processing, and saving files.
-    The processing involves sending data to a machine learning service for predictions.
+    The processing involves getting predictions from a predictor (see predictor.py).
     """
 
-    def __init__(self, file_directory: str, ml_url: str):
+    def __init__(
+        self,
+        file_directory: str,
+        predictor,
+        chunk_size: int = 1000,
+        result_cache: Optional[ResultCache] = None,
+        publish_event: Optional[Callable[[dict], None]] = None,
+        progress_every_rows: int = 1000,
+        progress_every_seconds: float = 5.0,
+        tracer: Optional[Tracer] = None,
+    ):
         """
-        Initialize the FileProcessor with the file directory and ML service details.
+        Initialize the FileProcessor with the file directory and the predictor.
 
         Args:
             file_directory (str): Directory where the files are located.
-            ml_url (str): URL of the machine learning service for processing files.
+            predictor (HttpPredictor | EmbeddedPredictor): Predictor used to get
+                the predicted prices of the rows.
+            chunk_size (int): Number of distinct feature rows predicted between two
+                checkpoints. Default is 1000.
+            result_cache (Optional[ResultCache]): Cache of processed outputs of
+                previously uploaded files. Default is None (no caching).
+            publish_event (Optional[Callable[[dict], None]]): Called with the job's
+                progress and completion events. Default is None (events not published).
+            progress_every_rows (int): Emit a progress event at least every N rows.
+            progress_every_seconds (float): Emit a progress event at least every T seconds.
+            tracer (Optional[Tracer]): Records the spans of the processing stages.
+                Default is None (spans are dropped).
         """
         self.file_directory = file_directory
-        self.ml_url = ml_url
+        self.predictor = predictor
+        self.chunk_size = chunk_size
+        self.result_cache = result_cache
+        self.publish_event = publish_event
+        self.progress_every_rows = progress_every_rows
+        self.progress_every_seconds = progress_every_seconds
+        self.tracer = tracer or Tracer("batch")
+
+    @staticmethod
+    def _load_file(file_path: str) -> Tuple[pd.DataFrame, pd.DataFrame, pd.Series]:
+        """
+        Load an uploaded file, and the features of its rows with a compact schema.
+
+        The loaded rows keep all columns of the file for the output. The features are
+        a copy of the columns the model uses, with categorical columns as 'category'
+        and numerical columns downcast to int32, or to float32 when they contain
+        missing or non-integer values. Numerical cells that are not numbers are
+        reported per column, and their rows get an error.
+
+        Args:
+            file_path (str): Path of the uploaded file.
+
+        Returns:
+            Tuple[pd.DataFrame, pd.DataFrame, pd.Series]: The loaded rows, their
+            features, and the error of every row, None for rows with valid features.
+        """
+        data_frame = pd.read_excel(
+            file_path,
+            engine="openpyxl",
+            dtype={column: "category" for column in CATEGORY_DTYPE_COLUMNS},
+        )
+        features = data_frame[
+            [column for column in FEATURE_COLUMNS if column in data_frame.columns]
+        ].copy()
+        errors = pd.Series(None, index=data_frame.index, dtype="object")
+
+        for column in NumericalColumns().to_list():
+            if column not in features.columns:
+                continue
+            values = pd.to_numeric(features[column], errors="coerce")
+            invalid = values.isna() & features[column].notna()
+            if invalid.any():
+                print(f"Column {column} has {int(invalid.sum())} values that are not numbers")
+                for index in features.index[invalid & errors.isna()]:
+                    errors[index] = (
+                        f"Invalid number {features.at[index, column]!r} in column {column}"
+                    )
+            is_integral = values.notna().all() and (values % 1 == 0).all()
+            features[column] = values.astype("int32" if is_integral else "float32")
+
+        return data_frame, features, errors
 
-    def process_file(self, file_name: str):
+    @staticmethod
+    def _deduplicate(data_frame: pd.DataFrame) -> Tuple[pd.DataFrame, np.ndarray]:
         """
-        Process the specified file by sending its rows to a machine learning service for predictions.
+        Find the distinct feature rows of a DataFrame.
+
+        Args:
+            data_frame (pd.DataFrame): The rows of the file.
+
+        Returns:
+            Tuple[pd.DataFrame, np.ndarray]: The first row of every distinct
+            (model_group, features) tuple, and for every row of the input the
+            position of its tuple in the distinct rows.
+        """
+        key_columns = [column for column in FEATURE_COLUMNS if column in data_frame.columns]
+
+        # Groups are numbered in order of first appearance
+        row_groups = (
+            data_frame.groupby(key_columns, sort=False, dropna=False, observed=True)
+            .ngroup()
+            .to_numpy()
+        )
+        first_occurrence = ~pd.Index(row_groups).duplicated()
+
+        return data_frame[first_occurrence], row_groups
+
+    def _predict_in_chunks(
+        self,
+        unique_rows: pd.DataFrame,
+        checkpoint: Checkpoint,
+        progress: ProgressReporter,
+        trace: Optional[TraceContext] = None,
+    ) -> Tuple[pd.DataFrame, float, int]:
+        """
+        Predict the distinct feature rows chunk by chunk, skipping finished chunks.
+
+        Only chunks whose rows were all predicted are checkpointed; the others are
+        predicted again when the job is resumed.
+
+        Args:
+            unique_rows (pd.DataFrame): The distinct feature rows of the file.
+            checkpoint (Checkpoint): The checkpoint of the job.
+            progress (ProgressReporter): Reporter of the job's progress.
+            trace (Optional[TraceContext]): Context of the inference span; every
+                predicted chunk is recorded as a child span.
+
+        Returns:
+            Tuple[pd.DataFrame, float, int]: The PREDICTION_COLUMNS of all distinct
+            rows, in their order, the time spent on inference in this run, and the
+            number of rows predicted in this run.
+        """
+        predictions = np.full(len(unique_rows), np.nan)
+        errors = np.full(len(unique_rows), None, dtype=object)
+        retryable = np.zeros(len(unique_rows), dtype=bool)
+        inference_time, predicted_rows, resumed_chunks = 0.0, 0, 0
+        progress.start(len(unique_rows))
+
+        for chunk_index, start in enumerate(range(0, len(unique_rows), self.chunk_size)):
+            end = start + self.chunk_size
+            chunk_predictions = checkpoint.get_chunk(chunk_index)
+
+            if chunk_predictions is None:
+                chunk = unique_rows.iloc[start:end]
+                errors_before = int(pd.notna(errors[:start]).sum())
+
+                # Report the rows of the chunk as they are predicted
+                def on_progress(rows, errors):
+                    progress.update(start + rows, errors_before + errors)
+
+                inference_start = time.time()
+                with self.tracer.span(
+                    "inference_chunk", trace, chunk=chunk_index, rows=len(chunk)
+                ) as chunk_trace:
+                    chunk_result = self.predictor.predict(chunk, chunk_trace, on_progress)
+                inference_time += time.time() - inference_start
+                predicted_rows += len(chunk)
+
+                chunk_predictions = chunk_result["predicted_price"].to_numpy()
+                errors[start:end] = chunk_result["prediction_error"].to_numpy()
+                retryable[start:end] = chunk_result["retryable"].to_numpy()
+                if chunk_result["prediction_error"].isna().all():
+                    checkpoint.save_chunk(chunk_index, chunk_predictions)
+            else:
+                resumed_chunks += 1
+
+            predictions[start:end] = chunk_predictions
+
+            rows_done = min(end, len(unique_rows))
+            progress.update(rows_done, int(pd.notna(errors[:rows_done]).sum()))
+
+        if resumed_chunks:
+            print(f"Resumed from checkpoint: {resumed_chunks} chunks were already predicted")
+
+        result = pd.DataFrame(
+            {"predicted_price": predictions, "prediction_error": errors, "retryable": retryable}
+        )
+        return result, inference_time, predicted_rows
+
+    @staticmethod
+    def _save_output(data_frame: pd.DataFrame, output_file_path: str, output_format: str):
+        """
+        Save the processed DataFrame in the requested format.
+
+        The file is written under a temporary name and then moved into place, so an
+        existing output that is hardlinked into the result cache is never modified.
+
+        Args:
+            data_frame (pd.DataFrame): The processed rows.
+            output_file_path (str): Path of the output file.
+            output_format (str): Either 'xlsx' or 'csv'.
+        """
+        directory, file_name = os.path.split(output_file_path)
+        temporary_path = f"{directory}/.tmp-{os.getpid()}-{file_name}"
+
+        if output_format == "csv":
+            data_frame.to_csv(temporary_path, index=False)
+        else:
+            data_frame.to_excel(temporary_path, index=False)
+        os.replace(temporary_path, output_file_path)
+
+    def process_file(
+        self,
+        file_name: str,
+        output_format: str = "xlsx",
+        trace: Optional[TraceContext] = None,
+        retry_temporary_errors: bool = True,
+    ):
+        """
+        Process the specified file by getting a predicted price for each of its rows.
+
+        Deliveries of the same file wait for each other, since they share its
+        checkpoint and output. Rows that could not be predicted are written with an
+        empty price and the reason in a 'prediction_error' column. Such an output is
+        not cached, so a later upload predicts the failed rows again.
 
         Args:
             file_name (str): Name of the file to process.
+            output_format (str): Format of the processed file, 'xlsx' or 'csv'.
+                Default is 'xlsx'.
+            trace (Optional[TraceContext]): Context of the job's span; the stages
+                are recorded as its children. Default is None (no spans).
+            retry_temporary_errors (bool): Fail the job instead of writing its output
+                when rows failed for a temporary reason, so it can be retried.
+                Default is True.
 
         Returns:
             None
+
+        Raises:
+            IncompletePredictionsError: If 'retry_temporary_errors' is set and some
+                rows failed for a temporary reason. The job is reported as failed and
+                its output is not written.
         """
         file_path = f"{self.file_directory}/{file_name}"
+        with lock_file(file_path):
+            return self._process_file(
+                file_name, output_format, trace, retry_temporary_errors
+            )
+
+    def _process_file(
+        self,
+        file_name: str,
+        output_format: str,
+        trace: Optional[TraceContext],
+        retry_temporary_errors: bool,
+    ):
+        """
+        Process a file while holding its lock; see process_file.
+
+        Args:
+            file_name (str): Name of the file to process.
+            output_format (str): Format of the processed file, 'xlsx' or 'csv'.
+            trace (Optional[TraceContext]): Context of the job's span.
+            retry_temporary_errors (bool): Fail the job instead of writing its output
+                when rows failed for a temporary reason.
+
+        Raises:
+            IncompletePredictionsError: If 'retry_temporary_errors' is set and some
+                rows failed for a temporary reason.
+        """
+        file_path = f"{self.file_directory}/{file_name}"
+        output_file_name = f"processed_{os.path.splitext(file_name)[0]}.{output_format}"
+        output_file_path = f"{self.file_directory}/{output_file_name}"
         print(f"Starting processing for file: {file_path}")
 
+        progress = ProgressReporter(
+            self.publish_event,
+            job_id=file_name,
+            file_name=file_name,
+            every_rows=self.progress_every_rows,
+            every_seconds=self.progress_every_seconds,
+            trace_id=trace.trace_id if trace else None,
+        )
+
         # Load the file into a DataFrame
         try:
-            data_frame = pd.read_excel(file_path, engine="openpyxl")
-            print(f"Loaded file with shape: {data_frame.shape}")
+            with progress.stage("load"), self.tracer.span("load", trace, file=file_name):
+                file_digest = compute_file_digest(file_path)
+                job_key = f"{file_digest}.{output_format}"
+                progress.job_id = job_key
+                checkpoint = Checkpoint.load(
+                    self.file_directory, file_name, job_key, self.chunk_size
+                )
+
+                # Reuse the output of an identical upload made with the same models
+                cache_key = None
+                if self.result_cache:
+                    cache_key = self.result_cache.make_key(file_digest, output_format)
+                    if cache_key and self.result_cache.fetch(cache_key, output_file_path):
+                        checkpoint.remove()
+                        print(f"Result cache hit, processed file saved at: {output_file_path}")
+                        progress.complete("completed", cache_hit=True, output=output_file_path)
+                        return
+
+                data_frame, features, input_errors = self._load_file(file_path)
+                memory_usage = features.memory_usage(deep=True).sum() / 1024
+                print(
+                    f"Loaded file with shape: {data_frame.shape} "
+                    f"(features: {memory_usage:.1f} KiB)"
+                )
         except Exception as e:
             print(f"Error loading file: {e}")
+            progress.complete("failed", error=f"Error loading file: {e}")
             return
 
-        start_time = time.time()
+        # Predict the price of each distinct valid feature row and map it back onto
+        # all rows
+        valid_rows = input_errors.isna().to_numpy()
+        try:
+            with progress.stage("inference"), self.tracer.span(
+                "inference", trace, rows=len(data_frame)
+            ) as inference_trace:
+                unique_rows, row_groups = self._deduplicate(features[valid_rows])
+                unique_predictions, inference_time, predicted_rows = self._predict_in_chunks(
+                    unique_rows, checkpoint, progress, inference_trace
+                )
+        except Exception as e:
+            progress.complete("failed", error=f"Error during inference: {e}")
+            raise
+
+        temporary_failures = int(unique_predictions["retryable"].sum())
+        if temporary_failures and retry_temporary_errors:
+            error = (
+                f"{temporary_failures} of {len(unique_rows)} distinct rows could not be "
+                "predicted because the ML service was unavailable"
+            )
+            progress.complete("failed", error=error, retryable=True)
+            raise IncompletePredictionsError(error)
+
+        predicted_price = np.full(len(data_frame), np.nan)
+        predicted_price[valid_rows] = (
+            unique_predictions["predicted_price"].to_numpy()[row_groups]
+        )
+        prediction_error = input_errors.to_numpy(dtype="object", copy=True)
+        prediction_error[valid_rows] = (
+            unique_predictions["prediction_error"].to_numpy()[row_groups]
+        )
+        failed_rows = int(pd.notna(prediction_error).sum())
+        data_frame["predicted_price"] = predicted_price
+        if failed_rows:
+            data_frame["prediction_error"] = prediction_error
+            print(f"{failed_rows} of {len(data_frame)} rows could not be predicted")
 
-        # Process each row in the DataFrame
-        for index, row in data_frame.iterrows():
-            try:
-                response = requests.post(self.ml_url, json=row.to_dict())
-                if response.status_code == 200:
-                    prediction = response.json()
-                    data_frame.at[index, "predicted_price"] = prediction.get("predicted_price", None)
-                else:
-                    print(f"Error for row {index}: {response.status_code} - {response.text}")
-            except requests.RequestException as e:
-                print(f"Request error for row {index}: {e}")
+        total_rows, distinct_rows = len(data_frame), len(unique_rows)
+        if predicted_rows:
+            valid_count = int(valid_rows.sum())
+            time_saved = inference_time / predicted_rows * (valid_count - distinct_rows)
+            print(
+                f"Deduplicated {valid_count} rows to {distinct_rows} distinct feature rows "
+                f"(ratio {valid_count / distinct_rows:.2f}x), "
+                f"estimated inference time saved: {time_saved:.2f} seconds"
+            )
 
         print("File processing completed.")
 
         # Save the processed DataFrame to a new file
-        output_file_name = f"processed_{file_name}"
-        output_file_path = f"{self.file_directory}/{output_file_name}"
         try:
-            data_frame.to_excel(output_file_path, index=False)
-            print(f"Processed file saved at: {output_file_path}")
+            with progress.stage("write"), self.tracer.span(
+                "write", trace, output_format=output_format
+            ):
+                self._save_output(data_frame, output_file_path, output_format)
+                print(f"Processed file saved at: {output_file_path}")
+                checkpoint.remove()
+                # An output with failed rows is not cached
+                if not failed_rows:
+                    # Artifacts replaced while the job ran may have served
+                    # part of it, so its output belongs to neither version
+                    if cache_key and cache_key == self.result_cache.make_key(
+                        file_digest, output_format
+                    ):
+                        self.result_cache.store(cache_key, output_file_path)
+                    elif cache_key:
+                        print("Model artifacts changed during the job, output not cached")
         except Exception as e:
             print(f"Error saving processed file: {e}")
+            progress.complete("failed", error=f"Error saving processed file: {e}")
+            return
 
-        end_time = time.time()
-        print(f"Total processing time: {end_time - start_time:.2f} seconds")
+        progress.complete(
+            "completed", file_rows=total_rows, failed_rows=failed_rows, output=output_file_path
+        )
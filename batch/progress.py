@@ -0,0 +1,163 @@
+"""
+Job Progress Reporting
+This module defines a ProgressReporter that emits progress events while a file is
+processed (rows done, rows/s, ETA, error count), throttled to every N rows or T
+seconds, and a final completion event with per-stage timings. Events are plain
+dictionaries handed to a publish callable, e.g. the worker's RabbitMQ status
+exchange publisher.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+
+class ProgressReporter:
+    """
+    Emits throttled progress events and a completion event for one job.
+    """
+
+    def __init__(
+        self,
+        publish: Optional[Callable[[dict], None]],
+        job_id: str,
+        file_name: str,
+        every_rows: int = 1000,
+        every_seconds: float = 5.0,
+        trace_id: Optional[str] = None,
+    ):
+        """
+        Initialize the ProgressReporter.
+
+        Args:
+            publish (Optional[Callable[[dict], None]]): Called with every event. When
+                None, events are only printed.
+            job_id (str): Identifier of the job.
+            file_name (str): Name of the processed file.
+            every_rows (int): Emit a progress event at least every N rows. Default is 1000.
+            every_seconds (float): Emit a progress event at least every T seconds.
+                Default is 5.
+            trace_id (Optional[str]): Trace ID of the job, added to its events.
+                Default is None.
+        """
+        self.publish = publish
+        self.job_id = job_id
+        self.file_name = file_name
+        self.every_rows = every_rows
+        self.every_seconds = every_seconds
+        self.trace_id = trace_id
+        self.stage_timings = {}
+        self.rows_total = 0
+        self.rows_done = 0
+        self.errors = 0
+        self._started_at = time.time()
+        self._inference_started_at = None
+        self._last_event_rows = 0
+        self._last_event_at = self._started_at
+
+    def _emit(self, event: dict):
+        """
+        Send an event to the publisher.
+        """
+        event = {
+            "job_id": self.job_id,
+            "file": self.file_name,
+            "timestamp": time.time(),
+            **event,
+        }
+        if self.trace_id:
+            event["trace_id"] = self.trace_id
+        if self.publish:
+            try:
+                self.publish(event)
+            except Exception as e:
+                print(f"Failed to publish {event['event']} event: {e}")
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Context manager timing a processing stage (e.g. 'load', 'inference', 'write').
+
+        Args:
+            name (str): Name of the stage.
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.stage_timings[name] = self.stage_timings.get(name, 0.0) + time.time() - start
+
+    def start(self, rows_total: int):
+        """
+        Emit the event announcing the number of rows to predict.
+
+        Args:
+            rows_total (int): Number of rows to predict.
+        """
+        self.rows_total = rows_total
+        self._inference_started_at = time.time()
+        self._emit({"event": "started", "rows_total": rows_total})
+
+    def update(self, rows_done: int, errors: int):
+        """
+        Record progress and emit a progress event if N rows or T seconds have passed.
+
+        Args:
+            rows_done (int): Number of rows predicted so far.
+            errors (int): Number of rows that could not be predicted so far.
+        """
+        self.rows_done = rows_done
+        self.errors = errors
+
+        now = time.time()
+        # Nothing new since the last event, e.g. the end of a chunk already reported
+        if rows_done == self._last_event_rows:
+            return
+        if (
+            rows_done - self._last_event_rows < self.every_rows
+            and now - self._last_event_at < self.every_seconds
+            and rows_done < self.rows_total
+        ):
+            return
+
+        elapsed = now - (self._inference_started_at or self._started_at)
+        rows_per_second = rows_done / elapsed if elapsed > 0 else 0.0
+        remaining = self.rows_total - rows_done
+        eta_seconds = remaining / rows_per_second if rows_per_second > 0 else None
+
+        self._last_event_rows = rows_done
+        self._last_event_at = now
+        self._emit(
+            {
+                "event": "progress",
+                "rows_done": rows_done,
+                "rows_total": self.rows_total,
+                "rows_per_second": round(rows_per_second, 2),
+                "eta_seconds": round(eta_seconds, 2) if eta_seconds is not None else None,
+                "errors": errors,
+            }
+        )
+
+    def complete(self, status: str = "completed", **details):
+        """
+        Emit the completion event with the per-stage timings.
+
+        Args:
+            status (str): Final status of the job, e.g. 'completed' or 'failed'.
+            **details: Additional fields of the event.
+        """
+        total_seconds = time.time() - self._started_at
+        event = {
+            "event": status,
+            "rows_done": self.rows_done,
+            "rows_total": self.rows_total,
+            "errors": self.errors,
+            "total_seconds": round(total_seconds, 3),
+            "stage_seconds": {
+                name: round(seconds, 3) for name, seconds in self.stage_timings.items()
+            },
+            **details,
+        }
+        self._emit(event)
+        timings = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in self.stage_timings.items())
+        print(f"Job {self.job_id} {status} in {total_seconds:.2f} seconds ({timings})")
@@ -0,0 +1,174 @@
+"""
+Worker Supervisor
+This module defines a WorkerSupervisor class that runs several RabbitMQWorker
+consumers as separate processes on one host, restarts consumers that die,
+and shuts all of them down gracefully on SIGTERM or SIGINT.
+"""
+
+import os
+import time
+import signal
+import multiprocessing
+
+from worker import RabbitMQWorker
+
+
+def run_worker(worker_kwargs: dict):
+    """
+    Entry point of a consumer process.
+
+    The consumer finishes the message it is processing before exiting when it
+    receives SIGTERM or SIGINT. Prefetched messages that were not acknowledged
+    are requeued by RabbitMQ when the connection closes.
+
+    Args:
+        worker_kwargs (dict): Keyword arguments for the RabbitMQWorker.
+    """
+    worker = RabbitMQWorker(**worker_kwargs)
+
+    def handle_signal(signum, frame):
+        print(f"[{os.getpid()}] Received signal {signum}, stopping after current message...")
+        worker.stop()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    worker.connect()
+    worker.start_consuming()
+    worker.close()
+
+
+class WorkerSupervisor:
+    """
+    Runs a number of consumer processes and keeps them alive.
+
+    Each consumer process has its own connection and channel to RabbitMQ, so
+    files are processed in parallel across the cores of the host.
+    """
+
+    def __init__(
+        self,
+        worker_kwargs: dict,
+        worker_count: int,
+        shutdown_timeout: float = 300.0,
+        poll_interval: float = 1.0,
+    ):
+        """
+        Initialize the WorkerSupervisor.
+
+        Args:
+            worker_kwargs (dict): Keyword arguments passed to each RabbitMQWorker.
+            worker_count (int): Number of consumer processes to run.
+            shutdown_timeout (float): Seconds to wait for consumers to finish their
+                current message before they are killed. Default is 300.
+            poll_interval (float): Seconds between health checks of the consumers.
+                Default is 1.
+        """
+        self.worker_kwargs = worker_kwargs
+        self.worker_count = worker_count
+        self.shutdown_timeout = shutdown_timeout
+        self.poll_interval = poll_interval
+        self.processes = []
+        self._retiring = []
+        self._stopping = False
+
+    def _spawn_worker(self) -> multiprocessing.Process:
+        """
+        Start a new consumer process.
+
+        Returns:
+            multiprocessing.Process: The started process.
+        """
+        process = multiprocessing.Process(target=run_worker, args=(self.worker_kwargs,))
+        process.start()
+        print(f"Started consumer process {process.pid}")
+        return process
+
+    def _replace_dead_workers(self):
+        """
+        Restart consumer processes that exited unexpectedly.
+        """
+        for index, process in enumerate(self.processes):
+            if not process.is_alive():
+                print(f"Consumer process {process.pid} exited with code {process.exitcode}, restarting...")
+                self.processes[index] = self._spawn_worker()
+
+    def scale_to(self, worker_count: int):
+        """
+        Grow or shrink the number of consumer processes.
+
+        Consumers that are removed receive SIGTERM and finish their current
+        message before exiting; they are not restarted.
+
+        Args:
+            worker_count (int): The new number of consumer processes.
+        """
+        while len(self.processes) < worker_count:
+            self.processes.append(self._spawn_worker())
+        while len(self.processes) > worker_count:
+            process = self.processes.pop()
+            print(f"Retiring consumer process {process.pid}")
+            process.terminate()
+            self._retiring.append(process)
+        self.worker_count = worker_count
+
+    def _reap_retired_workers(self):
+        """
+        Forget retired consumer processes that have exited.
+        """
+        for process in [process for process in self._retiring if not process.is_alive()]:
+            process.join()
+            self._retiring.remove(process)
+            print(f"Consumer process {process.pid} retired")
+
+    def _poll(self):
+        """
+        Periodic supervision step, run every poll interval.
+        """
+        self._replace_dead_workers()
+        self._reap_retired_workers()
+
+    def _handle_signal(self, signum, frame):
+        """
+        Signal handler that requests a graceful shutdown.
+        """
+        print(f"Supervisor received signal {signum}, shutting down consumers...")
+        self._stopping = True
+
+    def run(self):
+        """
+        Start the consumer processes and supervise them until a shutdown is requested.
+        """
+        signal.signal(signal.SIGTERM, self._handle_signal)
+        signal.signal(signal.SIGINT, self._handle_signal)
+
+        print(f"Starting {self.worker_count} consumer processes...")
+        self.processes = [self._spawn_worker() for _ in range(self.worker_count)]
+
+        while not self._stopping:
+            self._poll()
+            time.sleep(self.poll_interval)
+
+        self.shutdown()
+
+    def shutdown(self):
+        """
+        Stop all consumer processes, waiting for their current message to finish.
+
+        Consumers that do not exit within the shutdown timeout are killed; their
+        unacknowledged messages are redelivered by RabbitMQ.
+        """
+        processes = self.processes + self._retiring
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+        deadline = time.time() + self.shutdown_timeout
+        for process in processes:
+            process.join(max(0.0, deadline - time.time()))
+            if process.is_alive():
+                print(f"Consumer process {process.pid} did not stop in time, killing it")
+                process.kill()
+                process.join()
+
+        print("All consumer processes stopped")
@@ -2,14 +2,33 @@
 RabbitMQ Worker for File Processing
 This module defines a RabbitMQWorker class that connects to a RabbitMQ server,
 consumes messages from a specified queue, and processes files based on the received messages.
+
+Files are processed on a thread pool so that the connection keeps serving heartbeats
+while a long file is being processed. Acknowledgements are sent back to the
+connection thread through a thread-safe callback.
+
+A job whose rows could not all be predicted because the ML service was overloaded or
+unreachable is rejected and requeued once, so that it resumes from its checkpoint,
+e.g. after the ML service restarted. On redelivery its output is written even if
+rows fail again, with the failed rows marked.
+
+The trace context of a job is read from the 'traceparent' message header, and the
+time the message waited in the queue is recorded as a span next to the processing.
 """
 
 import time
 import json
+import functools
+from concurrent.futures import ThreadPoolExecutor
 
 import pika
 
-from processor import FileProcessor
+from ml.inference.tracing import SpanExporter, TraceContext, Tracer
+
+from cache import ResultCache
+from job import Job, MAX_PRIORITY
+from predictor import create_predictor
+from processor import FileProcessor, IncompletePredictionsError
 
 
 class RabbitMQWorker:
@@ -18,6 +37,8 @@ class RabbitMQWorker:
 
     This worker connects to RabbitMQ, listens for messages on a specified queue,
     and processes the files specified in the messages using the FileProcessor.
+    The connection thread only dispatches messages and sends acknowledgements;
+    the processing itself runs on a separate executor.
     """
 
     def __init__(
@@ -29,6 +50,21 @@ class RabbitMQWorker:
         password: str,
         file_path: str,
         ml_url: str,
+        prefetch_count: int = 1,
+        heartbeat: int = 60,
+        inference_mode: str = "http",
+        ml_data_path: str = "/ml/data",
+        chunk_size: int = 1000,
+        ml_max_concurrency: int = 32,
+        ml_latency_threshold: float = 0.5,
+        ml_timeout: float = 10.0,
+        result_cache_directory: str = None,
+        result_cache_max_entries: int = 1000,
+        result_cache_max_bytes: int = 1 << 30,
+        status_exchange: str = "job_status",
+        progress_every_rows: int = 1000,
+        progress_every_seconds: float = 5.0,
+        trace_file: str = None,
     ):
         """
         Initialize the RabbitMQWorker with connection and processing details.
@@ -41,18 +77,72 @@ class RabbitMQWorker:
             password (str): Password for RabbitMQ authentication.
             file_path (str): Path to the directory where files are stored.
             ml_url (str): URL of the machine learning service for processing files.
+            prefetch_count (int): Number of unacknowledged messages the broker may
+                deliver to this worker at once. Default is 1.
+            heartbeat (int): AMQP heartbeat interval in seconds. Default is 60.
+            inference_mode (str): 'http' to call the ML service or 'embedded' to run
+                the models in-process. Default is 'http'.
+            ml_data_path (str): Directory of the ML artifacts used in 'embedded' mode.
+            chunk_size (int): Number of distinct rows predicted between two checkpoints.
+            ml_max_concurrency (int): Upper bound of requests in flight to the ML service.
+            ml_latency_threshold (float): p95 latency in seconds above which fewer
+                requests are sent to the ML service.
+            ml_timeout (float): Seconds to wait for the ML service to connect or
+                respond to a request. Default is 10.
+            result_cache_directory (str): Directory of the result cache of re-uploaded
+                files. Default is None (no caching).
+            result_cache_max_entries (int): Maximum number of cached outputs.
+            result_cache_max_bytes (int): Maximum total size of the cached outputs.
+            status_exchange (str): Topic exchange receiving the job progress and
+                completion events, routed as 'job.<event>'. Default is 'job_status'.
+            progress_every_rows (int): Publish a progress event at least every N rows.
+            progress_every_seconds (float): Publish a progress event at least every
+                T seconds.
+            trace_file (str): JSONL file the job spans are appended to. Default is
+                None (spans are dropped).
         """
         self.queue_name = queue_name
         self.host = host
         self.port = port
         self.credentials = pika.PlainCredentials(username, password)
         self.connection_params = pika.ConnectionParameters(
-            host=self.host, port=self.port, credentials=self.credentials
+            host=self.host,
+            port=self.port,
+            credentials=self.credentials,
+            heartbeat=heartbeat,
+            blocked_connection_timeout=heartbeat * 5,
         )
         self.file_path = file_path
         self.connection = None
         self.channel = None
         self.ml_url = ml_url
+        self.predictor = create_predictor(
+            inference_mode,
+            ml_url,
+            ml_data_path,
+            ml_max_concurrency,
+            ml_latency_threshold,
+            ml_timeout,
+        )
+        self.chunk_size = chunk_size
+        self.status_exchange = status_exchange
+        self.progress_every_rows = progress_every_rows
+        self.progress_every_seconds = progress_every_seconds
+        self.tracer = Tracer("batch", SpanExporter(trace_file))
+        self.result_cache = None
+        if result_cache_directory:
+            self.result_cache = ResultCache(
+                result_cache_directory,
+                ml_data_path,
+                result_cache_max_entries,
+                result_cache_max_bytes,
+            )
+        self.prefetch_count = prefetch_count
+        self.executor = ThreadPoolExecutor(
+            max_workers=prefetch_count, thread_name_prefix="file-processor"
+        )
+        self._in_flight = set()
+        self._stopping = False
 
     def connect(self, max_retries: int = 2):
         """
@@ -68,7 +158,10 @@ class RabbitMQWorker:
             try:
                 self.connection = pika.BlockingConnection(self.connection_params)
                 self.channel = self.connection.channel()
-                self.channel.queue_declare(queue=self.queue_name)
+                self._declare_queue()
+                self.channel.exchange_declare(
+                    exchange=self.status_exchange, exchange_type="topic"
+                )
                 print(f"Connected to RabbitMQ and declared queue: {self.queue_name}")
                 return
             except pika.exceptions.AMQPConnectionError:
@@ -76,35 +169,171 @@ class RabbitMQWorker:
                 time.sleep(2)
         raise Exception("Failed to connect to RabbitMQ after multiple retries")
 
-    def _process_message(self, channel, method, body):
+    def _declare_queue(self):
+        """
+        Declare the queue with x-max-priority.
+
+        A queue declared before priorities were introduced cannot be redeclared with
+        other arguments: the broker closes the channel with PRECONDITION_FAILED. The
+        existing queue is then consumed as it is, without priorities, on a new
+        channel until it is deleted and redeclared (see the README).
+        """
+        try:
+            self.channel.queue_declare(
+                queue=self.queue_name, arguments={"x-max-priority": MAX_PRIORITY}
+            )
+        except pika.exceptions.ChannelClosedByBroker as error:
+            if error.reply_code != 406:
+                raise
+            print(
+                f"Queue {self.queue_name} exists without x-max-priority, "
+                f"consuming without priorities: {error.reply_text}"
+            )
+            self.channel = self.connection.channel()
+            self.channel.queue_declare(queue=self.queue_name, passive=True)
+
+    @staticmethod
+    def _trace_of(properties) -> tuple:
+        """
+        Read the trace context and the enqueue time of a message.
+
+        Messages without a valid 'traceparent' header start a new trace. The enqueue
+        time is the 'x-enqueued-at' header (milliseconds since the epoch) set by the
+        interface, or the message timestamp (seconds).
+
+        Args:
+            properties: The properties of the message.
+
+        Returns:
+            tuple: The TraceContext and the enqueue time in seconds, or None if unknown.
+        """
+        headers = (properties.headers if properties else None) or {}
+        trace = TraceContext.from_traceparent(headers.get("traceparent")) or TraceContext.new()
+
+        enqueued_at = None
+        if headers.get("x-enqueued-at"):
+            enqueued_at = int(headers["x-enqueued-at"]) / 1000
+        elif properties and properties.timestamp:
+            enqueued_at = float(properties.timestamp)
+        return trace, enqueued_at
+
+    def _process_message(self, channel, method, properties, body):
         """
         Process a single message from the RabbitMQ queue.
 
+        Runs on the executor. The acknowledgement is handed back to the
+        connection thread once processing has finished.
+
         Args:
             channel: The channel object.
             method: The method frame containing delivery information.
-            body: The body of the message (file name).
+            properties: The properties of the message (trace headers).
+            body: The body of the message (job metadata or file name).
 
         Raises:
             Exception: If there is an error processing the message.
         """
+        started_at = time.time()
+        trace, enqueued_at = self._trace_of(properties)
+        requeue = False
         try:
-            filename = body.decode()
-            if not filename:
-                print("Invalid message format: 'filename' missing")
-                return
+            # Time spent in the broker queue and in this worker's prefetch buffer
+            if enqueued_at:
+                self.tracer.record(
+                    "queue_wait",
+                    trace.child(),
+                    trace,
+                    enqueued_at,
+                    started_at,
+                    redelivered=method.redelivered,
+                )
+
+            job = Job.from_message(body)
 
-            print(f"Processing file: {filename}")
-            processor = FileProcessor(self.file_path, self.ml_url)
-            processor.process_file(filename)
+            print(f"Processing {job} (trace {trace.trace_id})")
+            processor = FileProcessor(
+                self.file_path,
+                self.predictor,
+                self.chunk_size,
+                self.result_cache,
+                self.publish_event,
+                self.progress_every_rows,
+                self.progress_every_seconds,
+                self.tracer,
+            )
+            with self.tracer.span(
+                "process_job", trace, file=job.filename, row_estimate=job.row_estimate
+            ) as job_trace:
+                processor.process_file(
+                    job.filename,
+                    job.output_format,
+                    job_trace,
+                    retry_temporary_errors=not method.redelivered,
+                )
 
-        except json.JSONDecodeError:
-            print("Failed to decode message body as JSON")
+        except IncompletePredictionsError as e:
+            requeue = True
+            print(f"Incomplete predictions: {e}; requeuing")
+        except ValueError as e:
+            print(str(e))
         except Exception as e:
             print(f"Error processing file: {str(e)}")
         finally:
-            if channel.is_open:
-                channel.basic_ack(delivery_tag=method.delivery_tag)
+            try:
+                self.connection.add_callback_threadsafe(
+                    functools.partial(
+                        self._ack_message, channel, method.delivery_tag, requeue
+                    )
+                )
+            except pika.exceptions.ConnectionWrongStateError:
+                print(f"Connection closed before ack of delivery {method.delivery_tag}; message will be redelivered")
+
+    def publish_event(self, event: dict):
+        """
+        Publish a job event on the status exchange.
+
+        Safe to call from the processing threads; the message is published on the
+        connection thread.
+
+        Args:
+            event (dict): The event, with its type in the 'event' field.
+        """
+        self.connection.add_callback_threadsafe(
+            functools.partial(self._publish_event, event)
+        )
+
+    def _publish_event(self, event: dict):
+        """
+        Publish a job event. Must be called on the connection thread.
+
+        Args:
+            event (dict): The event, with its type in the 'event' field.
+        """
+        if self.channel.is_open:
+            self.channel.basic_publish(
+                exchange=self.status_exchange,
+                routing_key=f"job.{event['event']}",
+                body=json.dumps(event),
+                properties=pika.BasicProperties(content_type="application/json"),
+            )
+
+    def _ack_message(self, channel, delivery_tag: int, requeue: bool = False):
+        """
+        Acknowledge a message, or reject it back to the queue. Must be called on the
+        connection thread.
+
+        Args:
+            channel: The channel object the message was delivered on.
+            delivery_tag (int): The delivery tag of the message.
+            requeue (bool): Reject the message so that it is redelivered instead of
+                acknowledging it. Default is False.
+        """
+        if channel.is_open and requeue:
+            channel.basic_nack(delivery_tag=delivery_tag, requeue=True)
+        elif channel.is_open:
+            channel.basic_ack(delivery_tag=delivery_tag)
+        else:
+            print(f"Channel closed before ack of delivery {delivery_tag}; message will be redelivered")
 
     def _message_callback(self, channel, method, properties, body):
         """
@@ -114,10 +343,14 @@ class RabbitMQWorker:
             channel: The channel object.
             method: The method frame containing delivery information.
             properties: The properties of the message.
-            body: The body of the message (file name).
+            body: The body of the message (job metadata or file name).
         """
         print(f"Received message: {body}")
-        self._process_message(channel, method, body)
+        future = self.executor.submit(
+            self._process_message, channel, method, properties, body
+        )
+        self._in_flight.add(future)
+        future.add_done_callback(self._in_flight.discard)
 
     def start_consuming(self):
         """
@@ -128,10 +361,54 @@ class RabbitMQWorker:
         """
         if not self.channel:
             raise Exception("RabbitMQ channel is not initialized. Call 'connect' first.")
+        if self._stopping:
+            return
 
-        self.channel.basic_qos(prefetch_count=1)
+        self.channel.basic_qos(prefetch_count=self.prefetch_count)
         self.channel.basic_consume(
             queue=self.queue_name, on_message_callback=self._message_callback, auto_ack=False
         )
         print(" [*] Waiting for messages. To exit press CTRL+C")
         self.channel.start_consuming()
+        self._drain_in_flight()
+
+    def _drain_in_flight(self):
+        """
+        Wait for messages that are still being processed and send their acknowledgements.
+
+        The connection keeps serving heartbeats and thread-safe callbacks while waiting.
+        """
+        while self._in_flight:
+            self.connection.process_data_events(time_limit=1)
+        # Flush the acknowledgements queued by the last finished messages
+        self.connection.process_data_events(time_limit=0)
+        self.executor.shutdown(wait=True)
+
+    def stop(self):
+        """
+        Ask the worker to stop consuming after the message in progress.
+
+        Safe to call from a signal handler or another thread. Messages that were
+        prefetched but not acknowledged are returned to the queue by the broker
+        and redelivered to another consumer.
+        """
+        self._stopping = True
+        if self.connection and self.connection.is_open:
+            self.connection.add_callback_threadsafe(self._stop_consuming)
+
+    def _stop_consuming(self):
+        """
+        Cancel the consumer so that 'start_consuming' returns.
+        """
+        if self.channel and self.channel.is_open:
+            self.channel.stop_consuming()
+
+    def close(self):
+        """
+        Close the channel and the connection to RabbitMQ.
+        """
+        if self.channel and self.channel.is_open:
+            self.channel.close()
+        if self.connection and self.connection.is_open:
+            self.connection.close()
+        print("Disconnected from RabbitMQ")
@@ -0,0 +1,283 @@
+"""
+Microbenchmark Suite
+This module times the hot functions of the inference service and the batch
+processor in-process, against local stand-ins instead of the real servers: Redis
+is replaced by fakeredis and RedisAI by an onnxruntime-backed fake that implements
+the commands RedisAIClient uses. Models and encoders are read from the ETL output.
+
+Each benchmark is run for a number of rounds and its median time per call is
+compared with a stored baseline; the suite fails when a benchmark is slower than
+its baseline by more than the threshold. Baselines are machine specific, save
+one on the machine the comparisons run on.
+
+Usage:
+    python benchmark/microbench.py --save-baseline benchmark/baseline.json
+    python benchmark/microbench.py --baseline benchmark/baseline.json --threshold 0.25
+    python benchmark/microbench.py --filter load_file
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+import numpy as np
+
+REPOSITORY = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path[:0] = [REPOSITORY, os.path.join(REPOSITORY, "batch")]
+
+from ml.inference.app import InferenceAPI  # noqa: E402
+from ml.inference.const import (  # noqa: E402
+    CategoricalColumns,
+    ModelInferenceRequest,
+    NumericalColumns,
+)
+from ml.inference.lanes import TrafficLanes  # noqa: E402
+from ml.inference.redis_ai_client import RedisAIClient  # noqa: E402
+from ml.inference.redis_client import RedisClient  # noqa: E402
+from processor import FileProcessor  # noqa: E402
+
+SAMPLE_FILES = {
+    1: "assets/sample_files/1_row.xlsx",
+    100: "assets/sample_files/100_rows.xlsx",
+    1000: "assets/sample_files/1000_rows.xlsx",
+}
+
+
+class OnnxRedisAI:
+    """
+    In-process stand-in for the redisai Client, running models with onnxruntime.
+
+    Implements the subset of commands RedisAIClient sends. Tensors are stored as
+    bytes with their dtype and shape, like RedisAI blobs.
+    """
+
+    def __init__(self):
+        import onnxruntime
+
+        self.onnxruntime = onnxruntime
+        self.models = {}
+        self.tensors = {}
+
+    def ping(self):
+        return True
+
+    def exists(self, key):
+        return int(key in self.models or key in self.tensors)
+
+    def modelset(self, key, backend, device, data, inputs, outputs, tag=None):
+        options = self.onnxruntime.SessionOptions()
+        options.intra_op_num_threads = 1
+        session = self.onnxruntime.InferenceSession(
+            data, options, providers=["CPUExecutionProvider"]
+        )
+        self.models[key] = (session, inputs, outputs, tag or "")
+        return "OK"
+
+    def modelget(self, key, meta_only=False):
+        _, inputs, outputs, tag = self.models[key]
+        return {"backend": "ONNX", "device": "cpu", "tag": tag, "inputs": inputs, "outputs": outputs}
+
+    def tensorset(self, key, tensor):
+        tensor = np.ascontiguousarray(tensor)
+        self.tensors[key] = (tensor.dtype.str, tensor.shape, tensor.tobytes())
+        return "OK"
+
+    def tensorget(self, key):
+        dtype, shape, blob = self.tensors[key]
+        return np.frombuffer(blob, dtype=dtype).reshape(shape)
+
+    def modelexecute(self, key, inputs, outputs):
+        session, input_names, output_names, _ = self.models[key]
+        feeds = {name: self.tensorget(tensor) for name, tensor in zip(input_names, inputs)}
+        results = session.run(output_names, feeds)
+        for tensor, result in zip(outputs, results):
+            self.tensorset(tensor, result)
+        return "OK"
+
+    def delete(self, *keys):
+        removed = 0
+        for key in keys:
+            removed += self.tensors.pop(key, None) is not None
+        return removed
+
+
+def measure(function, rounds: int, min_round_seconds: float) -> dict:
+    """
+    Time a function.
+
+    The number of calls per round is calibrated so one round lasts at least
+    'min_round_seconds'; the median of the rounds is reported.
+
+    Args:
+        function: The function to time, called without arguments.
+        rounds (int): Number of timed rounds.
+        min_round_seconds (float): Minimum duration of a round.
+
+    Returns:
+        dict: Median and minimum time per call in microseconds, calls per round.
+    """
+    function()  # warm up caches and lazy imports
+
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            function()
+        if time.perf_counter() - start >= min_round_seconds:
+            break
+        calls *= 2
+
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(calls):
+            function()
+        timings.append((time.perf_counter() - start) / calls * 1e6)
+
+    return {
+        "median_us": round(statistics.median(timings), 3),
+        "min_us": round(min(timings), 3),
+        "calls_per_round": calls,
+    }
+
+
+def build_benchmarks(ml_data_path: str, output_directory: str) -> dict:
+    """
+    Set up the stand-ins and return the benchmarks by name.
+
+    Args:
+        ml_data_path (str): Directory of the ETL output ('models' and 'encoder').
+        output_directory (str): Scratch directory for written files.
+
+    Returns:
+        dict: Benchmark name -> function without arguments.
+    """
+    import fakeredis
+
+    redis_client = RedisClient("localhost", 6379, data_path=ml_data_path)
+    redis_client.client = fakeredis.FakeRedis()
+    redis_ai_client = RedisAIClient("localhost", 6379, data_path=ml_data_path)
+    redis_ai_client.client = OnnxRedisAI()
+
+    categorical_columns = CategoricalColumns().to_list()
+    numerical_columns = NumericalColumns().to_list()
+    api = InferenceAPI(
+        redis_client=redis_client,
+        redis_ai_client=redis_ai_client,
+        categorical_columns=categorical_columns,
+        numerical_columns=numerical_columns,
+        traffic_lanes=TrafficLanes(),
+    )
+
+    # A second API whose encoders have no lookup table, to time the pickle path
+    pickle_api = InferenceAPI(
+        redis_client=redis_client,
+        redis_ai_client=redis_ai_client,
+        categorical_columns=categorical_columns,
+        numerical_columns=numerical_columns,
+        traffic_lanes=TrafficLanes(),
+    )
+    pickle_api._encode_with_lookup_table = lambda rows, model_group: None
+
+    request_data = ModelInferenceRequest()
+    request_body = request_data.model_dump()
+    input_data = api._prepare_input_data(request_data, "A")
+    redis_ai_client.set_tensor("bench:input", input_data)
+
+    benchmarks = {
+        "request_validation": lambda: ModelInferenceRequest.model_validate(request_body),
+        "load_encoder": lambda: api._load_encoder("A"),
+        "prepare_input_data[lookup]": lambda: api._prepare_input_data(request_data, "A"),
+        "prepare_input_data[pickle]": lambda: pickle_api._prepare_input_data(request_data, "A"),
+        "set_tensor": lambda: redis_ai_client.set_tensor("bench:input", input_data),
+        "execute_model": lambda: redis_ai_client.execute_model(
+            "model_A", "bench:input", "bench:output"
+        ),
+        "predict_with_onnx_model": lambda: api._predict_with_onnx_model(request_data),
+    }
+
+    for rows, sample_file in SAMPLE_FILES.items():
+        file_path = os.path.join(REPOSITORY, sample_file)
+        data_frame, _, _ = FileProcessor._load_file(file_path)
+        data_frame["predicted_price"] = 0.0
+
+        benchmarks[f"load_file[{rows}]"] = lambda path=file_path: FileProcessor._load_file(path)
+        for output_format in ("xlsx", "csv"):
+            output_path = os.path.join(output_directory, f"processed_{rows}.{output_format}")
+            benchmarks[f"save_output[{rows},{output_format}]"] = (
+                lambda df=data_frame, path=output_path, fmt=output_format: (
+                    FileProcessor._save_output(df, path, fmt)
+                )
+            )
+
+    return benchmarks
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Print the results next to the baseline and return the regressions.
+
+    Args:
+        results (dict): Benchmark name -> timing of this run.
+        baseline (dict): Benchmark name -> timing of the baseline run.
+        threshold (float): Allowed slowdown, e.g. 0.25 for 25%.
+
+    Returns:
+        list: Names of the benchmarks slower than the baseline beyond the threshold.
+    """
+    regressions = []
+    print(f"{'benchmark':<32}{'median us':>12}{'baseline us':>14}{'change':>10}")
+    for name, timing in results.items():
+        previous = baseline.get(name)
+        line = f"{name:<32}{timing['median_us']:>12.1f}"
+        if previous:
+            change = timing["median_us"] / previous["median_us"] - 1
+            line += f"{previous['median_us']:>14.1f}{change * 100:>+9.1f}%"
+            if change > threshold:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ml-data", default=os.path.join(REPOSITORY, "ml", "data"), help="ETL output directory")
+    parser.add_argument("--rounds", type=int, default=7, help="Timed rounds per benchmark")
+    parser.add_argument("--min-round-seconds", type=float, default=0.05, help="Minimum duration of a round")
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--baseline", help="JSON baseline to compare with")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before failing")
+    parser.add_argument("--save-baseline", help="Write the results as a new baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as output_directory:
+        benchmarks = build_benchmarks(args.ml_data, output_directory)
+        results = {}
+        for name, function in benchmarks.items():
+            if args.filter and args.filter not in name:
+                continue
+            results[name] = measure(function, args.rounds, args.min_round_seconds)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["benchmarks"]
+    regressions = compare(results, baseline, args.threshold)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump({"created_at": time.time(), "benchmarks": results}, file, indent=2)
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmarks regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,468 @@
+"""
+Local RedisAI Stand-in Server
+This module runs a small asyncio server that speaks RESP and implements the
+subset of Redis and RedisAI commands the inference service sends through
+RedisAIClient (PING, EXISTS, DEL, AI.MODELSTORE/MODELSET, AI.TENSORSET,
+AI.TENSORGET, AI.MODELEXECUTE/MODELRUN and AI.DAGEXECUTE). ONNX models are run
+with onnxruntime.
+
+Like RedisAI, connections are served on the event loop while models run on a
+single background thread per device, so requests queue behind each other the
+same way and latencies stay comparable to the real module. It lets the ML
+service run and be benchmarked where the 'redislabs/redisai' image is not
+available (e.g. arm64 machines or offline CI).
+
+Usage:
+    python benchmark/redisai_server.py --port 6380
+    python benchmark/redisai_server.py --host 0.0.0.0 --port 6379 --threads 1
+"""
+
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# RedisAI tensor types and their NumPy equivalents
+DTYPES = {
+    "FLOAT": np.float32,
+    "DOUBLE": np.float64,
+    "INT8": np.int8,
+    "INT16": np.int16,
+    "INT32": np.int32,
+    "INT64": np.int64,
+    "UINT8": np.uint8,
+    "UINT16": np.uint16,
+    "BOOL": np.bool_,
+}
+DTYPE_NAMES = {np.dtype(dtype): name for name, dtype in DTYPES.items()}
+
+
+class CommandError(Exception):
+    """
+    Error returned to the client as a RESP error reply.
+    """
+
+
+class SimpleString(str):
+    """
+    A reply sent as a RESP simple string ('+OK') instead of a bulk string.
+    """
+
+
+OK = SimpleString("OK")
+
+
+class Tensor:
+    """
+    A tensor stored under a key.
+    """
+
+    def __init__(self, array: np.ndarray):
+        self.array = np.ascontiguousarray(array)
+
+    @classmethod
+    def from_arguments(cls, arguments: list) -> "Tensor":
+        """
+        Build a tensor from the arguments of AI.TENSORSET after the key:
+        '<type> <shape...> [BLOB <data> | VALUES <value...>]'.
+        """
+        if not arguments:
+            raise CommandError("ERR wrong number of arguments for 'AI.TENSORSET' command")
+        dtype_name = arguments[0].decode().upper()
+        if dtype_name not in DTYPES:
+            raise CommandError(f"ERR invalid data type '{dtype_name}'")
+        dtype = DTYPES[dtype_name]
+
+        shape = []
+        position = 1
+        while position < len(arguments) and arguments[position].upper() not in (b"BLOB", b"VALUES"):
+            shape.append(int(arguments[position]))
+            position += 1
+
+        if position == len(arguments):
+            return cls(np.zeros(shape, dtype=dtype))
+        if arguments[position].upper() == b"BLOB":
+            blob = b"".join(arguments[position + 1 :])
+            expected = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            if len(blob) != expected:
+                raise CommandError("ERR data length does not match tensor shape and type")
+            return cls(np.frombuffer(blob, dtype=dtype).reshape(shape))
+        values = [float(value) for value in arguments[position + 1 :]]
+        return cls(np.array(values, dtype=dtype).reshape(shape))
+
+    def reply(self, options: list) -> list:
+        """
+        The AI.TENSORGET reply for the given options (META, BLOB, VALUES).
+        """
+        options = [option.upper() for option in options] or [b"VALUES"]
+        reply = [
+            "dtype",
+            DTYPE_NAMES[self.array.dtype],
+            "shape",
+            list(self.array.shape),
+        ]
+        if b"BLOB" in options:
+            reply += ["blob", self.array.tobytes()]
+        elif b"VALUES" in options:
+            values = self.array.reshape(-1).tolist()
+            if self.array.dtype.kind == "f":
+                values = [repr(value) for value in values]
+            reply += ["values", values]
+        return reply
+
+
+class Model:
+    """
+    An ONNX model stored under a key, run with onnxruntime.
+    """
+
+    def __init__(self, backend: str, device: str, tag: str, blob: bytes, threads: int):
+        import onnxruntime
+
+        if backend.upper() != "ONNX":
+            raise CommandError(f"ERR unsupported backend '{backend}', only ONNX is available")
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        try:
+            self.session = onnxruntime.InferenceSession(
+                blob, options, providers=["CPUExecutionProvider"]
+            )
+        except Exception as e:
+            raise CommandError(f"ERR could not load the ONNX model: {e}")
+
+        self.backend = backend.upper()
+        self.device = device.upper()
+        self.tag = tag
+        self.blob = blob
+        self.input_names = [node.name for node in self.session.get_inputs()]
+        self.output_names = [node.name for node in self.session.get_outputs()]
+
+    def run(self, inputs: list) -> list:
+        """
+        Run the model. Inputs and outputs are matched to the graph by position.
+        """
+        if len(inputs) != len(self.input_names):
+            raise CommandError(
+                f"ERR model expects {len(self.input_names)} inputs, got {len(inputs)}"
+            )
+        feeds = {name: tensor.array for name, tensor in zip(self.input_names, inputs)}
+        try:
+            return [Tensor(output) for output in self.session.run(None, feeds)]
+        except Exception as e:
+            raise CommandError(f"ERR model execution failed: {e}")
+
+
+def _count_prefixed(arguments: list, keyword: bytes, position: int) -> tuple:
+    """
+    Parse '<keyword> <count> <item...>' at 'position'.
+
+    Returns:
+        tuple: The items and the position after them.
+    """
+    if position >= len(arguments) or arguments[position].upper() != keyword:
+        raise CommandError(f"ERR {keyword.decode()} argument is missing")
+    count = int(arguments[position + 1])
+    items = arguments[position + 2 : position + 2 + count]
+    if len(items) != count:
+        raise CommandError(f"ERR number of {keyword.decode()} does not match the count")
+    return items, position + 2 + count
+
+
+def _split_keyword(arguments: list, keyword: bytes, stop: bytes) -> tuple:
+    """
+    Parse the uncounted form '<keyword> <item...>' ended by 'stop' or the end.
+    """
+    upper = [argument.upper() for argument in arguments]
+    start = upper.index(keyword) + 1
+    end = upper.index(stop) if stop in upper[start:] else len(arguments)
+    return arguments[start:end]
+
+
+class RedisAIServer:
+    """
+    Keyspace and command handlers of the stand-in server.
+    """
+
+    def __init__(self, threads: int = 1):
+        """
+        Initialize the server.
+
+        Args:
+            threads (int): onnxruntime intra-op threads per model run. Default is 1.
+        """
+        self.threads = threads
+        self.keyspace = {}
+        # One queue per device, like RedisAI's background workers
+        self.devices = {}
+
+    def _device_executor(self, device: str) -> ThreadPoolExecutor:
+        if device not in self.devices:
+            self.devices[device] = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=f"redisai-{device.lower()}"
+            )
+        return self.devices[device]
+
+    def _get(self, keyspace: dict, key: bytes, kind: type):
+        value = keyspace.get(key)
+        if value is None:
+            raise CommandError("ERR tensor key is empty" if kind is Tensor else "ERR model key is empty")
+        if not isinstance(value, kind):
+            raise CommandError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    async def execute(self, arguments: list, keyspace: dict = None):
+        """
+        Execute one command.
+
+        Args:
+            arguments (list): The command name and its arguments, as bytes.
+            keyspace (dict): Tensors of a DAG's local context. Defaults to the
+                server keyspace.
+
+        Returns:
+            The reply.
+        """
+        keyspace = self.keyspace if keyspace is None else keyspace
+        name = arguments[0].decode().upper()
+        arguments = arguments[1:]
+
+        if name == "PING":
+            return SimpleString("PONG") if not arguments else arguments[0]
+        if name in ("CLIENT", "SELECT", "READONLY"):
+            return OK
+        if name == "COMMAND":
+            return []
+        if name == "INFO":
+            return "# Server\r\nredis_version:6.0.0\r\nredisai_stand_in:1\r\n"
+        if name == "EXISTS":
+            return sum(argument in self.keyspace for argument in arguments)
+        if name in ("DEL", "UNLINK"):
+            return sum(self.keyspace.pop(argument, None) is not None for argument in arguments)
+        if name == "FLUSHALL" or name == "FLUSHDB":
+            self.keyspace.clear()
+            return OK
+        if name == "DBSIZE":
+            return len(self.keyspace)
+
+        if name == "AI.TENSORSET":
+            keyspace[arguments[0]] = Tensor.from_arguments(arguments[1:])
+            return OK
+        if name == "AI.TENSORGET":
+            return self._get(keyspace, arguments[0], Tensor).reply(arguments[1:])
+        if name in ("AI.MODELSTORE", "AI.MODELSET"):
+            return self._model_store(name, arguments)
+        if name == "AI.MODELGET":
+            return self._model_get(arguments)
+        if name == "AI.MODELDEL":
+            self._get(self.keyspace, arguments[0], Model)
+            del self.keyspace[arguments[0]]
+            return OK
+        if name in ("AI.MODELEXECUTE", "AI.MODELRUN"):
+            return await self._model_execute(name, arguments, keyspace)
+        if name in ("AI.DAGEXECUTE", "AI.DAGEXECUTE_RO", "AI.DAGRUN", "AI.DAGRUN_RO"):
+            return await self._dag_execute(name, arguments)
+
+        raise CommandError(f"ERR unknown command '{name}'")
+
+    def _model_store(self, name: str, arguments: list):
+        """
+        AI.MODELSTORE <key> <backend> <device> [TAG t] [BATCHSIZE n [MINBATCHSIZE m
+        [MINBATCHTIMEOUT t]]] [INPUTS n ...] [OUTPUTS n ...] BLOB <data...>
+        (AI.MODELSET takes INPUTS/OUTPUTS without counts). Batching options are
+        accepted and ignored.
+        """
+        key, backend, device = arguments[0], arguments[1].decode(), arguments[2].decode()
+        upper = [argument.upper() for argument in arguments]
+        if b"BLOB" not in upper:
+            raise CommandError(f"ERR {name}: missing BLOB")
+        blob_position = upper.index(b"BLOB")
+        tag = ""
+        if b"TAG" in upper[:blob_position]:
+            tag = arguments[upper.index(b"TAG") + 1].decode()
+
+        blob = b"".join(arguments[blob_position + 1 :])
+        self.keyspace[key] = Model(backend, device, tag, blob, self.threads)
+        return OK
+
+    def _model_get(self, arguments: list):
+        model = self._get(self.keyspace, arguments[0], Model)
+        reply = [
+            "backend", model.backend,
+            "device", model.device,
+            "tag", model.tag,
+            "batchsize", 0,
+            "minbatchsize", 0,
+            "inputs", model.input_names,
+            "outputs", model.output_names,
+            "minbatchtimeout", 0,
+        ]
+        if b"BLOB" in [argument.upper() for argument in arguments[1:]]:
+            reply += ["blob", model.blob]
+        return reply
+
+    async def _model_execute(self, name: str, arguments: list, keyspace: dict):
+        """
+        AI.MODELEXECUTE <key> INPUTS <n> <input...> OUTPUTS <n> <output...> [TIMEOUT t]
+        or AI.MODELRUN <key> INPUTS <input...> OUTPUTS <output...>.
+        """
+        model = self._get(self.keyspace, arguments[0], Model)
+        if name == "AI.MODELEXECUTE":
+            input_keys, position = _count_prefixed(arguments, b"INPUTS", 1)
+            output_keys, _ = _count_prefixed(arguments, b"OUTPUTS", position)
+        else:
+            input_keys = _split_keyword(arguments, b"INPUTS", b"OUTPUTS")
+            output_keys = _split_keyword(arguments, b"OUTPUTS", b"TIMEOUT")
+
+        inputs = [self._get(keyspace, input_key, Tensor) for input_key in input_keys]
+        loop = asyncio.get_running_loop()
+        outputs = await loop.run_in_executor(
+            self._device_executor(model.device), model.run, inputs
+        )
+        for output_key, output in zip(output_keys, outputs):
+            keyspace[output_key] = output
+        return OK
+
+    async def _dag_execute(self, name: str, arguments: list):
+        """
+        AI.DAGEXECUTE [LOAD n key...] [PERSIST n key...] [ROUTING k] [TIMEOUT t]
+        |> <command> |> <command> ...
+
+        Commands run against a local context holding the loaded tensors; only the
+        tensors listed in PERSIST are written back to the keyspace.
+        """
+        header, commands = [], []
+        for argument in arguments:
+            if argument == b"|>":
+                commands.append([])
+            elif commands:
+                commands[-1].append(argument)
+            else:
+                header.append(argument)
+        commands = [command for command in commands if command]
+
+        load_keys, persist_keys = [], []
+        upper = [argument.upper() for argument in header]
+        if b"LOAD" in upper:
+            load_keys, _ = _count_prefixed(header, b"LOAD", upper.index(b"LOAD"))
+        if b"PERSIST" in upper:
+            persist_keys, _ = _count_prefixed(header, b"PERSIST", upper.index(b"PERSIST"))
+        if persist_keys and name.endswith("_RO"):
+            raise CommandError("ERR PERSIST cannot be specified in a read-only DAG")
+
+        local = {key: self._get(self.keyspace, key, Tensor) for key in load_keys}
+        if name.startswith("AI.DAGRUN"):
+            # The deprecated form reads tensors from the keyspace directly
+            local = {key: value for key, value in self.keyspace.items() if isinstance(value, Tensor)}
+
+        replies = []
+        for command in commands:
+            command_name = command[0].decode().upper()
+            if command_name not in ("AI.TENSORSET", "AI.TENSORGET", "AI.MODELEXECUTE", "AI.MODELRUN"):
+                raise CommandError(f"ERR unsupported command within DAG: {command_name}")
+            replies.append(await self.execute(command, local))
+
+        for key in persist_keys:
+            self.keyspace[key] = self._get(local, key, Tensor)
+        return replies
+
+
+def encode_reply(reply) -> bytes:
+    """
+    Encode a reply in RESP2.
+    """
+    if isinstance(reply, CommandError):
+        return f"-{' '.join(str(reply).split())}\r\n".encode()
+    if isinstance(reply, SimpleString):
+        return f"+{reply}\r\n".encode()
+    if isinstance(reply, bool):
+        return f":{int(reply)}\r\n".encode()
+    if isinstance(reply, int):
+        return f":{reply}\r\n".encode()
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, str):
+        reply = reply.encode()
+    if isinstance(reply, (bytes, bytearray)):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    if isinstance(reply, (list, tuple)):
+        return b"*%d\r\n" % len(reply) + b"".join(encode_reply(item) for item in reply)
+    raise TypeError(f"cannot encode reply of type {type(reply)}")
+
+
+async def read_command(reader: asyncio.StreamReader):
+    """
+    Read one command, either a RESP array of bulk strings or an inline command.
+
+    Returns:
+        list: The arguments as bytes, or None when the connection is closed.
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.split()
+
+    arguments = []
+    for _ in range(int(line[1:])):
+        header = await reader.readline()
+        if not header.startswith(b"$"):
+            raise CommandError("ERR Protocol error: expected '$'")
+        length = int(header[1:])
+        data = await reader.readexactly(length + 2)
+        arguments.append(data[:-2])
+    return arguments
+
+
+async def serve_connection(server: RedisAIServer, reader, writer):
+    """
+    Serve the commands of one client connection until it closes.
+    """
+    try:
+        while True:
+            try:
+                arguments = await read_command(reader)
+            except CommandError as e:
+                writer.write(encode_reply(e))
+                break
+            if arguments is None:
+                break
+            if not arguments:
+                continue
+            if arguments[0].upper() == b"QUIT":
+                writer.write(encode_reply(OK))
+                break
+
+            try:
+                reply = await server.execute(arguments)
+            except CommandError as e:
+                reply = e
+            except (IndexError, ValueError) as e:
+                reply = CommandError(f"ERR wrong arguments: {e}")
+            writer.write(encode_reply(reply))
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+async def main(host: str, port: int, threads: int):
+    server = RedisAIServer(threads)
+    listener = await asyncio.start_server(
+        lambda reader, writer: serve_connection(server, reader, writer), host, port
+    )
+    print(f"RedisAI stand-in listening on {host}:{port}")
+    async with listener:
+        await listener.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6380)
+    parser.add_argument("--threads", type=int, default=1, help="onnxruntime intra-op threads per model run")
+    args = parser.parse_args()
+    asyncio.run(main(args.host, args.port, args.threads))
@@ -0,0 +1,121 @@
+"""
+Trace Report
+This module joins the spans the services append to their JSONL collector files
+(TRACE_FILE) on their trace ID and prints, for every job, where its time went:
+the upload, the time the message waited in RabbitMQ, and the load, inference and
+write stages of the batch processor, with the ML service requests summarized per
+inference chunk.
+
+Usage:
+    python benchmark/trace_report.py traces/*.jsonl
+    python benchmark/trace_report.py traces/*.jsonl --trace 4bf92f3577b34da6a3ce929d0e0e4736
+    python benchmark/trace_report.py traces/*.jsonl --last 5 --slowest
+"""
+
+import json
+import argparse
+from collections import defaultdict
+
+# Span names of the ML service requests, summarized instead of listed
+REQUEST_SPAN_PREFIXES = ("POST ", "GET ")
+
+
+def load_spans(file_paths: list) -> dict:
+    """
+    Read spans from JSONL files and group them by trace ID.
+
+    Args:
+        file_paths (list): Paths of the collector files.
+
+    Returns:
+        dict: Trace ID -> list of spans.
+    """
+    traces = defaultdict(list)
+    for file_path in file_paths:
+        with open(file_path) as file:
+            for line_number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    span = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"Skipping invalid line {file_path}:{line_number}")
+                    continue
+                traces[span["trace_id"]].append(span)
+    return traces
+
+
+def print_trace(trace_id: str, spans: list):
+    """
+    Print the spans of one trace as a tree, with offsets from the first span.
+
+    Args:
+        trace_id (str): The trace ID.
+        spans (list): The spans of the trace.
+    """
+    start = min(span["start"] for span in spans)
+    end = max(span["end"] for span in spans)
+    span_ids = {span["span_id"] for span in spans}
+    children = defaultdict(list)
+    for span in spans:
+        parent_id = span["parent_id"] if span["parent_id"] in span_ids else None
+        children[parent_id].append(span)
+
+    print(f"\ntrace {trace_id}  total {(end - start) * 1000:.1f} ms")
+
+    def print_children(parent_id, depth):
+        spans_here = sorted(children[parent_id], key=lambda span: span["start"])
+        requests = [span for span in spans_here if span["name"].startswith(REQUEST_SPAN_PREFIXES)]
+        for span in spans_here:
+            if span in requests:
+                continue
+            attributes = " ".join(
+                f"{key}={value}" for key, value in span["attributes"].items() if value is not None
+            )
+            print(
+                f"  {'  ' * depth}{span['name']:<{32 - 2 * depth}}"
+                f"{span['service']:<11}+{(span['start'] - start) * 1000:>10.1f} ms"
+                f"{span['duration_ms']:>12.1f} ms  {attributes}"
+            )
+            print_children(span["span_id"], depth + 1)
+        if requests:
+            durations = sorted(span["duration_ms"] for span in requests)
+            p95 = durations[min(len(durations) - 1, int(len(durations) * 0.95))]
+            print(
+                f"  {'  ' * depth}{len(requests)} ML requests: "
+                f"median {durations[len(durations) // 2]:.1f} ms, p95 {p95:.1f} ms, "
+                f"max {durations[-1]:.1f} ms"
+            )
+
+    print_children(None, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="JSONL span files")
+    parser.add_argument("--trace", help="Only print this trace ID")
+    parser.add_argument("--last", type=int, default=10, help="Number of traces printed")
+    parser.add_argument("--slowest", action="store_true", help="Print the slowest traces instead of the latest")
+    args = parser.parse_args()
+
+    traces = load_spans(args.files)
+    if args.trace:
+        traces = {args.trace: traces.get(args.trace, [])}
+        if not traces[args.trace]:
+            print(f"No spans for trace {args.trace}")
+            return
+
+    def duration(item):
+        spans = item[1]
+        return max(span["end"] for span in spans) - min(span["start"] for span in spans)
+
+    def started(item):
+        return min(span["start"] for span in item[1])
+
+    ordered = sorted(traces.items(), key=duration if args.slowest else started, reverse=True)
+    for trace_id, spans in ordered[: args.last]:
+        print_trace(trace_id, spans)
+
+
+if __name__ == "__main__":
+    main()
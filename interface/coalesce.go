@@ -0,0 +1,56 @@
+package main
+
+import (
+	"fmt"
+	"sync"
+)
+
+// coalescedCall is an upstream call in flight and its result.
+type coalescedCall struct {
+	wg     sync.WaitGroup
+	result MLResponse
+	err    error
+}
+
+// Coalescer collapses concurrent calls with the same key into one: the first caller
+// runs the call and the callers arriving while it is in flight share its result.
+type Coalescer struct {
+	mu    sync.Mutex
+	calls map[string]*coalescedCall
+}
+
+func NewCoalescer() *Coalescer {
+	return &Coalescer{calls: make(map[string]*coalescedCall)}
+}
+
+// Do runs fn once for all concurrent callers with the same key. shared is true for
+// the callers that received the result of another caller's call. A panic in fn is
+// returned as an error to all of them.
+func (g *Coalescer) Do(key string, fn func() (MLResponse, error)) (result MLResponse, shared bool, err error) {
+	g.mu.Lock()
+	if call, ok := g.calls[key]; ok {
+		g.mu.Unlock()
+		call.wg.Wait()
+		return call.result, true, call.err
+	}
+	call := &coalescedCall{}
+	call.wg.Add(1)
+	g.calls[key] = call
+	g.mu.Unlock()
+
+	func() {
+		defer func() {
+			if r := recover(); r != nil {
+				call.err = fmt.Errorf("coalesced call panicked: %v", r)
+			}
+		}()
+		call.result, call.err = fn()
+	}()
+
+	g.mu.Lock()
+	delete(g.calls, key)
+	g.mu.Unlock()
+	call.wg.Done()
+
+	return call.result, false, call.err
+}
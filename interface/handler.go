@@ -1,7 +1,6 @@
 package main
 
 import (
-	"bytes"
 	"encoding/json"
 	"fmt"
 	"net/http"
@@ -9,8 +8,13 @@ import (
 	"github.com/gin-gonic/gin"
 )
 
+// MaxBatchRows is the largest number of rows accepted by /predict/batch.
+const MaxBatchRows = 1000
+
 type Handler struct {
 	rabbitMQ *RabbitMQ
+	spans    *SpanWriter
+	mlClient *MLClient
 }
 
 type RequestBody struct {
@@ -28,11 +32,27 @@ type RequestBody struct {
 	Climate     string `json:"climate" default:"Air Conditioning"`
 }
 
-func NewHandler(rabbitMQ *RabbitMQ) *Handler {
-	return &Handler{rabbitMQ: rabbitMQ}
+func NewHandler(rabbitMQ *RabbitMQ, spans *SpanWriter, mlClient *MLClient) *Handler {
+	return &Handler{rabbitMQ: rabbitMQ, spans: spans, mlClient: mlClient}
+}
+
+// startSpan starts a span for the request and returns its trace context to the caller.
+func (h *Handler) startSpan(c *gin.Context, name string) *Span {
+	span := StartSpan(name, c.GetHeader("traceparent"))
+	c.Header("traceparent", span.Traceparent())
+	return span
+}
+
+// finishSpan records the response status on the span and exports it.
+func (h *Handler) finishSpan(c *gin.Context, span *Span) {
+	span.Attributes["status"] = c.Writer.Status()
+	h.spans.Finish(span)
 }
 
 func (h *Handler) UploadFile(c *gin.Context, queueName string, filePath string) {
+	span := h.startSpan(c, "upload")
+	defer h.finishSpan(c, span)
+
 	// Get file from request
 	file, err := c.FormFile("file")
 	if err != nil {
@@ -40,6 +60,13 @@ func (h *Handler) UploadFile(c *gin.Context, queueName string, filePath string)
 		return
 	}
 
+	// Requested format of the processed file, validated before anything is saved
+	outputFormat := c.DefaultPostForm("output_format", "xlsx")
+	if outputFormat != "xlsx" && outputFormat != "csv" {
+		c.JSON(http.StatusBadRequest, gin.H{"error": "output_format must be xlsx or csv"})
+		return
+	}
+
 	// Save file to the specified path
 	fullFilePath := filePath + "/" + file.Filename
 	if err := c.SaveUploadedFile(file, fullFilePath); err != nil {
@@ -47,17 +74,24 @@ func (h *Handler) UploadFile(c *gin.Context, queueName string, filePath string)
 		return
 	}
 
-	// Send message to RabbitMQ
-	err = h.rabbitMQ.Publish(queueName, []byte(file.Filename))
+	// Send job metadata to RabbitMQ with the trace context of this upload
+	job := NewJob(file.Filename, file.Size, outputFormat)
+	job.TraceID = span.TraceID
+	span.Attributes["file"] = file.Filename
+	span.Attributes["file_size"] = file.Size
+	err = h.rabbitMQ.PublishJob(queueName, job, span.Traceparent())
 	if err != nil {
 		c.JSON(http.StatusInternalServerError, gin.H{"error": "Failed to send message to RabbitMQ"})
 		return
 	}
 
-	c.JSON(http.StatusOK, gin.H{"message": "File uploaded and message sent"})
+	c.JSON(http.StatusOK, gin.H{"message": "File uploaded and message sent", "job": job})
 }
 
-func (h *Handler) Predict(c *gin.Context, mlUrl string) {
+func (h *Handler) Predict(c *gin.Context) {
+	span := h.startSpan(c, "predict")
+	defer h.finishSpan(c, span)
+
 	// Get request body
 	var requestBody RequestBody
 	if err := c.ShouldBindJSON(&requestBody); err != nil {
@@ -72,29 +106,54 @@ func (h *Handler) Predict(c *gin.Context, mlUrl string) {
 		return
 	}
 
-	fmt.Println("Sending request to Python worker with body:", string(jsonBody))
-
-	// Send request to Python worker
-	resp, err := http.Post(mlUrl, "application/json", bytes.NewReader(jsonBody))
+	// Send request to Python worker, sharing the response of an identical request in flight
+	response, shared, err := h.mlClient.Predict(jsonBody, span.Traceparent())
+	span.Attributes["coalesced"] = shared
 	if err != nil {
 		c.JSON(http.StatusInternalServerError, gin.H{"error": "Failed to send request to Python worker"})
 		return
 	}
-	defer resp.Body.Close()
 
 	// Check response status
-	if resp.StatusCode != http.StatusOK {
+	if response.Status != http.StatusOK {
 		c.JSON(http.StatusInternalServerError, gin.H{"error": "Failed to get prediction"})
 		return
 	}
+	c.Data(http.StatusOK, "application/json", response.Body)
+}
 
-	// Decode response body
-	var responseBody map[string]interface{}
-	if err := json.NewDecoder(resp.Body).Decode(&responseBody); err != nil {
-		c.JSON(http.StatusInternalServerError, gin.H{"error": "Failed to decode response"})
+// PredictBatch forwards an array of rows to the ML service in one request.
+func (h *Handler) PredictBatch(c *gin.Context) {
+	span := h.startSpan(c, "predict_batch")
+	defer h.finishSpan(c, span)
+
+	var requestBody []RequestBody
+	if err := c.ShouldBindJSON(&requestBody); err != nil {
+		c.JSON(http.StatusBadRequest, gin.H{"error": "Invalid request body, expected an array of rows"})
+		return
+	}
+	if len(requestBody) == 0 || len(requestBody) > MaxBatchRows {
+		c.JSON(http.StatusBadRequest, gin.H{"error": fmt.Sprintf("A batch must have 1 to %d rows", MaxBatchRows)})
+		return
+	}
+	span.Attributes["rows"] = len(requestBody)
+
+	jsonBody, err := json.Marshal(requestBody)
+	if err != nil {
+		c.JSON(http.StatusInternalServerError, gin.H{"error": "Failed to marshal request body"})
+		return
+	}
+
+	responseBody, status, err := h.mlClient.PredictBatch(jsonBody, span.Traceparent())
+	if err != nil {
+		c.JSON(http.StatusInternalServerError, gin.H{"error": "Failed to send request to Python worker"})
+		return
+	}
+	if status != http.StatusOK {
+		c.JSON(http.StatusInternalServerError, gin.H{"error": "Failed to get predictions"})
 		return
 	}
-	c.JSON(http.StatusOK, responseBody)
+	c.Data(http.StatusOK, "application/json", responseBody)
 }
 
 func (h *Handler) HealthCheck(c *gin.Context) {
@@ -0,0 +1,52 @@
+package main
+
+// Job is the metadata of an uploaded file published to the batch processor.
+type Job struct {
+	Filename     string `json:"filename"`
+	FileSize     int64  `json:"file_size"`
+	RowEstimate  int64  `json:"row_estimate"`
+	OutputFormat string `json:"output_format"`
+	Priority     uint8  `json:"priority"`
+	TraceID      string `json:"trace_id,omitempty"`
+}
+
+const (
+	// Size of an xlsx file without rows and average size of one row, measured on the sample files
+	xlsxOverheadBytes = 10000
+	xlsxBytesPerRow   = 50
+)
+
+// EstimateRows estimates the number of rows of an uploaded xlsx file from its size.
+func EstimateRows(fileSize int64) int64 {
+	rows := (fileSize - xlsxOverheadBytes) / xlsxBytesPerRow
+	if rows < 1 {
+		return 1
+	}
+	return rows
+}
+
+// PriorityForRows gives small files a higher priority so they are not stuck behind large ones.
+func PriorityForRows(rows int64) uint8 {
+	switch {
+	case rows <= 1000:
+		return MaxPriority
+	case rows <= 10000:
+		return 7
+	case rows <= 100000:
+		return 4
+	default:
+		return 1
+	}
+}
+
+// NewJob builds the job metadata of an uploaded file.
+func NewJob(filename string, fileSize int64, outputFormat string) Job {
+	rows := EstimateRows(fileSize)
+	return Job{
+		Filename:     filename,
+		FileSize:     fileSize,
+		RowEstimate:  rows,
+		OutputFormat: outputFormat,
+		Priority:     PriorityForRows(rows),
+	}
+}
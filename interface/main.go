@@ -2,6 +2,8 @@ package main
 
 import (
 	"os"
+	"strconv"
+	"time"
 
 	swaggerFiles "github.com/swaggo/files"
 	ginSwagger "github.com/swaggo/gin-swagger"
@@ -15,6 +17,16 @@ func main() {
 	queueName := os.Getenv("RABBITMQ_QUEUE")
 	filePath := os.Getenv("FILE_PATH")
 	mlUrl := os.Getenv("ML_URL")
+	mlBatchUrl := getEnv("ML_BATCH_URL", mlUrl+"/batch")
+	mlMaxConns, err := strconv.Atoi(getEnv("ML_MAX_CONNS", "64"))
+	if err != nil {
+		panic(err)
+	}
+	mlTimeout, err := time.ParseDuration(getEnv("ML_TIMEOUT", "10s"))
+	if err != nil {
+		panic(err)
+	}
+	traceFile := os.Getenv("TRACE_FILE")
 
 	// Initialize RabbitMQ connection
 	rabbitMQ, err := NewRabbitMQ(connString, queueName)
@@ -23,18 +35,26 @@ func main() {
 	}
 	defer rabbitMQ.Close()
 
-	handler := NewHandler(rabbitMQ)
+	mlClient := NewMLClient(mlUrl, mlBatchUrl, mlMaxConns, mlTimeout)
+	handler := NewHandler(rabbitMQ, NewSpanWriter(traceFile), mlClient)
 
 	r := gin.Default()
 	r.POST("/upload", func(c *gin.Context) {
 		handler.UploadFile(c, queueName, filePath)
 	})
-	r.POST("/predict", func(c *gin.Context) {
-		handler.Predict(c, mlUrl)
-	})
+	r.POST("/predict", handler.Predict)
+	r.POST("/predict/batch", handler.PredictBatch)
 	r.GET("/health", handler.HealthCheck)
 	r.GET("/swagger/*any", ginSwagger.WrapHandler(swaggerFiles.Handler))
 
 	// Start the server
 	r.Run(":8080")
 }
+
+// getEnv returns the value of an environment variable, or fallback when it is not set.
+func getEnv(key string, fallback string) string {
+	if value, ok := os.LookupEnv(key); ok && value != "" {
+		return value
+	}
+	return fallback
+}
@@ -0,0 +1,89 @@
+package main
+
+import (
+	"bytes"
+	"context"
+	"io"
+	"net"
+	"net/http"
+	"time"
+)
+
+// MLClient sends prediction requests to the ML service over a dedicated pool of
+// keep-alive connections. Concurrent identical single-row requests are coalesced
+// into one upstream request.
+type MLClient struct {
+	client    *http.Client
+	url       string
+	batchURL  string
+	coalescer *Coalescer
+}
+
+// MLResponse is the body and status code of a response of the ML service.
+type MLResponse struct {
+	Body   []byte
+	Status int
+}
+
+// NewMLClient creates a client for the ML service's single-row and batch prediction
+// endpoints, keeping up to maxConns connections open to it.
+func NewMLClient(url string, batchURL string, maxConns int, timeout time.Duration) *MLClient {
+	transport := &http.Transport{
+		DialContext: (&net.Dialer{
+			Timeout:   2 * time.Second,
+			KeepAlive: 30 * time.Second,
+		}).DialContext,
+		MaxIdleConns:          maxConns,
+		MaxIdleConnsPerHost:   maxConns,
+		MaxConnsPerHost:       maxConns,
+		IdleConnTimeout:       90 * time.Second,
+		ResponseHeaderTimeout: timeout,
+		// Responses are a few bytes of JSON
+		DisableCompression: true,
+	}
+
+	return &MLClient{
+		client:    &http.Client{Transport: transport, Timeout: timeout},
+		url:       url,
+		batchURL:  batchURL,
+		coalescer: NewCoalescer(),
+	}
+}
+
+// post sends a JSON body and returns the response body and status. It is not bound
+// to the caller's request context, since a coalesced call serves several callers.
+func (m *MLClient) post(url string, body []byte, traceparent string) ([]byte, int, error) {
+	req, err := http.NewRequestWithContext(context.Background(), http.MethodPost, url, bytes.NewReader(body))
+	if err != nil {
+		return nil, 0, err
+	}
+	req.Header.Set("Content-Type", "application/json")
+	req.Header.Set("traceparent", traceparent)
+
+	resp, err := m.client.Do(req)
+	if err != nil {
+		return nil, 0, err
+	}
+	defer resp.Body.Close()
+
+	// Read the body to the end so the connection goes back to the pool
+	responseBody, err := io.ReadAll(resp.Body)
+	if err != nil {
+		return nil, 0, err
+	}
+	return responseBody, resp.StatusCode, nil
+}
+
+// Predict sends one row. Requests with the same body that are already in flight
+// share that request's response; shared is true for them.
+func (m *MLClient) Predict(body []byte, traceparent string) (response MLResponse, shared bool, err error) {
+	return m.coalescer.Do(string(body), func() (MLResponse, error) {
+		responseBody, status, err := m.post(m.url, body, traceparent)
+		return MLResponse{Body: responseBody, Status: status}, err
+	})
+}
+
+// PredictBatch sends an array of rows to the batch endpoint.
+func (m *MLClient) PredictBatch(body []byte, traceparent string) ([]byte, int, error) {
+	return m.post(m.batchURL, body, traceparent)
+}
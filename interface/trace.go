@@ -0,0 +1,132 @@
+package main
+
+import (
+	"crypto/rand"
+	"encoding/hex"
+	"encoding/json"
+	"fmt"
+	"os"
+	"strconv"
+	"strings"
+	"sync"
+	"time"
+)
+
+// Span is one timed operation of a trace, exported in the same JSON format as the
+// Python services (ml/inference/tracing.py) so that spans can be joined on trace_id.
+type Span struct {
+	TraceID    string                 `json:"trace_id"`
+	SpanID     string                 `json:"span_id"`
+	ParentID   *string                `json:"parent_id"`
+	Name       string                 `json:"name"`
+	Service    string                 `json:"service"`
+	Start      float64                `json:"start"`
+	End        float64                `json:"end"`
+	DurationMs float64                `json:"duration_ms"`
+	Attributes map[string]interface{} `json:"attributes"`
+
+	startTime time.Time
+	sampled   bool
+}
+
+func randomHex(bytes int) string {
+	buffer := make([]byte, bytes)
+	_, _ = rand.Read(buffer)
+	return hex.EncodeToString(buffer)
+}
+
+func isHex(value string, length int) bool {
+	if len(value) != length || strings.Trim(value, "0") == "" {
+		return false
+	}
+	_, err := hex.DecodeString(value)
+	return err == nil
+}
+
+// ParseTraceparent parses a W3C 'traceparent' header: version-traceid-spanid-flags.
+func ParseTraceparent(header string) (traceID string, spanID string, sampled bool, ok bool) {
+	parts := strings.Split(strings.ToLower(strings.TrimSpace(header)), "-")
+	if len(parts) < 4 || len(parts[0]) != 2 || parts[0] == "ff" {
+		return "", "", false, false
+	}
+	if !isHex(parts[1], 32) || !isHex(parts[2], 16) || len(parts[3]) != 2 {
+		return "", "", false, false
+	}
+	flags, err := strconv.ParseUint(parts[3], 16, 8)
+	if err != nil {
+		return "", "", false, false
+	}
+	return parts[1], parts[2], flags&1 == 1, true
+}
+
+// StartSpan starts a span of the interface. It continues the trace of an incoming
+// 'traceparent' header, or starts a new trace when the header is missing or invalid.
+func StartSpan(name string, traceparent string) *Span {
+	span := &Span{
+		SpanID:     randomHex(8),
+		Name:       name,
+		Service:    "interface",
+		Attributes: map[string]interface{}{},
+		startTime:  time.Now(),
+		sampled:    true,
+	}
+	if traceID, parentID, sampled, ok := ParseTraceparent(traceparent); ok {
+		span.TraceID, span.ParentID, span.sampled = traceID, &parentID, sampled
+	} else {
+		span.TraceID = randomHex(16)
+	}
+	return span
+}
+
+// Traceparent is the 'traceparent' header propagating this span to downstream services.
+func (s *Span) Traceparent() string {
+	flags := "00"
+	if s.sampled {
+		flags = "01"
+	}
+	return fmt.Sprintf("00-%s-%s-%s", s.TraceID, s.SpanID, flags)
+}
+
+// SpanWriter appends finished spans as JSON lines to a collector file.
+// A nil SpanWriter drops the spans.
+type SpanWriter struct {
+	mu   sync.Mutex
+	path string
+}
+
+// NewSpanWriter returns a writer to the given file, or nil when the path is empty.
+func NewSpanWriter(path string) *SpanWriter {
+	if path == "" {
+		return nil
+	}
+	return &SpanWriter{path: path}
+}
+
+// Finish ends the span and exports it.
+func (w *SpanWriter) Finish(span *Span) {
+	if w == nil || !span.sampled {
+		return
+	}
+	end := time.Now()
+	span.Start = float64(span.startTime.UnixMicro()) / 1e6
+	span.End = float64(end.UnixMicro()) / 1e6
+	span.DurationMs = float64(end.Sub(span.startTime).Microseconds()) / 1e3
+
+	line, err := json.Marshal(span)
+	if err != nil {
+		fmt.Println("Failed to encode span:", err)
+		return
+	}
+
+	w.mu.Lock()
+	defer w.mu.Unlock()
+	file, err := os.OpenFile(w.path, os.O_APPEND|os.O_CREATE|os.O_WRONLY, 0o644)
+	if err != nil {
+		fmt.Println("Failed to export span:", err)
+		return
+	}
+	defer file.Close()
+	if _, err := file.Write(append(line, '\n')); err != nil {
+		fmt.Println("Failed to export span:", err)
+	}
+}
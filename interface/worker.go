@@ -1,6 +1,15 @@
 package main
 
-import "github.com/streadway/amqp"
+import (
+	"encoding/json"
+	"fmt"
+	"time"
+
+	"github.com/streadway/amqp"
+)
+
+// MaxPriority is the highest job priority; the queue is declared with this x-max-priority.
+const MaxPriority = 10
 
 type RabbitMQ struct {
 	conn *amqp.Connection
@@ -13,26 +22,67 @@ func NewRabbitMQ(url string, queueName string) (*RabbitMQ, error) {
 		return nil, err
 	}
 
-	ch, err := conn.Channel()
+	ch, err := declareQueue(conn, queueName)
 	if err != nil {
 		conn.Close()
 		return nil, err
 	}
 
-	_, err = ch.QueueDeclare(queueName, false, false, false, false, nil)
+	return &RabbitMQ{conn: conn, ch: ch}, nil
+}
+
+// declareQueue declares the queue with x-max-priority and returns the channel to
+// publish on. A queue declared before priorities were introduced cannot be
+// redeclared with other arguments (the broker closes the channel with
+// PRECONDITION_FAILED); it is then used as it is, without priorities, until it is
+// deleted and redeclared (see the README).
+func declareQueue(conn *amqp.Connection, queueName string) (*amqp.Channel, error) {
+	ch, err := conn.Channel()
 	if err != nil {
+		return nil, err
+	}
+
+	args := amqp.Table{"x-max-priority": int32(MaxPriority)}
+	_, err = ch.QueueDeclare(queueName, false, false, false, false, args)
+	if err == nil {
+		return ch, nil
+	}
+	amqpErr, ok := err.(*amqp.Error)
+	if !ok || amqpErr.Code != amqp.PreconditionFailed {
 		ch.Close()
-		conn.Close()
 		return nil, err
 	}
 
-	return &RabbitMQ{conn: conn, ch: ch}, nil
+	fmt.Println("Queue", queueName, "exists without x-max-priority, publishing without priorities:", err)
+	ch, err = conn.Channel()
+	if err != nil {
+		return nil, err
+	}
+	if _, err = ch.QueueDeclarePassive(queueName, false, false, false, false, nil); err != nil {
+		ch.Close()
+		return nil, err
+	}
+	return ch, nil
 }
 
-func (r *RabbitMQ) Publish(queueName string, body []byte) error {
+// PublishJob publishes the job metadata as JSON with the job's priority. The trace
+// context and the enqueue time (ms since the epoch) are sent as message headers.
+func (r *RabbitMQ) PublishJob(queueName string, job Job, traceparent string) error {
+	body, err := json.Marshal(job)
+	if err != nil {
+		return err
+	}
+
+	now := time.Now()
 	return r.ch.Publish("", queueName, false, false, amqp.Publishing{
-		ContentType: "text/plain",
-		Body:        body,
+		ContentType: "application/json",
+		Priority:    job.Priority,
+		Timestamp:   now,
+		Headers: amqp.Table{
+			"traceparent":   traceparent,
+			"x-enqueued-at": now.UnixMilli(),
+		},
+		Body: body,
 	})
 }
 
@@ -1,65 +1,119 @@
 """
 Module to encode text data into numerical format using OrdinalEncoder.
 This module contains the Encode class, which provides methods to read a CSV file,
-encode categorical columns, and save the encoded data to a new CSV file.
-The encode_csv_data method reads a CSV file, encodes categorical columns using OrdinalEncoder,
-and returns the encoded DataFrame and the fitted OrdinalEncoder.
-The save_encoded_data method saves the encoded DataFrame to a CSV file.
+encode categorical columns, and save the encoded data to a Parquet file.
+The encode_csv_data method streams the CSV file in chunks, builds the category
+vocabularies across all chunks while reservoir-sampling the rows, and returns the
+encoded sample and an OrdinalEncoder fitted with the full vocabularies.
+The save_encoded_data method saves the encoded DataFrame to a Parquet file.
 The save_ordinal_encoder method saves the fitted OrdinalEncoder to a pickle file.
+The save_encoder_lookup method exports the OrdinalEncoder as a JSON lookup table
+(column -> category -> code) that can be used without sklearn.
 The run method orchestrates the encoding process by calling the encode_csv_data,
 saving the encoded data, and saving the OrdinalEncoder.
 """
 
-from typing import Tuple
+from typing import Optional, Tuple
 
+import json
 import pickle
+import hashlib
+import numpy as np
 import pandas as pd
 from sklearn.preprocessing import OrdinalEncoder
 
+from const import CategoricalColumns
+from manifest import atomic_path
+
 
 class Encode:
     """
     Class to encode text data into numerical format.
     """
 
+    # Maximum number of rows kept for training (For testing purposes)
+    SAMPLE_SIZE = 100000
+    RANDOM_STATE = 42
+
     @staticmethod
     def _encode_csv_data(
-        x_cols: list, y_cols: list, transformed_data_path: str
+        x_cols: list,
+        y_cols: list,
+        transformed_data_path: str,
+        chunk_size: int = 100000,
+        sample_size: int = SAMPLE_SIZE,
+        random_state: int = RANDOM_STATE,
     ) -> Tuple[pd.DataFrame, OrdinalEncoder]:
         """
-        Reads a CSV file, encodes categorical columns using OrdinalEncoder,
+        Reads a CSV file in chunks, encodes categorical columns using OrdinalEncoder,
         and returns the encoded DataFrame and the fitted OrdinalEncoder.
+
+        Only 'chunk_size' rows and the sample are held in memory. The sample is a
+        uniform random sample of 'sample_size' rows, drawn by keeping the rows with
+        the smallest random keys, while the vocabularies cover every row of the file.
         Args:
+            x_cols (list): List of feature column names.
+            y_cols (list): List of target column names.
             transformed_data_path (str): Path to the input CSV file.
+            chunk_size (int): Number of rows read at a time. Default is 100000.
+            sample_size (int): Maximum number of rows kept. Default is SAMPLE_SIZE.
+            random_state (int): Seed of the sample. Default is RANDOM_STATE.
         Returns:
             Tuple[pd.DataFrame, OrdinalEncoder]: A tuple containing the encoded DataFrame
             and the fitted OrdinalEncoder.
         """
-        df = pd.read_csv(transformed_data_path, encoding="utf-8", low_memory=False)
-
-        # Select only relevant columns from the DataFrame
+        # Select only relevant columns from the CSV file
         x_y_cols = x_cols + y_cols
-        df = df[x_y_cols]
+        categorical_columns = [
+            column for column in CategoricalColumns().to_list() if column in x_y_cols
+        ]
 
-        categorical_columns = df.select_dtypes(include=["object"]).columns
-        oe = OrdinalEncoder()
-        df[categorical_columns] = oe.fit_transform(df[categorical_columns])
+        rng = np.random.default_rng(random_state)
+        vocabularies = {column: set() for column in categorical_columns}
+        has_missing = {column: False for column in categorical_columns}
+        sample = None
+
+        chunks = pd.read_csv(
+            transformed_data_path,
+            encoding="utf-8",
+            usecols=x_y_cols,
+            dtype={column: "object" for column in categorical_columns},
+            chunksize=chunk_size,
+        )
+        for chunk in chunks:
+            for column in categorical_columns:
+                vocabularies[column].update(chunk[column].dropna().unique())
+                has_missing[column] = has_missing[column] or chunk[column].isna().any()
+
+            chunk["_sample_key"] = rng.random(len(chunk))
+            if sample is not None:
+                chunk = pd.concat([sample, chunk])
+            sample = chunk.nsmallest(sample_size, "_sample_key")
 
-        # Limit df to 100000 rows (For testing purposes)
-        if len(df) > 100000:
-            df = df.sample(100000, random_state=42)
+        # Keep the rows in file order
+        df = sample.sort_index().drop(columns="_sample_key")[x_y_cols]
+
+        # Sorted categories with missing values last, as OrdinalEncoder would learn
+        # them from the full file
+        categories = [
+            sorted(vocabularies[column]) + ([np.nan] if has_missing[column] else [])
+            for column in categorical_columns
+        ]
+        oe = OrdinalEncoder(categories=categories)
+        df[categorical_columns] = oe.fit_transform(df[categorical_columns])
 
         return df, oe
 
     @staticmethod
     def _save_encoded_data(df: pd.DataFrame, encoded_data_path: str):
         """
-        Saves the encoded DataFrame to a CSV file.
+        Saves the encoded DataFrame to a Parquet file.
         Args:
             df (pd.DataFrame): The encoded DataFrame.
-            encoded_data_path (str): Path to the output CSV file.
+            encoded_data_path (str): Path to the output Parquet file.
         """
-        df.to_csv(encoded_data_path, index=False)
+        with atomic_path(encoded_data_path) as temporary_path:
+            df.to_parquet(temporary_path, index=False)
 
     @staticmethod
     def _save_ordinal_encoder(oe, ordinal_encoder_path: str):
@@ -72,8 +126,36 @@ class Encode:
         if ".pkl" not in ordinal_encoder_path:
             ordinal_encoder_path += ".pkl"
 
-        with open(ordinal_encoder_path, "wb") as f:
-            pickle.dump(oe, f)
+        with atomic_path(ordinal_encoder_path) as temporary_path:
+            with open(temporary_path, "wb") as f:
+                pickle.dump(oe, f)
+
+    @staticmethod
+    def _save_encoder_lookup(oe: OrdinalEncoder, encoder_lookup_path: str):
+        """
+        Saves the fitted OrdinalEncoder as a JSON lookup table.
+
+        The table maps every column to its categories and their codes, and carries a
+        version derived from its contents. Missing values are not listed; they are
+        encoded as NaN.
+        Args:
+            oe (OrdinalEncoder): The fitted OrdinalEncoder.
+            encoder_lookup_path (str): Path to save the lookup table.
+        """
+        columns = {
+            column: {
+                str(category): code
+                for code, category in enumerate(categories)
+                if not pd.isna(category)
+            }
+            for column, categories in zip(oe.feature_names_in_, oe.categories_)
+        }
+        content = json.dumps(columns, sort_keys=True)
+        version = hashlib.sha256(content.encode()).hexdigest()[:16]
+
+        with atomic_path(encoder_lookup_path) as temporary_path:
+            with open(temporary_path, "w") as f:
+                json.dump({"version": version, "columns": columns}, f)
 
     def run(
         self,
@@ -82,11 +164,18 @@ class Encode:
         transformed_data_path: str,
         encoded_data_path: str,
         ordinal_encoder_path: str,
+        chunk_size: int = 100000,
+        encoder_lookup_path: Optional[str] = None,
     ):
         """
         Orchestrates the encoding process by calling the encode_csv_data,
-        saving the encoded data, and saving the OrdinalEncoder.
+        saving the encoded data, and saving the OrdinalEncoder and, if a path is
+        given, its lookup table.
         """
-        df, oe = self._encode_csv_data(x_cols, y_cols, transformed_data_path)
+        df, oe = self._encode_csv_data(
+            x_cols, y_cols, transformed_data_path, chunk_size
+        )
         self._save_encoded_data(df, encoded_data_path)
         self._save_ordinal_encoder(oe, ordinal_encoder_path)
+        if encoder_lookup_path:
+            self._save_encoder_lookup(oe, encoder_lookup_path)
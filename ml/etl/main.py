@@ -1,22 +1,84 @@
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Make the shared ml.inference package importable when run as 'python ml/etl/main.py'
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
 from const import Columns
 from encode import Encode
+from manifest import Manifest, atomic_paths
 from train import Train
 
 
-def main():
+def process_model_group(
+    model_group: str,
+    pre_fix: str,
+    n_jobs: int,
+    chunk_size: int,
+    manifest: Manifest,
+    force: bool = False,
+) -> tuple:
+    """
+    Encode the data of a model group and train its model, unless its inputs did
+    not change since the last run.
+
+    Runs in a worker process of the ETL process pool.
+
+    Args:
+        model_group (str): File name of the model group, e.g. 'A.csv'.
+        pre_fix (str): Directory of the ML data.
+        n_jobs (int): Number of cores used to fit the forest.
+        chunk_size (int): Number of CSV rows encoded at a time.
+        manifest (Manifest): Fingerprints of the previous run.
+        force (bool): Retrain even if the inputs did not change. Default is False.
+
+    Returns:
+        tuple: The model group, the fingerprint of its inputs and whether it was trained.
+    """
     x_cols = Columns.X
     y_cols = [Columns.TARGET]
 
-    pre_fix = "ml/data/"
+    transformed_data_path = f"{pre_fix}/transformed-data/{model_group}"  # csv path
+    encoded_data_path = f"{pre_fix}/encoded-data/encoded_{model_group}".replace(
+        ".csv", ".parquet"
+    )  # parquet path
+    ordinal_encoder_path = f"{pre_fix}/encoder/ordinal_encoder_{model_group}".replace(
+        ".csv", ".pkl"
+    )  # pkl path
+    encoder_lookup_path = ordinal_encoder_path.replace(".pkl", ".json")  # json path
+    onnx_path = f"{pre_fix}/models/model_{model_group}".replace(".csv", ".onnx")
+    pkl_path = f"{pre_fix}/models/model_{model_group}".replace(".csv", ".pkl")
+    npz_path = f"{pre_fix}/models/model_{model_group}".replace(".csv", ".npz")
+
+    hyperparameters = {
+        "sample_size": Encode.SAMPLE_SIZE,
+        "sample_random_state": Encode.RANDOM_STATE,
+        "model_params": Train.MODEL_PARAMS,
+        "test_size": Train.TEST_SIZE,
+        "onnx_opset": Train.ONNX_OPSET,
+    }
+    fingerprint = Manifest.fingerprint(
+        transformed_data_path, x_cols, y_cols, hyperparameters
+    )
+    outputs = [ordinal_encoder_path, encoder_lookup_path, onnx_path, pkl_path, npz_path]
+    if not force and manifest.is_current(model_group, fingerprint, outputs):
+        print(f"Model group {model_group} is unchanged, skipping")
+        return model_group, fingerprint, False
 
-    for model_group in ["A.csv", "B.csv", "C.csv"]:
-        print(f"Processing model group: {model_group}")
+    print(f"Processing model group: {model_group}")
 
-        transformed_data_path = f"{pre_fix}/transformed-data/{model_group}"  # csv path
-        encoded_data_path = f"{pre_fix}/encoded-data/encoded_{model_group}"  # csv path
-        ordinal_encoder_path = f"{pre_fix}/encoder/ordinal_encoder_{model_group}".replace(
-            ".csv", ".pkl"
-        )  # pkl path
+    # Stage the encoder and the models under temporary names and swap them in as
+    # a set once the model is trained, so the services never encode with a new
+    # encoder for an old model or the other way around
+    with atomic_paths(*outputs) as staged_outputs:
+        (
+            staged_encoder_path,
+            staged_lookup_path,
+            staged_onnx_path,
+            staged_pkl_path,
+            staged_npz_path,
+        ) = staged_outputs
 
         # Initialize the Encode class and run the encoding process
         Encode().run(
@@ -24,16 +86,64 @@ def main():
             y_cols,
             transformed_data_path,
             encoded_data_path,
-            ordinal_encoder_path,
+            staged_encoder_path,
+            chunk_size,
+            staged_lookup_path,
         )
 
-        onnx_path = f"{pre_fix}/models/model_{model_group}".replace(".csv", ".onnx")
-        pkl_path = f"{pre_fix}/models/model_{model_group}".replace(".csv", ".pkl")
-
         # Initialize the Train class and run the training process
-        Train().run(encoded_data_path, x_cols, y_cols, onnx_path, pkl_path)
+        Train().run(
+            encoded_data_path,
+            x_cols,
+            y_cols,
+            staged_onnx_path,
+            staged_pkl_path,
+            n_jobs=n_jobs,
+            npz_path=staged_npz_path,
+        )
+
+    print(f"Finished processing model group: {model_group}")
+    return model_group, fingerprint, True
+
+
+def main():
+    pre_fix = "ml/data/"
+    model_groups = ["A.csv", "B.csv", "C.csv"]
+
+    # Split the CPU budget between model groups running in parallel and the
+    # cores each forest is fitted with, so the two never oversubscribe the host
+    cpu_budget = max(1, int(os.getenv("ETL_CPU_BUDGET", os.cpu_count() or 1)))
+    group_workers = min(len(model_groups), cpu_budget)
+    n_jobs = max(1, cpu_budget // group_workers)
+    chunk_size = int(os.getenv("ETL_CHUNK_SIZE", "100000"))
+
+    # Set ETL_FORCE to retrain every model group regardless of the manifest
+    force = os.getenv("ETL_FORCE", "false").lower() in ("1", "true", "yes")
+    manifest = Manifest(f"{pre_fix}/manifest.json")
+
+    print(
+        f"Running {group_workers} model groups in parallel with {n_jobs} cores each "
+        f"(CPU budget {cpu_budget})"
+    )
 
-        print(f"Finished processing model group: {model_group}")
+    with ProcessPoolExecutor(max_workers=group_workers) as executor:
+        futures = [
+            executor.submit(
+                process_model_group,
+                model_group,
+                pre_fix,
+                n_jobs,
+                chunk_size,
+                manifest,
+                force,
+            )
+            for model_group in model_groups
+        ]
+        for future in as_completed(futures):
+            # Re-raise the first failure of a model group
+            model_group, fingerprint, trained = future.result()
+            if trained:
+                manifest.update(model_group, fingerprint)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,139 @@
+"""
+Module to keep track of the inputs each model group was trained with.
+This module contains the Manifest class, which stores per model group a fingerprint
+of the training inputs (content hash of the transformed CSV, feature and target
+columns, hyperparameters) in a JSON file next to the artifacts. A model group whose
+fingerprint did not change since the last run does not need to be retrained.
+The atomic_path and atomic_paths functions let artifacts be written under a
+temporary name and moved into place once complete, so readers never load a
+half-written file or a mix of two runs' artifacts.
+"""
+
+import os
+import json
+import hashlib
+from contextlib import contextmanager
+
+
+def compute_file_digest(file_path: str, block_size: int = 1 << 20) -> str:
+    """
+    Compute the SHA-256 digest of a file's contents.
+    Args:
+        file_path (str): Path to the file.
+        block_size (int): Number of bytes read at a time.
+    Returns:
+        str: The hexadecimal digest.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@contextmanager
+def atomic_path(file_path: str):
+    """
+    Context manager yielding a temporary path that replaces 'file_path' on success.
+
+    The temporary file is hidden and lives in the same directory, so the final
+    os.replace is atomic. It is removed if writing fails.
+    Args:
+        file_path (str): Final path of the file.
+    """
+    with atomic_paths(file_path) as (temporary_path,):
+        yield temporary_path
+
+
+@contextmanager
+def atomic_paths(*file_paths: str):
+    """
+    Context manager yielding temporary paths that replace 'file_paths' together.
+
+    Nothing is moved into place until every file has been written, and then all
+    of them are replaced one right after the other, so readers do not pair a new
+    artifact with one from a previous run. All are removed if writing fails.
+    Args:
+        *file_paths (str): Final paths of the files.
+    """
+    temporary_paths = []
+    for file_path in file_paths:
+        directory, file_name = os.path.split(file_path)
+        temporary_paths.append(
+            os.path.join(directory, f".{file_name}.tmp-{os.getpid()}")
+        )
+    try:
+        yield temporary_paths
+        for temporary_path, file_path in zip(temporary_paths, file_paths):
+            os.replace(temporary_path, file_path)
+    finally:
+        for temporary_path in temporary_paths:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+
+class Manifest:
+    """
+    Class to read and write the fingerprints of the trained model groups.
+    """
+
+    def __init__(self, manifest_path: str):
+        """
+        Load the manifest, or start an empty one if the file does not exist.
+        Args:
+            manifest_path (str): Path to the manifest JSON file.
+        """
+        self.manifest_path = manifest_path
+        try:
+            with open(manifest_path) as f:
+                self.groups = json.load(f).get("groups", {})
+        except FileNotFoundError:
+            self.groups = {}
+
+    @staticmethod
+    def fingerprint(
+        transformed_data_path: str, x_cols: list, y_cols: list, hyperparameters: dict
+    ) -> dict:
+        """
+        Build the fingerprint of a model group's training inputs.
+        Args:
+            transformed_data_path (str): Path to the input CSV file.
+            x_cols (list): List of feature column names.
+            y_cols (list): List of target column names.
+            hyperparameters (dict): Settings of the encoding and training.
+        Returns:
+            dict: The fingerprint.
+        """
+        return {
+            "input_sha256": compute_file_digest(transformed_data_path),
+            "x_cols": list(x_cols),
+            "y_cols": list(y_cols),
+            "hyperparameters": hyperparameters,
+        }
+
+    def is_current(self, model_group: str, fingerprint: dict, artifact_paths: list) -> bool:
+        """
+        Check whether a model group was trained with the same inputs and its
+        artifacts are still present.
+        Args:
+            model_group (str): The model group.
+            fingerprint (dict): The fingerprint of the current inputs.
+            artifact_paths (list): Paths of the artifacts of the model group.
+        Returns:
+            bool: True if the model group does not need to be retrained.
+        """
+        return self.groups.get(model_group) == fingerprint and all(
+            os.path.exists(path) for path in artifact_paths
+        )
+
+    def update(self, model_group: str, fingerprint: dict):
+        """
+        Record the fingerprint of a trained model group and save the manifest.
+        Args:
+            model_group (str): The model group.
+            fingerprint (dict): The fingerprint of the inputs it was trained with.
+        """
+        self.groups[model_group] = fingerprint
+        with atomic_path(self.manifest_path) as temporary_path:
+            with open(temporary_path, "w") as f:
+                json.dump({"groups": self.groups}, f, indent=2, sort_keys=True)
@@ -2,16 +2,21 @@
 Module to train a Random Forest model and save it in different formats.
 This module contains the Train class, which provides methods to load data,
 train a Random Forest model, and save the trained model in different formats.
-The load_data method reads a CSV file and returns a DataFrame.
+The load_data method reads a Parquet (or CSV) file and returns a DataFrame.
 The train_model method trains a Random Forest model on the provided DataFrame
 and evaluates its performance using Mean Squared Error.
 The save_model_with_pkl method saves the model using pickle format.
 The save_model_with_joblib method saves the model using joblib format.
 The save_model_with_onnx method saves the model using ONNX format.
+The save_model_with_flat_forest method saves the model as packed node arrays for
+the NumPy evaluator, after checking its predictions against sklearn.
 The run method orchestrates the training process by loading the data,
 training the model, and saving it in different formats.
 """
 
+from typing import Optional, Tuple
+
+import numpy as np
 import pandas as pd
 import pickle
 from sklearn.ensemble import RandomForestRegressor
@@ -19,35 +24,47 @@ from sklearn.model_selection import train_test_split
 from skl2onnx import convert_sklearn
 from skl2onnx.common.data_types import FloatTensorType
 
+from manifest import atomic_path
+from ml.inference.forest import FlatForest
+
 
 class Train:
     """
     Class to train a Random Forest model and save it in different formats.
     """
 
+    MODEL_PARAMS = {"n_estimators": 100, "random_state": 42}
+    TEST_SIZE = 0.2
+    ONNX_OPSET = 8  # ONNX opset version 8 is used
+
     @staticmethod
     def _load_data(encoded_data_path: str) -> pd.DataFrame:
         """
-        Load the encoded data from a CSV file.
+        Load the encoded data from a Parquet or CSV file.
         Args:
-            encoded_data_path (str): Path to the encoded CSV file.
+            encoded_data_path (str): Path to the encoded Parquet or CSV file.
         Returns:
             pd.DataFrame: The loaded DataFrame.
         """
+        if encoded_data_path.endswith(".parquet"):
+            return pd.read_parquet(encoded_data_path)
         return pd.read_csv(encoded_data_path)
 
-    @staticmethod
+    @classmethod
     def _train_model(
-        df: pd.DataFrame, x_cols: list, y_cols: list
-    ) -> RandomForestRegressor:
+        cls,
+        df: pd.DataFrame, x_cols: list, y_cols: list, n_jobs: int = 1
+    ) -> Tuple[RandomForestRegressor, pd.DataFrame]:
         """
         Train a Random Forest model on the provided DataFrame.
         Args:
             df (pd.DataFrame): The DataFrame containing the data.
             x_cols (list): List of feature column names.
             y_cols (list): List of target column names.
+            n_jobs (int): Number of cores used to fit the trees. Default is 1.
         Returns:
-            RandomForestRegressor: The trained Random Forest model.
+            Tuple[RandomForestRegressor, pd.DataFrame]: The trained Random Forest model
+            and the held-out test features.
         """
         # Split the data into features and target
         X = df[x_cols]
@@ -55,19 +72,23 @@ class Train:
 
         # Split the data into training and testing sets
         X_train, X_test, y_train, y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42
+            X, y, test_size=cls.TEST_SIZE, random_state=42
         )
 
         # Train the Random Forest model
-        model = RandomForestRegressor(n_estimators=100, random_state=42)
+        model = RandomForestRegressor(**cls.MODEL_PARAMS, n_jobs=n_jobs)
         model.fit(X_train, y_train)
 
         print(f"Model Score: {model.score(X_test, y_test)}")
 
-        return model
+        # Predicting with the exported model must not depend on the training host's cores
+        model.set_params(n_jobs=None)
 
-    @staticmethod
+        return model, X_test
+
+    @classmethod
     def _save_model_with_onnx(
+        cls,
         model: RandomForestRegressor, x_cols: list, file_path: str
     ):
         """
@@ -82,11 +103,12 @@ class Train:
 
         initial_type = [("float_input", FloatTensorType([None, len(x_cols)]))]
         onnx_model = convert_sklearn(
-            model, initial_types=initial_type, target_opset=8
-        )  # ONNX opset version 8 is used
+            model, initial_types=initial_type, target_opset=cls.ONNX_OPSET
+        )
 
-        with open(file_path, "wb") as f:
-            f.write(onnx_model.SerializeToString())
+        with atomic_path(file_path) as temporary_path:
+            with open(temporary_path, "wb") as f:
+                f.write(onnx_model.SerializeToString())
 
     @staticmethod
     def _save_model_with_pkl(model: RandomForestRegressor, file_path: str):
@@ -100,8 +122,37 @@ class Train:
         if ".pkl" not in file_path:
             file_path += ".pkl"
 
-        with open(file_path, "wb") as f:
-            pickle.dump(model, f)
+        with atomic_path(file_path) as temporary_path:
+            with open(temporary_path, "wb") as f:
+                pickle.dump(model, f)
+
+    @staticmethod
+    def _save_model_with_flat_forest(
+        model: RandomForestRegressor, X_test: pd.DataFrame, file_path: str
+    ):
+        """
+        Save the model as a FlatForest.
+        Args:
+            model (RandomForestRegressor): The trained Random Forest model.
+            X_test (pd.DataFrame): Rows the flattened model is checked on.
+            file_path (str): Path to save the model.
+        Raises:
+            ValueError: If the flattened model does not reproduce sklearn's predictions.
+        """
+        if ".npz" not in file_path:
+            file_path += ".npz"
+
+        forest = FlatForest.from_sklearn(model)
+        expected = model.predict(X_test)
+        actual = forest.predict(X_test.to_numpy())
+        if not np.allclose(actual, expected, rtol=1e-6, atol=1e-6):
+            raise ValueError(
+                "Flattened forest diverges from sklearn, max abs error "
+                f"{np.max(np.abs(actual - expected))}"
+            )
+
+        with atomic_path(file_path) as temporary_path:
+            forest.save(temporary_path)
 
     def run(
         self,
@@ -110,13 +161,17 @@ class Train:
         y_cols: list,
         onnx_path: str,
         pkl_path,
+        n_jobs: int = 1,
+        npz_path: Optional[str] = None,
     ):
         """
         Orchestrates the training process by loading the data,
         training the model, and saving it in different formats.
         """
         df = self._load_data(encoded_data_path)
-        model = self._train_model(df, x_cols, y_cols)
+        model, X_test = self._train_model(df, x_cols, y_cols, n_jobs)
 
         self._save_model_with_onnx(model, x_cols, onnx_path)
         self._save_model_with_pkl(model, pkl_path)
+        if npz_path:
+            self._save_model_with_flat_forest(model, X_test, npz_path)
@@ -4,19 +4,40 @@ This module sets up the FastAPI application, defines the API routes,
 and handles the model inference logic.
 """
 
+import os
+import hmac
+import time
+import uuid
+import asyncio
 import warnings
+from typing import List, Optional
 
 import pickle
 import numpy as np
 import pandas as pd
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
 from sklearn.preprocessing import OrdinalEncoder
 from ratelimit import limits, sleep_and_retry
 
 from ml.inference.const import ModelInferenceRequest
 from ml.inference.decorator import measure_execution_time
+from ml.inference.encoding import encode_features
+from ml.inference.forest import FlatForest
+from ml.inference.lanes import LaneFullError, TrafficLanes
+from ml.inference.memory import read_memory_usage
+from ml.inference.preload import MODEL_GROUPS, PreloadedModels
+from ml.inference.profiler import (
+    ProfilerBusyError,
+    RequestProfiler,
+    WorkerProfiler,
+    to_collapsed,
+    to_speedscope,
+)
 from ml.inference.redis_ai_client import RedisAIClient
 from ml.inference.redis_client import RedisClient
+from ml.inference.tracing import TraceContext, Tracer
 
 # Suppress specific warnings
 warnings.filterwarnings(
@@ -30,12 +51,21 @@ class InferenceAPI:
     InferenceAPI class to handle the FastAPI application and prediction requests.
     """
 
+    # Largest number of rows accepted by '/predict/onnx/batch'
+    MAX_BATCH_ROWS = 1000
+
     def __init__(
         self,
         redis_client: RedisClient,
         redis_ai_client: RedisAIClient,
         categorical_columns: list,
         numerical_columns: list,
+        traffic_lanes: TrafficLanes,
+        pickle_backend: str = "sklearn",
+        admin_token: Optional[str] = None,
+        request_profiler: Optional[RequestProfiler] = None,
+        tracer: Optional[Tracer] = None,
+        preloaded_models: Optional[PreloadedModels] = None,
     ):
         """
         Initialize the InferenceAPI class.
@@ -45,36 +75,120 @@ class InferenceAPI:
             redis_ai_client (RedisAIClient): RedisAI client for model inference.
             categorical_columns (list): List of categorical column names.
             numerical_columns (list): List of numerical column names.
+            traffic_lanes (TrafficLanes): Admission control for real-time and batch
+                requests in front of RedisAI.
+            pickle_backend (str): Evaluator behind '/predict/pickle', either 'sklearn'
+                (the pickled model, loaded per request) or 'flat' (the flattened
+                NumPy forest, loaded once per model group). Default is 'sklearn'.
+            admin_token (Optional[str]): Token required in the 'X-Admin-Token' header
+                of the '/admin' endpoints. They are disabled when it is not set.
+            request_profiler (Optional[RequestProfiler]): Profiles a sample of the
+                requests, served by '/admin/profile/requests'. Disabled if None.
+            tracer (Optional[Tracer]): Records a span for every request carrying a
+                'traceparent' header. Disabled if None.
+            preloaded_models (Optional[PreloadedModels]): Models and encoders loaded
+                before the workers were forked. Used instead of loading them from
+                disk or Redis. Default is None.
+
+        Raises:
+            ValueError: If the pickle backend is unknown.
         """
+        if pickle_backend not in ("sklearn", "flat"):
+            raise ValueError(f"Unknown pickle backend: {pickle_backend}")
+
         self.app = FastAPI()
         self.redis_client = redis_client
         self.redis_ai_client = redis_ai_client
         self.categorical_columns = categorical_columns
         self.numerical_columns = numerical_columns
+        self.traffic_lanes = traffic_lanes
+        self.pickle_backend = pickle_backend
+        self._lookup_table_versions = {}  # encoder key -> (file signature, version)
+        self._model_signatures = {}  # model group -> signature of the served ONNX file
+        self._flat_forests = {}
+        self._pickle_models = {}
+        self._preloaded_encoders = {}
+        if preloaded_models is not None:
+            self._flat_forests.update(preloaded_models.flat_forests)
+            self._pickle_models.update(preloaded_models.pickle_models)
+            self._preloaded_encoders.update(preloaded_models.encoders)
+        self.admin_token = admin_token
+        self.request_profiler = request_profiler
+        self.worker_profiler = WorkerProfiler()
+        self.tracer = tracer
 
         self._initialize_models()
         self._setup_routes()
+        self._setup_profiling()
+        self._setup_tracing()
 
     def _initialize_models(self):
         """
         Load and set models in RedisAI.
         """
-        model_keys = ["model_A", "model_B", "model_C"]
-        for key in model_keys:
-            self.redis_ai_client.set_model(
-                model_key=key, model_path=key, file_extension=".onnx"
-            )
+        for model_group in MODEL_GROUPS:
+            self._refresh_model(model_group)
+
+    def _refresh_model(self, model_group: str):
+        """
+        Set the ONNX model of a model group in RedisAI again if its file changed.
+
+        The file is stat'ed on every call, which is cheap; it is only read when its
+        signature differs from the one of the model this worker last set, and
+        RedisAI's copy is only replaced when the file's digest differs from it.
+
+        Args:
+            model_group (str): The model group of the model.
+
+        Raises:
+            ValueError: If the model group has no ONNX model.
+        """
+        model_key = f"model_{model_group}"
+        try:
+            stat = os.stat(f"{self.redis_ai_client.data_path}/models/{model_key}.onnx")
+        except FileNotFoundError:
+            raise ValueError(f"No ONNX model for model group {model_group}") from None
+        signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if self._model_signatures.get(model_group) == signature:
+            return
+
+        self.redis_ai_client.set_model(
+            model_key=model_key, model_path=model_key, file_extension=".onnx"
+        )
+        self._model_signatures[model_group] = signature
+
+    def _load_flat_forest(self, model_group: str) -> FlatForest:
+        """
+        Load the flattened forest of a model group, once.
+
+        Args:
+            model_group (str): The model group to load the forest for.
+
+        Returns:
+            FlatForest: The loaded forest.
+        """
+        forest = self._flat_forests.get(model_group)
+        if forest is None:
+            forest = FlatForest.load(f"/ml/data/models/model_{model_group}.npz")
+            self._flat_forests[model_group] = forest
+        return forest
 
     def _load_encoder(self, model_group: str) -> OrdinalEncoder:
         """
         Load the OrdinalEncoder for the specified model group.
 
+        A preloaded encoder is used when there is one, otherwise it is read from Redis.
+
         Args:
             model_group (str): The model group to load the encoder for.
 
         Returns:
             OrdinalEncoder: The loaded encoder.
         """
+        encoder = self._preloaded_encoders.get(model_group)
+        if encoder is not None:
+            return encoder
+
         encoder_key = f"ordinal_encoder_{model_group}"
         encoder = self.redis_client.retrieve_object(encoder_key)
 
@@ -85,6 +199,94 @@ class InferenceAPI:
 
         return encoder
 
+    def _lookup_table_version(self, encoder_key: str) -> Optional[str]:
+        """
+        Get the version of the ETL's lookup table export of an encoder.
+
+        The export is stat'ed on every call, like the ONNX models, and its version
+        read again when the file was replaced, so a retrained encoder is used from
+        the same request on as the model trained with it.
+
+        Args:
+            encoder_key (str): The key of the encoder.
+
+        Returns:
+            Optional[str]: The version, or None if the encoder has no lookup table.
+        """
+        try:
+            stat = os.stat(f"{self.redis_client.data_path}/encoder/{encoder_key}.json")
+            signature = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            signature = None
+
+        cached = self._lookup_table_versions.get(encoder_key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        version = None
+        if signature is not None:
+            version = self.redis_client.read_lookup_table_version(encoder_key)
+        if version is None:
+            print(f"No lookup table for {encoder_key}, using the pickled encoder")
+        self._lookup_table_versions[encoder_key] = (signature, version)
+        return version
+
+    def _encode_with_lookup_table(
+        self, rows: List[dict], model_group: str
+    ) -> Optional[np.ndarray]:
+        """
+        Encode rows with the encoder lookup table of the model group in Redis.
+
+        The codes of the distinct categories of all rows and the version of the
+        table are read with a single HMGET. The table is (re)loaded into Redis from
+        the ETL's JSON export when it is missing or its version differs from the
+        export's.
+
+        Args:
+            rows (List[dict]): The feature values of the rows.
+            model_group (str): The model group to use for encoding.
+
+        Returns:
+            Optional[np.ndarray]: The encoded input data, or None if the model group
+            has no lookup table.
+
+        Raises:
+            ValueError: If a category is unknown to the encoder.
+        """
+        encoder_key = f"ordinal_encoder_{model_group}"
+        expected_version = self._lookup_table_version(encoder_key)
+        if expected_version is None:
+            return None
+
+        row_fields = [
+            [f"{column}:{row[column]}" for column in self.categorical_columns]
+            for row in rows
+        ]
+        fields = list(dict.fromkeys(field for fields in row_fields for field in fields))
+        codes, version = self.redis_client.lookup_codes(encoder_key, fields)
+        if version != expected_version:
+            # Missing, expired, or left by a previous training run
+            stored_version = self.redis_client.store_lookup_table(encoder_key)
+            if stored_version != expected_version:
+                # The export was replaced or removed since it was stat'ed
+                self._lookup_table_versions.pop(encoder_key, None)
+            if stored_version is None:
+                return None
+            print(f"Loaded lookup table {encoder_key} into Redis (version {stored_version})")
+            codes, version = self.redis_client.lookup_codes(encoder_key, fields)
+
+        unknown = [field for field, code in zip(fields, codes) if code is None]
+        if unknown:
+            raise ValueError(f"Found unknown categories {unknown} during encoding")
+
+        code_of = dict(zip(fields, codes))
+        values = [
+            [row[column] for column in self.numerical_columns]
+            + [code_of[field] for field in fields_of_row]
+            for row, fields_of_row in zip(rows, row_fields)
+        ]
+        return np.array(values, dtype=np.float32)
+
     def _prepare_input_data(
         self,
         request_data: ModelInferenceRequest,
@@ -100,22 +302,112 @@ class InferenceAPI:
         Returns:
             np.ndarray: The prepared input data as a NumPy array.
         """
+        return self._prepare_batch_input_data([request_data], model_group)
+
+    def _prepare_batch_input_data(
+        self,
+        rows: List[ModelInferenceRequest],
+        model_group: str,
+    ) -> np.ndarray:
+        """
+        Prepare the input data of rows of one model group for model inference.
+
+        The encoder lookup table is used when available, the pickled encoder otherwise.
+
+        Args:
+            rows (List[ModelInferenceRequest]): The input data of the rows.
+            model_group (str): The model group to use for encoding.
+
+        Returns:
+            np.ndarray: The prepared input data as a NumPy array, one row per input row.
+        """
+        rows = [row.model_dump() for row in rows]
+        input_data = self._encode_with_lookup_table(rows, model_group)
+        if input_data is not None:
+            return input_data
+
         # Convert input data to a DataFrame
-        input_df = pd.DataFrame([request_data.model_dump()])
+        input_df = pd.DataFrame(rows)
 
-        # Encode categorical columns
+        # Encode categorical columns and combine them with the numerical data
         encoder = self._load_encoder(model_group)
-        encoded_categorical_data = encoder.transform(input_df[self.categorical_columns])
+        return encode_features(
+            input_df, encoder, self.categorical_columns, self.numerical_columns
+        )
 
-        # Replace categorical columns with encoded data
-        input_df[self.categorical_columns] = encoded_categorical_data
+    def _predict_with_onnx_model(self, request_data: ModelInferenceRequest) -> float:
+        """
+        Run the ONNX model of the request's model group in RedisAI.
 
-        # Combine numerical and encoded categorical data
-        input_data = np.hstack(
-            [input_df[self.numerical_columns].values, encoded_categorical_data]
-        )
+        Tensor keys are unique per request so that concurrent requests do not
+        overwrite each other's tensors, and are deleted afterwards.
+
+        Args:
+            request_data (ModelInferenceRequest): The input data for prediction.
+
+        Returns:
+            float: The predicted price.
+        """
+        model_group = request_data.model_group
+        model_key = f"model_{model_group}"
+
+        self._refresh_model(model_group)
+        input_data = self._prepare_input_data(request_data, model_group)
+        request_id = uuid.uuid4().hex
+        input_tensor_key = f"float_input:{request_id}"
+        output_tensor_key = f"variable:{request_id}"
+        try:
+            self.redis_ai_client.set_tensor(input_tensor_key, input_data)
+            prediction_output = self.redis_ai_client.execute_model(
+                model_key, input_tensor_key, output_tensor_key
+            )
+        finally:
+            self.redis_ai_client.delete_tensors(input_tensor_key, output_tensor_key)
+
+        return float(prediction_output[0][0])
+
+    def _predict_batch_with_onnx_model(
+        self, rows: List[ModelInferenceRequest]
+    ) -> List[float]:
+        """
+        Run the ONNX models on a batch of rows, with one RedisAI execution per model group.
+
+        The rows of a model group are encoded together, with one lookup table read.
+
+        Args:
+            rows (List[ModelInferenceRequest]): The rows to predict.
+
+        Returns:
+            List[float]: The predicted prices, in the order of the rows.
 
-        return input_data.astype(np.float32)
+        Raises:
+            ValueError: If a row has a category unknown to its encoder.
+        """
+        positions_by_group = {}
+        for position, row in enumerate(rows):
+            positions_by_group.setdefault(row.model_group, []).append(position)
+
+        predictions = [0.0] * len(rows)
+        for model_group, positions in positions_by_group.items():
+            self._refresh_model(model_group)
+            input_data = self._prepare_batch_input_data(
+                [rows[position] for position in positions], model_group
+            )
+            request_id = uuid.uuid4().hex
+            input_tensor_key = f"float_input:{request_id}"
+            output_tensor_key = f"variable:{request_id}"
+            try:
+                self.redis_ai_client.set_tensor(input_tensor_key, input_data)
+                output = self.redis_ai_client.execute_model(
+                    f"model_{model_group}", input_tensor_key, output_tensor_key
+                )
+            finally:
+                self.redis_ai_client.delete_tensors(input_tensor_key, output_tensor_key)
+
+            for position, prediction in zip(positions, np.asarray(output).reshape(-1)):
+                predictions[position] = float(prediction)
+
+        return predictions
 
     def _setup_routes(self):
         """
@@ -126,35 +418,86 @@ class InferenceAPI:
         @limits(calls=20, period=1)  # Limit to 20 requests per second
         @self.app.post("/predict/onnx")
         @measure_execution_time
-        async def predict_with_onnx(request_data: ModelInferenceRequest) -> dict:
+        async def predict_with_onnx(
+            request_data: ModelInferenceRequest,
+            x_traffic_class: str = Header(default=TrafficLanes.REALTIME),
+        ) -> dict:
             """
             Predict using an ONNX model stored in RedisAI.
 
+            Requests are admitted through the lane of their traffic class, taken
+            from the 'X-Traffic-Class' header ('realtime' or 'batch').
+
             Args:
                 request_data (ModelInferenceRequest): The input data for prediction.
+                x_traffic_class (str): The traffic class of the request.
 
             Returns:
                 dict: The predicted price.
             """
-            model_group = request_data.model_group
-            model_key = f"model_{model_group}"
+            traffic_class = self.traffic_lanes.resolve(x_traffic_class)
+            try:
+                async with self.traffic_lanes.lane(traffic_class):
+                    predicted_price = await run_in_threadpool(
+                        self._predict_with_onnx_model, request_data
+                    )
+            except LaneFullError as error:
+                raise HTTPException(
+                    status_code=429, detail=str(error), headers={"Retry-After": "1"}
+                )
+            except ValueError as error:
+                raise HTTPException(status_code=422, detail=str(error))
+
+            return {"predicted_price": predicted_price}
+
+        @self.app.post("/predict/onnx/batch")
+        @measure_execution_time
+        async def predict_batch_with_onnx(
+            request_data: List[ModelInferenceRequest],
+            x_traffic_class: str = Header(default=TrafficLanes.REALTIME),
+        ) -> dict:
+            """
+            Predict a batch of rows using the ONNX models stored in RedisAI.
 
-            input_data = self._prepare_input_data(request_data, model_group)
-            input_tensor_key = "float_input"
-            output_tensor_key = "variable"
-            self.redis_ai_client.set_tensor(input_tensor_key, input_data)
-            self.redis_ai_client.execute_model(
-                model_key, input_tensor_key, output_tensor_key
-            )
-            prediction_output = self.redis_ai_client.get_tensor(output_tensor_key)
+            The rows of each model group are sent to RedisAI as one tensor. The
+            batch takes a single slot of its traffic lane.
 
-            return {"predicted_price": float(prediction_output[0][0])}
+            Args:
+                request_data (List[ModelInferenceRequest]): The rows to predict, at
+                    most MAX_BATCH_ROWS.
+                x_traffic_class (str): The traffic class of the request.
+
+            Returns:
+                dict: The predicted prices, in the order of the rows.
+            """
+            if not 0 < len(request_data) <= self.MAX_BATCH_ROWS:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"A batch must have 1 to {self.MAX_BATCH_ROWS} rows",
+                )
+
+            traffic_class = self.traffic_lanes.resolve(x_traffic_class)
+            try:
+                async with self.traffic_lanes.lane(traffic_class):
+                    predicted_prices = await run_in_threadpool(
+                        self._predict_batch_with_onnx_model, request_data
+                    )
+            except LaneFullError as error:
+                raise HTTPException(
+                    status_code=429, detail=str(error), headers={"Retry-After": "1"}
+                )
+            except ValueError as error:
+                raise HTTPException(status_code=422, detail=str(error))
+
+            return {"predicted_prices": predicted_prices}
 
         @self.app.post("/predict/pickle")
         @measure_execution_time
         async def predict_with_pickle(request_data: ModelInferenceRequest) -> dict:
             """
-            Predict using a Pickle model.
+            Predict using a Pickle model, or its flattened NumPy version when the
+            'flat' backend is selected. The Pickle model is loaded from disk per
+            request unless it was preloaded.
 
             Args:
                 request_data (ModelInferenceRequest): The input data for prediction.
@@ -163,11 +506,17 @@ class InferenceAPI:
                 dict: The predicted price.
             """
             model_group = request_data.model_group
-            model_path = f"/ml/data/model_{model_group}.pkl"
 
-            # Load the Pickle model
-            with open(model_path, "rb") as model_file:
-                model = pickle.load(model_file)
+            if self.pickle_backend == "flat":
+                model = self._load_flat_forest(model_group)
+            elif model_group in self._pickle_models:
+                model = self._pickle_models[model_group]
+            else:
+                model_path = f"/ml/data/models/model_{model_group}.pkl"
+
+                # Load the Pickle model
+                with open(model_path, "rb") as model_file:
+                    model = pickle.load(model_file)
 
             input_data = self._prepare_input_data(request_data, model_group)
             prediction = model.predict(input_data)
@@ -182,4 +531,175 @@ class InferenceAPI:
             Returns:
                 dict: Health status.
             """
-            return {"status": "healthy"}
\ No newline at end of file
+            return {"status": "healthy"}
+
+        @self.app.get("/health/memory")
+        def memory_usage():
+            """
+            Memory usage of the worker serving the request.
+
+            Returns:
+                dict: The process ID and its RSS and PSS in kB.
+            """
+            return {"pid": os.getpid(), **read_memory_usage()}
+
+        @self.app.get("/health/lanes")
+        def lane_stats():
+            """
+            Running and queued requests per traffic lane.
+
+            Returns:
+                dict: Lane statistics.
+            """
+            return self.traffic_lanes.stats()
+
+    def _check_admin_token(self, token: Optional[str]):
+        """
+        Reject requests to the admin endpoints without the admin token.
+
+        Raises:
+            HTTPException: 404 if no admin token is configured, 401 if the token
+            is missing or wrong.
+        """
+        if not self.admin_token:
+            raise HTTPException(status_code=404, detail="Not Found")
+        if not token or not hmac.compare_digest(token, self.admin_token):
+            raise HTTPException(status_code=401, detail="Invalid admin token")
+
+    def _setup_profiling(self):
+        """
+        Define the profiling endpoints and, if enabled, the request sampling middleware.
+        """
+        if self.request_profiler is not None and self.request_profiler.enabled:
+
+            @self.app.middleware("http")
+            async def profile_requests(request: Request, call_next):
+                """
+                Trace 1 in K requests with the request profiler.
+                """
+                if request.url.path.startswith("/admin"):
+                    return await call_next(request)
+
+                sampler = self.request_profiler.start()
+                start_time = time.perf_counter()
+                try:
+                    return await call_next(request)
+                finally:
+                    if sampler is not None:
+                        self.request_profiler.finish(
+                            sampler,
+                            f"{request.method} {request.url.path}",
+                            time.perf_counter() - start_time,
+                        )
+
+        @self.app.get("/admin/profile")
+        async def profile_worker(
+            seconds: float = 10.0,
+            format: str = "collapsed",
+            interval_ms: float = 5.0,
+            include_idle: bool = False,
+            x_admin_token: Optional[str] = Header(default=None),
+        ):
+            """
+            Profile this worker for a number of seconds with the sampling profiler.
+
+            Args:
+                seconds (float): Profile duration, at most 60 seconds.
+                format (str): 'collapsed' (flamegraph.pl / speedscope text) or
+                    'speedscope' (speedscope JSON).
+                interval_ms (float): Milliseconds between samples, at least 1.
+                include_idle (bool): Whether to keep stacks of threads waiting for work.
+                x_admin_token (Optional[str]): The admin token.
+
+            Returns:
+                The profile in the requested format.
+            """
+            self._check_admin_token(x_admin_token)
+            if not 0 < seconds <= 60 or interval_ms < 1:
+                raise HTTPException(
+                    status_code=400, detail="seconds must be in (0, 60] and interval_ms >= 1"
+                )
+            if format not in ("collapsed", "speedscope"):
+                raise HTTPException(status_code=400, detail=f"Unknown format: {format}")
+
+            try:
+                sampler = self.worker_profiler.start(interval_ms / 1000, include_idle)
+            except ProfilerBusyError as error:
+                raise HTTPException(status_code=409, detail=str(error))
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                stacks = self.worker_profiler.stop(sampler)
+
+            if format == "speedscope":
+                return to_speedscope(stacks, f"worker profile ({seconds:g}s)", sampler.interval)
+            return PlainTextResponse(to_collapsed(stacks))
+
+        @self.app.get("/admin/profile/requests")
+        def profiled_requests(
+            format: str = "collapsed",
+            x_admin_token: Optional[str] = Header(default=None),
+        ) -> list:
+            """
+            The slowest of the requests traced by the request profiler.
+
+            Args:
+                format (str): Format of each trace's profile, 'collapsed' or 'speedscope'.
+                x_admin_token (Optional[str]): The admin token.
+
+            Returns:
+                list: Traces with the request, its duration and its profile, slowest first.
+            """
+            self._check_admin_token(x_admin_token)
+            if self.request_profiler is None or not self.request_profiler.enabled:
+                raise HTTPException(status_code=404, detail="Request profiling is disabled")
+            if format not in ("collapsed", "speedscope"):
+                raise HTTPException(status_code=400, detail=f"Unknown format: {format}")
+
+            traces = []
+            for trace in self.request_profiler.slowest():
+                stacks = trace["stacks"]
+                if format == "speedscope":
+                    profile = to_speedscope(
+                        stacks, trace["request"], self.request_profiler.interval
+                    )
+                else:
+                    profile = to_collapsed(stacks)
+                traces.append(
+                    {
+                        "request": trace["request"],
+                        "duration_ms": trace["duration_ms"],
+                        "finished_at": trace["finished_at"],
+                        "profile": profile,
+                    }
+                )
+            return traces
+
+    def _setup_tracing(self):
+        """
+        Record a span for every request that carries a 'traceparent' header.
+        """
+        if self.tracer is None or not self.tracer.enabled:
+            return
+
+        @self.app.middleware("http")
+        async def trace_requests(request: Request, call_next):
+            """
+            Record the request as a child span of the caller's trace context.
+            """
+            parent = TraceContext.from_traceparent(request.headers.get("traceparent"))
+            if parent is None:
+                return await call_next(request)
+
+            start = time.time()
+            response = await call_next(request)
+            self.tracer.record(
+                f"{request.method} {request.url.path}",
+                parent.child(),
+                parent,
+                start,
+                time.time(),
+                status=response.status_code,
+                traffic_class=request.headers.get("x-traffic-class"),
+            )
+            return response
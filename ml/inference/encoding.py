@@ -0,0 +1,38 @@
+"""
+Feature encoding for model inference.
+This module turns raw feature rows into the float32 input matrix expected by the
+models. It is shared by the inference API and by the batch processor's embedded
+inference mode so that both encode features identically.
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import OrdinalEncoder
+
+
+def encode_features(
+    input_df: pd.DataFrame,
+    encoder: OrdinalEncoder,
+    categorical_columns: list,
+    numerical_columns: list,
+) -> np.ndarray:
+    """
+    Encode the feature rows of a DataFrame into a model input matrix.
+
+    Args:
+        input_df (pd.DataFrame): The rows to encode.
+        encoder (OrdinalEncoder): The fitted encoder for the categorical columns.
+        categorical_columns (list): List of categorical column names.
+        numerical_columns (list): List of numerical column names.
+
+    Returns:
+        np.ndarray: The encoded input data, one row per input row, as float32.
+    """
+    encoded_categorical_data = encoder.transform(input_df[categorical_columns])
+
+    # Combine numerical and encoded categorical data
+    input_data = np.hstack(
+        [input_df[numerical_columns].values, encoded_categorical_data]
+    )
+
+    return input_data.astype(np.float32)
@@ -0,0 +1,155 @@
+"""
+Flattened Random Forest evaluator.
+This module defines a FlatForest that packs the trees of a trained sklearn
+RandomForestRegressor into contiguous NumPy node arrays (feature, threshold, left
+and right children, value) and predicts by walking all trees for all rows at once.
+Prediction needs only NumPy and avoids sklearn's per-call input validation and
+dispatch across the trees, which dominates the latency of single-row requests.
+"""
+
+import numpy as np
+
+
+class FlatForest:
+    """
+    A random forest regressor stored as packed node arrays.
+
+    Nodes of all trees are concatenated; 'roots' holds the index of each tree's
+    root node. Leaves point to themselves, so every row can take 'max_depth'
+    steps without checking whether it already reached a leaf.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+    ):
+        """
+        Initialize the FlatForest.
+
+        Args:
+            feature (np.ndarray): Feature index tested at each node (0 at leaves).
+            threshold (np.ndarray): Threshold of each node; rows with a feature
+                value <= threshold go left.
+            left (np.ndarray): Index of the left child of each node.
+            right (np.ndarray): Index of the right child of each node.
+            value (np.ndarray): Predicted value of each node.
+            roots (np.ndarray): Index of the root node of each tree.
+            max_depth (int): Depth of the deepest tree.
+        """
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+
+    @classmethod
+    def from_sklearn(cls, model) -> "FlatForest":
+        """
+        Flatten a trained single-output RandomForestRegressor.
+
+        Args:
+            model (RandomForestRegressor): The trained forest.
+
+        Returns:
+            FlatForest: The flattened forest.
+        """
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            values.append(tree.value[:, 0, 0])
+            roots.append(offset)
+
+            max_depth = max(max_depth, tree.max_depth)
+            offset += tree.node_count
+
+        return cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.int32),
+            right=np.concatenate(rights).astype(np.int32),
+            value=np.concatenate(values).astype(np.float64),
+            roots=np.array(roots, dtype=np.int32),
+            max_depth=max_depth,
+        )
+
+    def save(self, file_path: str):
+        """
+        Save the node arrays to an uncompressed .npz file.
+
+        Args:
+            file_path (str): Path to save the forest.
+        """
+        with open(file_path, "wb") as file:
+            np.savez(
+                file,
+                feature=self.feature,
+                threshold=self.threshold,
+                left=self.left,
+                right=self.right,
+                value=self.value,
+                roots=self.roots,
+                max_depth=np.array(self.max_depth),
+            )
+
+    @classmethod
+    def load(cls, file_path: str) -> "FlatForest":
+        """
+        Load a forest saved with 'save'.
+
+        Args:
+            file_path (str): Path to the .npz file.
+
+        Returns:
+            FlatForest: The loaded forest.
+        """
+        with np.load(file_path) as arrays:
+            return cls(
+                feature=arrays["feature"],
+                threshold=arrays["threshold"],
+                left=arrays["left"],
+                right=arrays["right"],
+                value=arrays["value"],
+                roots=arrays["roots"],
+                max_depth=int(arrays["max_depth"]),
+            )
+
+    def predict(self, input_data: np.ndarray) -> np.ndarray:
+        """
+        Predict the target of every row.
+
+        Like sklearn, features are compared as float32 against the float64 thresholds.
+
+        Args:
+            input_data (np.ndarray): The input rows, one column per feature.
+
+        Returns:
+            np.ndarray: The predictions, averaged over the trees.
+        """
+        input_data = np.asarray(input_data, dtype=np.float32)
+        rows = np.arange(len(input_data))[:, None]
+
+        # One current node per (row, tree)
+        nodes = np.broadcast_to(self.roots, (len(input_data), len(self.roots)))
+        for _ in range(self.max_depth):
+            goes_left = input_data[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(goes_left, self.left[nodes], self.right[nodes])
+
+        return self.value[nodes].mean(axis=1)
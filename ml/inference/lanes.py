@@ -0,0 +1,173 @@
+"""
+Traffic lanes for the inference service.
+This module provides admission control in front of RedisAI with one lane per
+traffic class. Real-time requests (the interface's /predict proxy) are always
+admitted first; batch requests (the batch processor) only get the capacity that
+real-time traffic leaves unused.
+"""
+
+from collections import deque
+from contextlib import asynccontextmanager
+import asyncio
+
+
+class LaneFullError(Exception):
+    """
+    Raised when the queue of a traffic lane is full.
+    """
+
+
+class TrafficLanes:
+    """
+    Per-traffic-class concurrency budgets and queues sharing one pool of RedisAI slots.
+    """
+
+    REALTIME = "realtime"
+    BATCH = "batch"
+
+    def __init__(
+        self,
+        total_concurrency: int = 8,
+        realtime_concurrency: int = 8,
+        batch_concurrency: int = 6,
+        realtime_queue_size: int = 100,
+        batch_queue_size: int = 50,
+    ):
+        """
+        Initialize the traffic lanes.
+
+        Args:
+            total_concurrency (int): Maximum number of requests running against RedisAI.
+            realtime_concurrency (int): Maximum number of running real-time requests.
+            batch_concurrency (int): Maximum number of running batch requests. Keep it
+                below the total so that real-time requests never wait for a slot.
+            realtime_queue_size (int): Maximum number of queued real-time requests.
+            batch_queue_size (int): Maximum number of queued batch requests.
+        """
+        self.total_concurrency = total_concurrency
+        self.budgets = {
+            self.REALTIME: realtime_concurrency,
+            self.BATCH: batch_concurrency,
+        }
+        self.queue_sizes = {
+            self.REALTIME: realtime_queue_size,
+            self.BATCH: batch_queue_size,
+        }
+        self._running = {self.REALTIME: 0, self.BATCH: 0}
+        self._waiters = {self.REALTIME: deque(), self.BATCH: deque()}
+
+    def resolve(self, traffic_class: str) -> str:
+        """
+        Map a requested traffic class to a lane. Unknown classes are treated as real-time.
+
+        Args:
+            traffic_class (str): The traffic class sent by the caller.
+
+        Returns:
+            str: The lane name.
+        """
+        traffic_class = (traffic_class or "").strip().lower()
+        return traffic_class if traffic_class in self.budgets else self.REALTIME
+
+    def _can_run(self, traffic_class: str) -> bool:
+        """
+        Check whether a request of the given class may start now.
+        """
+        total_running = sum(self._running.values())
+        return (
+            total_running < self.total_concurrency
+            and self._running[traffic_class] < self.budgets[traffic_class]
+        )
+
+    def _wake_waiters(self):
+        """
+        Hand free slots to queued requests, real-time first.
+        """
+        for traffic_class in (self.REALTIME, self.BATCH):
+            waiters = self._waiters[traffic_class]
+            while waiters and self._can_run(traffic_class):
+                waiter = waiters.popleft()
+                if waiter.done():
+                    continue
+                self._running[traffic_class] += 1
+                waiter.set_result(None)
+            if waiters:
+                # Lower-priority lanes wait while a higher-priority lane is queued
+                return
+
+    async def acquire(self, traffic_class: str):
+        """
+        Wait for a slot in the lane of the given traffic class.
+
+        Args:
+            traffic_class (str): The lane to acquire a slot in.
+
+        Raises:
+            LaneFullError: If the lane's queue is full.
+        """
+        higher_priority_waiting = (
+            traffic_class == self.BATCH and self._waiters[self.REALTIME]
+        )
+        if (
+            self._can_run(traffic_class)
+            and not self._waiters[traffic_class]
+            and not higher_priority_waiting
+        ):
+            self._running[traffic_class] += 1
+            return
+
+        waiters = self._waiters[traffic_class]
+        if len(waiters) >= self.queue_sizes[traffic_class]:
+            raise LaneFullError(f"The {traffic_class} queue is full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just before the cancellation
+                self.release(traffic_class)
+            elif waiter in waiters:
+                waiters.remove(waiter)
+            raise
+
+    def release(self, traffic_class: str):
+        """
+        Release a slot of the given traffic class.
+
+        Args:
+            traffic_class (str): The lane the slot belongs to.
+        """
+        self._running[traffic_class] -= 1
+        self._wake_waiters()
+
+    @asynccontextmanager
+    async def lane(self, traffic_class: str):
+        """
+        Async context manager holding a slot of the given traffic class.
+
+        Args:
+            traffic_class (str): The lane to acquire a slot in.
+        """
+        await self.acquire(traffic_class)
+        try:
+            yield
+        finally:
+            self.release(traffic_class)
+
+    def stats(self) -> dict:
+        """
+        Current number of running and queued requests per lane.
+
+        Returns:
+            dict: Running and queued counts per traffic class.
+        """
+        return {
+            traffic_class: {
+                "running": self._running[traffic_class],
+                "queued": len(self._waiters[traffic_class]),
+                "budget": self.budgets[traffic_class],
+            }
+            for traffic_class in self.budgets
+        }
@@ -1,4 +1,7 @@
 import os
+from typing import Optional
+
+from fastapi import FastAPI
 
 from ml.inference.app import InferenceAPI
 from ml.inference.const import (
@@ -7,8 +10,12 @@ from ml.inference.const import (
     Columns,
     ModelInferenceRequest,
 )
+from ml.inference.lanes import TrafficLanes
+from ml.inference.preload import PreloadedModels
+from ml.inference.profiler import RequestProfiler
 from ml.inference.redis_ai_client import RedisAIClient
 from ml.inference.redis_client import RedisClient
+from ml.inference.tracing import SpanExporter, Tracer
 
 
 def validate_column_configuration():
@@ -75,9 +82,46 @@ def initialize_redis_ai_client(host, port):
     return redis_ai_client
 
 
-def main() -> InferenceAPI:
+def initialize_traffic_lanes():
+    """
+    Creates the real-time and batch traffic lanes from environment variables.
+    Returns:
+        TrafficLanes: The configured traffic lanes.
+    """
+    return TrafficLanes(
+        total_concurrency=int(os.getenv("REDISAI_CONCURRENCY", "8")),
+        realtime_concurrency=int(os.getenv("REALTIME_CONCURRENCY", "8")),
+        batch_concurrency=int(os.getenv("BATCH_CONCURRENCY", "6")),
+        realtime_queue_size=int(os.getenv("REALTIME_QUEUE_SIZE", "100")),
+        batch_queue_size=int(os.getenv("BATCH_QUEUE_SIZE", "50")),
+    )
+
+
+def initialize_request_profiler():
+    """
+    Creates the request profiler from environment variables.
+    Returns:
+        RequestProfiler: The request profiler, disabled unless PROFILE_SAMPLE_RATE is set.
+    """
+    return RequestProfiler(
+        sample_rate=int(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+        keep_slowest=int(os.getenv("PROFILE_KEEP_SLOWEST", "10")),
+        interval=float(os.getenv("PROFILE_INTERVAL_MS", "1")) / 1000,
+    )
+
+
+def main(preloaded_models: Optional[PreloadedModels] = None) -> FastAPI:
     """
     Main entry point for the application. Initializes dependencies and starts the API.
+
+    Used as an application factory ('uvicorn --factory ml.inference.main:main'), and
+    called by every worker of the multi-worker mode (ml/inference/serve.py) after the
+    fork, so each worker opens its own Redis connection pools.
+    Args:
+        preloaded_models (Optional[PreloadedModels]): Models and encoders loaded once
+            before the workers were forked. Default is None.
+    Returns:
+        FastAPI: The application.
     """
     # Validate column configuration
     categorical_columns, numerical_columns = validate_column_configuration()
@@ -102,8 +146,11 @@ def main() -> InferenceAPI:
         redis_ai_client=redis_ai_client,
         categorical_columns=categorical_columns,
         numerical_columns=numerical_columns,
+        traffic_lanes=initialize_traffic_lanes(),
+        pickle_backend=os.getenv("PICKLE_BACKEND", "sklearn"),
+        admin_token=os.getenv("ADMIN_TOKEN"),
+        request_profiler=initialize_request_profiler(),
+        tracer=Tracer("ml", SpanExporter(os.getenv("TRACE_FILE"))),
+        preloaded_models=preloaded_models,
     )
     return inference_api.app
-
-
-app = main()
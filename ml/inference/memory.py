@@ -0,0 +1,54 @@
+"""
+Process memory usage.
+This module reads the resident (RSS) and proportional (PSS) set sizes of a process
+from /proc. PSS divides every shared page between the processes mapping it, so the
+PSS of the forked workers adds up to their real footprint, while their RSS counts
+the copy-on-write pages shared with the parent in every worker.
+"""
+
+from typing import Union
+
+# Fields of /proc/<pid>/smaps_rollup, in kB
+SMAPS_FIELDS = {
+    "Rss": "rss_kb",
+    "Pss": "pss_kb",
+    "Shared_Clean": "shared_clean_kb",
+    "Shared_Dirty": "shared_dirty_kb",
+    "Private_Clean": "private_clean_kb",
+    "Private_Dirty": "private_dirty_kb",
+}
+
+
+def read_memory_usage(pid: Union[int, str] = "self") -> dict:
+    """
+    Read the memory usage of a process.
+
+    Falls back to the RSS of /proc/<pid>/status when smaps_rollup is not
+    available (kernels before 4.14); the other fields are then missing.
+
+    Args:
+        pid (Union[int, str]): The process ID. Default is the current process.
+
+    Returns:
+        dict: The memory usage in kB, e.g. 'rss_kb' and 'pss_kb'. Empty if the
+        process does not exist.
+    """
+    usage = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as file:
+            for line in file:
+                name, _, value = line.partition(":")
+                if name in SMAPS_FIELDS:
+                    usage[SMAPS_FIELDS[name]] = int(value.split()[0])
+        return usage
+    except OSError:
+        pass
+
+    try:
+        with open(f"/proc/{pid}/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    usage["rss_kb"] = int(line.split()[1])
+    except OSError:
+        pass
+    return usage
@@ -0,0 +1,76 @@
+"""
+Preloaded model state for the multi-worker serving mode.
+This module defines PreloadedModels, which loads the pickled models, the flattened
+forests and the encoders of all model groups once, in the parent process. Forked
+workers then share these objects read-only through copy-on-write pages instead of
+each holding its own copy.
+"""
+
+import os
+import pickle
+
+from ml.inference.forest import FlatForest
+
+MODEL_GROUPS = ["A", "B", "C"]
+
+
+class PreloadedModels:
+    """
+    Models and encoders of all model groups, loaded once before the workers fork.
+    """
+
+    def __init__(self, pickle_models: dict, flat_forests: dict, encoders: dict):
+        """
+        Initialize the PreloadedModels.
+
+        Args:
+            pickle_models (dict): Model group -> RandomForestRegressor.
+            flat_forests (dict): Model group -> FlatForest.
+            encoders (dict): Model group -> OrdinalEncoder.
+        """
+        self.pickle_models = pickle_models
+        self.flat_forests = flat_forests
+        self.encoders = encoders
+
+    @classmethod
+    def load(
+        cls,
+        data_path: str = "/ml/data",
+        pickle_backend: str = "sklearn",
+        model_groups: list = MODEL_GROUPS,
+    ) -> "PreloadedModels":
+        """
+        Load the artifacts of the ETL.
+
+        Only the evaluator of the selected pickle backend is loaded; missing
+        artifacts are skipped and loaded by the workers on demand as before.
+
+        Args:
+            data_path (str): Directory of the ML artifacts. Default is '/ml/data'.
+            pickle_backend (str): 'sklearn' to load the pickled models or 'flat' to
+                load the flattened forests. Default is 'sklearn'.
+            model_groups (list): The model groups to load. Default is A, B and C.
+
+        Returns:
+            PreloadedModels: The loaded models and encoders.
+        """
+        pickle_models, flat_forests, encoders = {}, {}, {}
+        for model_group in model_groups:
+            model_path = f"{data_path}/models/model_{model_group}"
+            encoder_path = f"{data_path}/encoder/ordinal_encoder_{model_group}.pkl"
+
+            if pickle_backend == "flat" and os.path.exists(f"{model_path}.npz"):
+                flat_forests[model_group] = FlatForest.load(f"{model_path}.npz")
+            elif pickle_backend == "sklearn" and os.path.exists(f"{model_path}.pkl"):
+                with open(f"{model_path}.pkl", "rb") as model_file:
+                    pickle_models[model_group] = pickle.load(model_file)
+
+            if os.path.exists(encoder_path):
+                with open(encoder_path, "rb") as encoder_file:
+                    encoders[model_group] = pickle.load(encoder_file)
+
+        print(
+            f"Preloaded {len(pickle_models)} pickled models, {len(flat_forests)} flat "
+            f"forests and {len(encoders)} encoders from {data_path}"
+        )
+        return cls(pickle_models, flat_forests, encoders)
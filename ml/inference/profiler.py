@@ -0,0 +1,286 @@
+"""
+Sampling profiler for the inference service.
+This module provides a StackSampler that records the Python stacks of all threads
+of the worker at a fixed interval from a background thread (sys._current_frames),
+which costs the profiled code nothing between samples. Recorded stacks can be
+rendered as collapsed stacks (flamegraph.pl, speedscope) or as speedscope JSON.
+The RequestProfiler samples 1 in K requests and keeps the slowest of them.
+"""
+
+from collections import Counter
+from typing import Optional
+import os
+import sys
+import time
+import heapq
+import threading
+
+# Leaf frames of threads that wait for work; left out unless idle stacks are asked for
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+
+
+class ProfilerBusyError(Exception):
+    """
+    Raised when a profile is requested while another one is running.
+    """
+
+
+class StackSampler:
+    """
+    Records the stacks of all other threads every 'interval' seconds.
+
+    Each stack is a tuple of (function, file, line) frames from the thread's
+    entry point to the running function, with the thread name as the root.
+    """
+
+    def __init__(self, interval: float = 0.005, include_idle: bool = False):
+        """
+        Initialize the StackSampler.
+
+        Args:
+            interval (float): Seconds between samples. Default is 0.005.
+            include_idle (bool): Whether to keep stacks of threads waiting for work.
+                Default is False.
+        """
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks = Counter()
+        self.samples = 0
+        self.started_at = None
+        self.duration = 0.0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """
+        Start sampling in a daemon thread.
+        """
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._run, name="stack-sampler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        """
+        Stop sampling.
+
+        Returns:
+            Counter: Number of samples per stack.
+        """
+        self._stop_event.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+        return self.stacks
+
+    def _run(self):
+        own_thread_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread_id:
+                    continue
+                stack = self._walk(frame)
+                function_name, file_name, _ = stack[-1]
+                if not self.include_idle and (file_name, function_name) in IDLE_FRAMES:
+                    continue
+                thread_name = thread_names.get(thread_id, str(thread_id))
+                self.stacks[((thread_name, "", 0),) + stack] += 1
+            self.samples += 1
+
+    @staticmethod
+    def _walk(frame) -> tuple:
+        """
+        Collect the frames from the outermost call to 'frame'.
+        """
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append((code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+
+def _frame_name(frame: tuple) -> str:
+    name, file_name, line = frame
+    return f"{name} ({file_name}:{line})" if file_name else name
+
+
+def to_collapsed(stacks: Counter) -> str:
+    """
+    Render stacks in the collapsed format: 'root;caller;callee count' per line.
+
+    Args:
+        stacks (Counter): Number of samples per stack.
+
+    Returns:
+        str: The collapsed stacks.
+    """
+    lines = [
+        ";".join(_frame_name(frame) for frame in stack) + f" {count}"
+        for stack, count in stacks.most_common()
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def to_speedscope(stacks: Counter, name: str, interval: float) -> dict:
+    """
+    Render stacks as a speedscope 'sampled' profile, weighted in seconds.
+
+    Args:
+        stacks (Counter): Number of samples per stack.
+        name (str): Name of the profile.
+        interval (float): Seconds between samples.
+
+    Returns:
+        dict: The speedscope file contents.
+    """
+    frame_indexes = {}
+    samples, weights = [], []
+    for stack, count in stacks.most_common():
+        samples.append([frame_indexes.setdefault(frame, len(frame_indexes)) for frame in stack])
+        weights.append(count * interval)
+
+    frames = [
+        {"name": frame[0], "file": frame[1], "line": frame[2]} if frame[1] else {"name": frame[0]}
+        for frame in frame_indexes
+    ]
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "ml.inference.profiler",
+        "shared": {"frames": frames},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }
+        ],
+    }
+
+
+class RequestProfiler:
+    """
+    Profiles 1 in 'sample_rate' requests and keeps the 'keep_slowest' slowest traces.
+
+    Stacks are sampled process-wide while the request runs, so only one request
+    is traced at a time; requests arriving during a trace are not sampled.
+    """
+
+    def __init__(self, sample_rate: int, keep_slowest: int = 10, interval: float = 0.001):
+        """
+        Initialize the RequestProfiler.
+
+        Args:
+            sample_rate (int): Profile one request out of this many; 0 disables it.
+            keep_slowest (int): Number of traces kept. Default is 10.
+            interval (float): Seconds between samples of a trace. Default is 0.001.
+        """
+        self.sample_rate = sample_rate
+        self.keep_slowest = keep_slowest
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._active = False
+        self._traces = []  # Min-heap of (duration, sequence, trace)
+        self._sequence = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def start(self) -> Optional[StackSampler]:
+        """
+        Count a request and start a trace if it is sampled.
+
+        Returns:
+            Optional[StackSampler]: The running sampler, or None if the request is
+            not sampled.
+        """
+        with self._lock:
+            self._requests += 1
+            if self._active or self._requests % self.sample_rate:
+                return None
+            self._active = True
+
+        sampler = StackSampler(self.interval)
+        sampler.start()
+        return sampler
+
+    def finish(self, sampler: StackSampler, request_name: str, duration: float):
+        """
+        Stop a trace and keep it if it is among the slowest.
+
+        Args:
+            sampler (StackSampler): The sampler returned by 'start'.
+            request_name (str): Method and path of the request.
+            duration (float): Request duration in seconds.
+        """
+        stacks = sampler.stop()
+        trace = {
+            "request": request_name,
+            "duration_ms": round(duration * 1000, 3),
+            "finished_at": time.time(),
+            "stacks": stacks,
+        }
+        with self._lock:
+            self._active = False
+            self._sequence += 1
+            entry = (duration, self._sequence, trace)
+            if len(self._traces) < self.keep_slowest:
+                heapq.heappush(self._traces, entry)
+            else:
+                heapq.heappushpop(self._traces, entry)
+
+    def slowest(self) -> list:
+        """
+        The kept traces, slowest first.
+
+        Returns:
+            list: Traces with the request, its duration and its stacks.
+        """
+        with self._lock:
+            return [trace for _, _, trace in sorted(self._traces, reverse=True)]
+
+
+class WorkerProfiler:
+    """
+    On-demand profiles of the whole worker, one at a time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def start(self, interval: float, include_idle: bool) -> StackSampler:
+        """
+        Start a profile.
+
+        Raises:
+            ProfilerBusyError: If a profile is already running.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already running")
+        sampler = StackSampler(interval, include_idle)
+        sampler.start()
+        return sampler
+
+    def stop(self, sampler: StackSampler) -> Counter:
+        """
+        Stop a profile started with 'start'.
+        """
+        try:
+            return sampler.stop()
+        finally:
+            self._lock.release()
@@ -3,6 +3,8 @@ This module provides a client for interacting with RedisAI, a Redis module for e
 It includes methods for setting models, executing them, and handling tensors.
 """
 
+import hashlib
+
 import redis
 import numpy as np
 from redisai import Client
@@ -13,7 +15,13 @@ class RedisAIClient:
     A client for interacting with RedisAI to manage models and tensors.
     """
 
-    def __init__(self, host: str, port: int, max_connections: int = 10):
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        max_connections: int = 10,
+        data_path: str = "/ml/data",
+    ):
         """
         Initialize the RedisAIClient with connection details.
 
@@ -21,11 +29,13 @@ class RedisAIClient:
             host (str): The RedisAI server host.
             port (int): The RedisAI server port.
             max_connections (int): Maximum number of connections in the pool. Default is 10.
+            data_path (str): Directory of the ML artifacts. Default is '/ml/data'.
         """
         self.connection_pool = redis.ConnectionPool(
             host=host, port=port, max_connections=max_connections
         )
         self.client = Client(connection_pool=self.connection_pool)
+        self.data_path = data_path
 
     def is_server_alive(self) -> bool:
         """
@@ -45,26 +55,39 @@ class RedisAIClient:
         """
         Upload a model to RedisAI.
 
+        The SHA-256 digest of the model file is stored as the model's tag, and a
+        model whose tag differs from the file's digest is replaced, so a model
+        retrained by the ETL is served instead of the one already in RedisAI.
+
         Args:
             model_key (str): The key under which the model will be stored.
             model_path (str): The relative path to the model file.
             file_extension (str): The file extension of the model file (e.g., '.onnx').
         """
-        model_directory = "/ml/data/models/"
-
-        if not self.client.exists(model_key):
-            full_model_path = f"{model_directory}{model_path}{file_extension}"
-            with open(full_model_path, "rb") as model_file:
-                model_data = model_file.read()
-
-            self.client.modelset(
-                key=model_key,
-                backend="ONNX",
-                device="cpu",
-                data=model_data,
-                inputs=["float_input"],
-                outputs=["variable"],
-            )
+        model_directory = f"{self.data_path}/models/"
+
+        full_model_path = f"{model_directory}{model_path}{file_extension}"
+        with open(full_model_path, "rb") as model_file:
+            model_data = model_file.read()
+        digest = hashlib.sha256(model_data).hexdigest()
+
+        if self.client.exists(model_key):
+            tag = self.client.modelget(model_key, meta_only=True).get("tag")
+            if isinstance(tag, bytes):
+                tag = tag.decode()
+            if tag == digest:
+                return
+
+        self.client.modelset(
+            key=model_key,
+            backend="ONNX",
+            device="cpu",
+            data=model_data,
+            tag=digest,
+            inputs=["float_input"],
+            outputs=["variable"],
+        )
+        print(f"Stored model {model_key} in RedisAI (digest {digest[:12]})")
 
     def execute_model(
         self, model_key: str, input_tensor_key: str, output_tensor_key: str
@@ -106,3 +129,12 @@ class RedisAIClient:
             np.ndarray: The retrieved tensor data.
         """
         return self.client.tensorget(tensor_key)
+
+    def delete_tensors(self, *tensor_keys: str) -> None:
+        """
+        Delete tensors from RedisAI.
+
+        Args:
+            *tensor_keys (str): The keys of the tensors to delete.
+        """
+        self.client.delete(*tensor_keys)
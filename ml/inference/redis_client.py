@@ -1,28 +1,35 @@
 """
 RedisClient class for interacting with a Redis server.
-This class provides methods to store and retrieve serialized objects (e.g., encoders) in Redis.
+This class provides methods to store and retrieve serialized objects (e.g., encoders) in Redis,
+and to store encoder lookup tables as Redis hashes whose fields can be read with HMGET.
 It also includes a method to check the connectivity to the Redis server.
 """
 
-from typing import Any, Optional
+from typing import Any, List, Optional, Tuple
+import json
 import pickle
 import redis
 
+# Hash field holding the version of a lookup table
+LOOKUP_VERSION_FIELD = "__version__"
+
 
 class RedisClient:
     """
     A wrapper around the Redis client for simplified interaction.
     """
 
-    def __init__(self, host: str, port: int):
+    def __init__(self, host: str, port: int, data_path: str = "/ml/data"):
         """
         Initialize the Redis client.
 
         Args:
             host (str): The Redis server hostname or IP address.
             port (int): The Redis server port.
+            data_path (str): Directory of the ML artifacts. Default is '/ml/data'.
         """
         self.client = redis.Redis(host=host, port=port, db=0)
+        self.data_path = data_path
 
     def is_server_alive(self) -> bool:
         """
@@ -52,7 +59,7 @@ class RedisClient:
         Returns:
             Any: The deserialized object that was stored.
         """
-        file_path = f"/ml/data/encoder/{key}{file_extension}"
+        file_path = f"{self.data_path}/encoder/{key}{file_extension}"
 
         with open(file_path, "rb") as file:
             obj = pickle.load(file)
@@ -72,3 +79,87 @@ class RedisClient:
         """
         serialized_data = self.client.get(key)
         return pickle.loads(serialized_data) if serialized_data else None
+
+    def store_lookup_table(
+        self, key: str, file_extension: str = ".json", expiration_seconds: int = 86400
+    ) -> Optional[str]:
+        """
+        Store an encoder lookup table in Redis as a hash.
+
+        The hash has one field per '<column>:<category>' holding the category's code,
+        and a version field. It is replaced in a single transaction, so readers never
+        see a partially written table.
+
+        Args:
+            key (str): The key of the lookup table file and of the hash.
+            file_extension (str): The file extension of the lookup table file (default '.json').
+            expiration_seconds (int): The expiration time in seconds (default is 1 day).
+
+        Returns:
+            Optional[str]: The version of the stored table, or None if the lookup table
+            file does not exist.
+        """
+        file_path = f"{self.data_path}/encoder/{key}{file_extension}"
+
+        try:
+            with open(file_path) as file:
+                table = json.load(file)
+        except FileNotFoundError:
+            return None
+
+        mapping = {
+            f"{column}:{category}": code
+            for column, categories in table["columns"].items()
+            for category, code in categories.items()
+        }
+        mapping[LOOKUP_VERSION_FIELD] = table["version"]
+
+        hash_key = f"{key}:lookup"
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.delete(hash_key)
+        pipeline.hset(hash_key, mapping=mapping)
+        pipeline.expire(hash_key, expiration_seconds)
+        pipeline.execute()
+        return table["version"]
+
+    def read_lookup_table_version(
+        self, key: str, file_extension: str = ".json"
+    ) -> Optional[str]:
+        """
+        Read the version of an encoder lookup table file.
+
+        Args:
+            key (str): The key of the lookup table file.
+            file_extension (str): The file extension of the lookup table file (default '.json').
+
+        Returns:
+            Optional[str]: The version, or None if the lookup table file does not exist.
+        """
+        file_path = f"{self.data_path}/encoder/{key}{file_extension}"
+
+        try:
+            with open(file_path) as file:
+                return json.load(file)["version"]
+        except FileNotFoundError:
+            return None
+
+    def lookup_codes(
+        self, key: str, fields: List[str]
+    ) -> Tuple[List[Optional[int]], Optional[str]]:
+        """
+        Read codes and the version from an encoder lookup table with a single HMGET.
+
+        Args:
+            key (str): The key of the lookup table.
+            fields (List[str]): The '<column>:<category>' fields to read.
+
+        Returns:
+            Tuple[List[Optional[int]], Optional[str]]: The codes, None for unknown
+            categories, and the version of the table. The list is empty and the
+            version None if the lookup table is not in Redis.
+        """
+        values = self.client.hmget(f"{key}:lookup", fields + [LOOKUP_VERSION_FIELD])
+        if values[-1] is None:
+            return [], None
+        codes = [int(value) if value is not None else None for value in values[:-1]]
+        return codes, values[-1].decode()
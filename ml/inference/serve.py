@@ -0,0 +1,290 @@
+"""
+Multi-worker serving with preloaded, copy-on-write shared model state.
+This module runs the ML service as N forked uvicorn workers behind one listening
+socket. The parent process loads the models and encoders once (PreloadedModels),
+freezes the garbage collector so that collections in the workers do not write to
+the shared objects' pages, then forks the workers. Each worker builds its own
+InferenceAPI, with its own Redis connection pools, around the shared models.
+
+The parent restarts workers that exit, with an exponential backoff while they keep
+failing, forwards SIGTERM/SIGINT to them, and periodically prints the RSS and PSS of
+every worker.
+
+Usage:
+    python -m ml.inference.serve --workers 4 --port 5001
+"""
+
+import os
+import gc
+import sys
+import time
+import socket
+import signal
+import argparse
+
+import uvicorn
+
+from ml.inference.main import main
+from ml.inference.memory import read_memory_usage
+from ml.inference.preload import PreloadedModels
+
+# Signals that stop the server; the parent forwards them to the workers
+STOP_SIGNALS = {signal.SIGTERM, signal.SIGINT}
+
+
+class PreforkServer:
+    """
+    Forks and supervises the uvicorn workers.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        workers: int,
+        preloaded_models: PreloadedModels,
+        memory_report_interval: float = 60.0,
+        log_level: str = "info",
+        restart_delay: float = 1.0,
+        max_restart_delay: float = 60.0,
+        healthy_uptime: float = 30.0,
+    ):
+        """
+        Initialize the PreforkServer.
+
+        Args:
+            host (str): Address to listen on.
+            port (int): Port to listen on.
+            workers (int): Number of worker processes.
+            preloaded_models (PreloadedModels): Models shared with the workers.
+            memory_report_interval (float): Seconds between two memory reports;
+                0 disables them. Default is 60.
+            log_level (str): Log level of the uvicorn workers. Default is 'info'.
+            restart_delay (float): Seconds before restarting a worker that failed
+                once; doubled for every consecutive failure. Default is 1.
+            max_restart_delay (float): Upper bound of the restart delay. Default is 60.
+            healthy_uptime (float): Seconds a worker has to run before its exit no
+                longer counts as a failure and it is restarted right away. Default
+                is 30.
+        """
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.preloaded_models = preloaded_models
+        self.memory_report_interval = memory_report_interval
+        self.log_level = log_level
+        self.socket = None
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.healthy_uptime = healthy_uptime
+        self.processes = {}  # pid -> worker index
+        self._started_at = {}  # worker index -> start time
+        self._failures = {}  # worker index -> consecutive failures
+        self._restarts = {}  # worker index -> restart time
+        self._stopping = False
+
+    def _bind(self):
+        """
+        Create the listening socket shared by all workers.
+        """
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((self.host, self.port))
+        self.socket.listen(2048)
+        self.socket.set_inheritable(True)
+
+    def _spawn(self, index: int):
+        """
+        Fork a worker, unless the server is stopping. The child runs uvicorn on the
+        shared socket and never returns.
+
+        Args:
+            index (int): Index of the worker, used in log messages.
+        """
+        # Block the stop signals across the fork, so that the child cannot run the
+        # parent's handler before it restores the default handling
+        signal.pthread_sigmask(signal.SIG_BLOCK, STOP_SIGNALS)
+        if self._stopping:
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, STOP_SIGNALS)
+            return
+        pid = os.fork()
+        if pid:
+            signal.pthread_sigmask(signal.SIG_UNBLOCK, STOP_SIGNALS)
+            self.processes[pid] = index
+            self._started_at[index] = time.monotonic()
+            print(f"Started worker {index} (pid {pid})")
+            return
+
+        # Child: restore default signal handling, uvicorn installs its own
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, STOP_SIGNALS)
+        gc.enable()
+        exit_code = 0
+        try:
+            app = main(self.preloaded_models)
+            config = uvicorn.Config(app, log_level=self.log_level)
+            uvicorn.Server(config).run(sockets=[self.socket])
+        except BaseException as e:
+            print(f"Worker {index} (pid {os.getpid()}) failed: {e}")
+            exit_code = 1
+        finally:
+            sys.stdout.flush()
+            os._exit(exit_code)
+
+    def _schedule_restart(self, index: int, pid: int, status: int):
+        """
+        Schedule the restart of a worker that exited.
+
+        A worker that exits before running for 'healthy_uptime' seconds counts as
+        failing, and every consecutive failure doubles the delay before its restart,
+        up to 'max_restart_delay'. A worker that ran longer is restarted right away.
+
+        Args:
+            index (int): Index of the worker.
+            pid (int): Process id of the exited worker.
+            status (int): Exit status, as returned by os.waitpid.
+        """
+        uptime = time.monotonic() - self._started_at.pop(index)
+        failures = self._failures.get(index, 0) + 1 if uptime < self.healthy_uptime else 0
+        self._failures[index] = failures
+
+        delay = 0.0
+        if failures:
+            delay = min(self.max_restart_delay, self.restart_delay * 2 ** min(failures - 1, 30))
+        print(
+            f"Worker {index} (pid {pid}) exited with status {status} after "
+            f"{uptime:.1f}s, restarting in {delay:.1f}s"
+        )
+        self._restarts[index] = time.monotonic() + delay
+
+    def _stop(self, signum, frame):
+        """
+        Ask the workers to shut down gracefully.
+        """
+        self._stopping = True
+        self._restarts.clear()
+        for pid in list(self.processes):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def report_memory(self):
+        """
+        Print the RSS and PSS of the parent and of every worker.
+        """
+        lines, total_pss = [], 0
+        for label, pid in [("parent", os.getpid())] + [
+            (f"worker {index}", pid) for pid, index in sorted(self.processes.items(), key=lambda item: item[1])
+        ]:
+            usage = read_memory_usage(pid)
+            total_pss += usage.get("pss_kb", 0)
+            lines.append(
+                f"  {label:<10} pid {pid:<8} rss {usage.get('rss_kb', 0) / 1024:>8.1f} MiB"
+                f"  pss {usage.get('pss_kb', 0) / 1024:>8.1f} MiB"
+                f"  private {usage.get('private_dirty_kb', 0) / 1024:>8.1f} MiB"
+            )
+        print("Memory usage:\n" + "\n".join(lines) + f"\n  total pss {total_pss / 1024:.1f} MiB")
+
+    def run(self):
+        """
+        Bind the socket, fork the workers and supervise them until stopped.
+
+        The signal handlers are installed before the first fork, so a stop request
+        that arrives while the workers start is not lost.
+        """
+        self._bind()
+        print(f"Listening on {self.host}:{self.port} with {self.workers} workers")
+        for stop_signal in STOP_SIGNALS:
+            signal.signal(stop_signal, self._stop)
+
+        for index in range(self.workers):
+            self._spawn(index)
+
+        next_report = time.monotonic() + self.memory_report_interval
+        while self.processes or self._restarts:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG) if self.processes else (0, 0)
+            except ChildProcessError:
+                break
+
+            if pid:
+                index = self.processes.pop(pid, None)
+                if index is not None and not self._stopping:
+                    self._schedule_restart(index, pid, status)
+                continue
+
+            now = time.monotonic()
+            for index, restart_at in list(self._restarts.items()):
+                if now >= restart_at and self._restarts.pop(index, None) is not None:
+                    self._spawn(index)
+
+            if self.memory_report_interval and time.monotonic() >= next_report:
+                self.report_memory()
+                next_report = time.monotonic() + self.memory_report_interval
+            time.sleep(0.5)
+
+        self.socket.close()
+        print("All workers stopped")
+
+
+def serve(
+    host: str,
+    port: int,
+    workers: int,
+    data_path: str,
+    pickle_backend: str,
+    memory_report_interval: float,
+    log_level: str = "info",
+):
+    """
+    Preload the models, then fork and supervise the workers.
+
+    Garbage collection is disabled while loading and the loaded objects are moved to
+    the permanent generation with gc.freeze(), so the workers' collections never
+    touch them and their pages stay shared.
+
+    Args:
+        host (str): Address to listen on.
+        port (int): Port to listen on.
+        workers (int): Number of worker processes.
+        data_path (str): Directory of the ML artifacts.
+        pickle_backend (str): Evaluator preloaded for '/predict/pickle', 'sklearn' or 'flat'.
+        memory_report_interval (float): Seconds between two memory reports, 0 to disable.
+        log_level (str): Log level of the uvicorn workers. Default is 'info'.
+    """
+    gc.disable()
+    preloaded_models = PreloadedModels.load(data_path, pickle_backend)
+    gc.freeze()
+
+    server = PreforkServer(
+        host, port, workers, preloaded_models, memory_report_interval, log_level
+    )
+    server.run()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "5001")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("ML_WORKERS", os.cpu_count() or 1)))
+    parser.add_argument("--data-path", default=os.getenv("ML_DATA_PATH", "/ml/data"))
+    parser.add_argument(
+        "--memory-report-interval",
+        type=float,
+        default=float(os.getenv("MEMORY_REPORT_INTERVAL", "60")),
+        help="Seconds between two memory reports, 0 to disable",
+    )
+    parser.add_argument("--log-level", default=os.getenv("LOG_LEVEL", "info"))
+    args = parser.parse_args()
+
+    serve(
+        args.host,
+        args.port,
+        args.workers,
+        args.data_path,
+        os.getenv("PICKLE_BACKEND", "sklearn"),
+        args.memory_report_interval,
+        args.log_level,
+    )
@@ -0,0 +1,209 @@
+"""
+Trace context propagation and span export.
+This module carries a W3C trace context ('traceparent' header: version, trace ID,
+parent span ID, flags) across the interface, the RabbitMQ job messages, the batch
+processor and the ML service, and records the stages of a job as spans. Spans are
+appended as JSON lines to a collector file, one per service, so that the spans of a
+job can be joined on their trace ID (see benchmark/trace_report.py).
+It is shared by the ML service and the batch processor.
+"""
+
+from contextlib import contextmanager
+from typing import Optional
+import os
+import json
+import time
+import threading
+
+
+class TraceContext:
+    """
+    The trace ID and the ID of the current span.
+    """
+
+    def __init__(self, trace_id: str, span_id: str, sampled: bool = True):
+        """
+        Initialize the TraceContext.
+
+        Args:
+            trace_id (str): 32 hex characters shared by all spans of a trace.
+            span_id (str): 16 hex characters identifying the current span.
+            sampled (bool): Whether the trace is recorded. Default is True.
+        """
+        self.trace_id = trace_id
+        self.span_id = span_id
+        self.sampled = sampled
+
+    @classmethod
+    def new(cls) -> "TraceContext":
+        """
+        Start a new trace.
+        """
+        return cls(os.urandom(16).hex(), os.urandom(8).hex())
+
+    @classmethod
+    def from_traceparent(cls, header: Optional[str]) -> Optional["TraceContext"]:
+        """
+        Parse a 'traceparent' header.
+
+        Args:
+            header (Optional[str]): The header value, e.g.
+                '00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01'.
+
+        Returns:
+            Optional[TraceContext]: The trace context, or None if the header is
+            missing or invalid.
+        """
+        if isinstance(header, bytes):
+            header = header.decode(errors="replace")
+        parts = (header or "").strip().lower().split("-")
+        if len(parts) < 4 or len(parts[0]) != 2 or parts[0] == "ff":
+            return None
+        _, trace_id, span_id, flags = parts[:4]
+        if len(trace_id) != 32 or len(span_id) != 16 or len(flags) != 2:
+            return None
+        try:
+            trace_value, span_value, flag_value = (int(part, 16) for part in (trace_id, span_id, flags))
+        except ValueError:
+            return None
+        # All-zero IDs are invalid
+        if not trace_value or not span_value:
+            return None
+        return cls(trace_id, span_id, bool(flag_value & 1))
+
+    def child(self) -> "TraceContext":
+        """
+        A context for a new span under the current one.
+        """
+        return TraceContext(self.trace_id, os.urandom(8).hex(), self.sampled)
+
+    def traceparent(self) -> str:
+        """
+        The 'traceparent' header of the current span.
+        """
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def __repr__(self) -> str:
+        return f"TraceContext({self.traceparent()})"
+
+
+class SpanExporter:
+    """
+    Appends finished spans as JSON lines to a collector file.
+    """
+
+    def __init__(self, file_path: Optional[str]):
+        """
+        Initialize the SpanExporter.
+
+        Args:
+            file_path (Optional[str]): Path of the JSONL collector file. When None or
+                empty, spans are dropped.
+        """
+        self.file_path = file_path or None
+        self._lock = threading.Lock()
+        if self.file_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.file_path)), exist_ok=True)
+
+    def export(self, span: dict):
+        """
+        Write one span. Errors are printed and the span is dropped.
+
+        Args:
+            span (dict): The span.
+        """
+        if not self.file_path:
+            return
+        line = json.dumps(span, default=str) + "\n"
+        try:
+            with self._lock, open(self.file_path, "a") as file:
+                file.write(line)
+        except OSError as e:
+            print(f"Failed to export span {span.get('name')}: {e}")
+
+
+class Tracer:
+    """
+    Records spans of one service under propagated trace contexts.
+    """
+
+    def __init__(self, service: str, exporter: Optional[SpanExporter] = None):
+        """
+        Initialize the Tracer.
+
+        Args:
+            service (str): Name of the service recorded on its spans.
+            exporter (Optional[SpanExporter]): Destination of the spans. Default is
+                None (spans are dropped).
+        """
+        self.service = service
+        self.exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None and self.exporter.file_path is not None
+
+    def record(
+        self,
+        name: str,
+        context: Optional[TraceContext],
+        parent: Optional[TraceContext],
+        start: float,
+        end: float,
+        **attributes,
+    ):
+        """
+        Export a span whose start and end were measured elsewhere.
+
+        Args:
+            name (str): Name of the span, e.g. 'queue_wait'.
+            context (Optional[TraceContext]): Context of the span itself. Nothing is
+                recorded when it is None or not sampled.
+            parent (Optional[TraceContext]): Context of the parent span, if any.
+            start (float): Start time, seconds since the epoch.
+            end (float): End time, seconds since the epoch.
+            **attributes: Attributes of the span.
+        """
+        if not self.enabled or context is None or not context.sampled:
+            return
+        self.exporter.export(
+            {
+                "trace_id": context.trace_id,
+                "span_id": context.span_id,
+                "parent_id": parent.span_id if parent else None,
+                "name": name,
+                "service": self.service,
+                "start": round(start, 6),
+                "end": round(end, 6),
+                "duration_ms": round((end - start) * 1000, 3),
+                "attributes": attributes,
+            }
+        )
+
+    @contextmanager
+    def span(self, name: str, parent: Optional[TraceContext], **attributes):
+        """
+        Context manager recording a span under 'parent'.
+
+        Yields the context of the new span, to propagate to child spans and outgoing
+        requests, or None if 'parent' is None. Exceptions are recorded in the
+        'error' attribute and re-raised.
+
+        Args:
+            name (str): Name of the span.
+            parent (Optional[TraceContext]): Context of the parent span.
+            **attributes: Attributes of the span.
+        """
+        if parent is None:
+            yield None
+            return
+
+        context = parent.child()
+        start = time.time()
+        try:
+            yield context
+        except BaseException as e:
+            attributes["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.record(name, context, parent, start, time.time(), **attributes)
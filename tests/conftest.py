@@ -0,0 +1,10 @@
+"""
+Test configuration: makes the ml package and the batch modules, which import each
+other by module name, importable without installing them.
+"""
+
+import os
+import sys
+
+REPOSITORY = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path[:0] = [REPOSITORY, os.path.join(REPOSITORY, "batch")]
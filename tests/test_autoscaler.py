@@ -0,0 +1,68 @@
+"""
+Tests for the ScalingPolicy of the batch autoscaler.
+"""
+
+from autoscaler import ScalingPolicy
+
+
+def make_policy(**overrides) -> ScalingPolicy:
+    settings = {
+        "min_workers": 1,
+        "max_workers": 4,
+        "messages_per_worker": 5,
+        "scale_down_ratio": 0.5,
+        "max_backlog_age": 60.0,
+        "scale_up_cooldown": 10.0,
+        "scale_down_delay": 120.0,
+    }
+    settings.update(overrides)
+    return ScalingPolicy(**settings)
+
+
+def test_scales_up_to_the_backlog_within_bounds():
+    policy = make_policy()
+
+    assert policy.desired_workers(current=1, depth=12, backlog_age=0.0, now=0.0) == 3
+    assert policy.desired_workers(current=3, depth=100, backlog_age=0.0, now=20.0) == 4
+
+
+def test_scale_ups_respect_the_cooldown():
+    policy = make_policy()
+    assert policy.desired_workers(current=1, depth=12, backlog_age=0.0, now=0.0) == 3
+
+    assert policy.desired_workers(current=3, depth=20, backlog_age=0.0, now=5.0) == 3
+    assert policy.desired_workers(current=3, depth=20, backlog_age=0.0, now=10.0) == 4
+
+
+def test_old_backlog_adds_a_worker_regardless_of_depth():
+    policy = make_policy()
+
+    assert policy.desired_workers(current=1, depth=1, backlog_age=30.0, now=0.0) == 1
+    assert policy.desired_workers(current=1, depth=1, backlog_age=61.0, now=1.0) == 2
+
+
+def test_scales_down_one_worker_per_delay():
+    policy = make_policy()
+
+    assert policy.desired_workers(current=4, depth=0, backlog_age=0.0, now=100.0) == 4
+    assert policy.desired_workers(current=4, depth=0, backlog_age=0.0, now=219.0) == 4
+    assert policy.desired_workers(current=4, depth=0, backlog_age=0.0, now=220.0) == 3
+    assert policy.desired_workers(current=3, depth=0, backlog_age=0.0, now=221.0) == 3
+    assert policy.desired_workers(current=3, depth=0, backlog_age=0.0, now=340.0) == 2
+
+
+def test_a_burst_restarts_the_scale_down_delay():
+    policy = make_policy()
+    policy.desired_workers(current=2, depth=0, backlog_age=0.0, now=0.0)
+
+    # Between the two thresholds: neither up nor down, but no longer low
+    assert policy.desired_workers(current=2, depth=8, backlog_age=0.0, now=60.0) == 2
+    assert policy.desired_workers(current=2, depth=0, backlog_age=0.0, now=121.0) == 2
+    assert policy.desired_workers(current=2, depth=0, backlog_age=0.0, now=241.0) == 1
+
+
+def test_never_scales_below_the_minimum():
+    policy = make_policy(min_workers=2, scale_down_delay=0.0)
+
+    assert policy.desired_workers(current=2, depth=0, backlog_age=0.0, now=0.0) == 2
+    assert policy.desired_workers(current=2, depth=0, backlog_age=0.0, now=10.0) == 2
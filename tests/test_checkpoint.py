@@ -0,0 +1,103 @@
+"""
+Tests for the checkpoint sidecar of batch jobs and the per-file lock.
+"""
+
+import hashlib
+import json
+import threading
+
+import numpy as np
+
+from checkpoint import Checkpoint, compute_file_digest, lock_file
+
+
+def test_new_checkpoint_writes_a_header(tmp_path):
+    checkpoint = Checkpoint.load(str(tmp_path), "a.xlsx", "key.xlsx", 10)
+
+    records = (tmp_path / ".a.xlsx.checkpoint").read_text().splitlines()
+    assert [json.loads(record) for record in records] == [
+        {"job_key": "key.xlsx", "chunk_size": 10}
+    ]
+    assert checkpoint.get_chunk(0) is None
+
+
+def test_saved_chunks_are_resumed(tmp_path):
+    checkpoint = Checkpoint.load(str(tmp_path), "a.xlsx", "key.xlsx", 2)
+    checkpoint.save_chunk(0, np.array([1.5, 2.5]))
+    checkpoint.save_chunk(1, np.array([3.5, 4.5]))
+
+    resumed = Checkpoint.load(str(tmp_path), "a.xlsx", "key.xlsx", 2)
+
+    np.testing.assert_array_equal(resumed.get_chunk(0), [1.5, 2.5])
+    np.testing.assert_array_equal(resumed.get_chunk(1), [3.5, 4.5])
+
+
+def test_progress_of_another_file_version_or_chunk_size_is_discarded(tmp_path):
+    checkpoint = Checkpoint.load(str(tmp_path), "a.xlsx", "old.xlsx", 2)
+    checkpoint.save_chunk(0, np.array([1.0, 2.0]))
+
+    assert Checkpoint.load(str(tmp_path), "a.xlsx", "new.xlsx", 2).get_chunk(0) is None
+
+    checkpoint = Checkpoint.load(str(tmp_path), "a.xlsx", "new.xlsx", 2)
+    checkpoint.save_chunk(0, np.array([1.0, 2.0]))
+    assert Checkpoint.load(str(tmp_path), "a.xlsx", "new.xlsx", 3).get_chunk(0) is None
+
+
+def test_chunks_with_failed_rows_are_not_resumed(tmp_path):
+    checkpoint = Checkpoint.load(str(tmp_path), "a.xlsx", "key.xlsx", 2)
+    checkpoint._append({"chunk": 0, "predictions": [1.0, float("nan")]})
+
+    assert Checkpoint.load(str(tmp_path), "a.xlsx", "key.xlsx", 2).get_chunk(0) is None
+
+
+def test_partially_written_last_record_is_ignored(tmp_path):
+    checkpoint = Checkpoint.load(str(tmp_path), "a.xlsx", "key.xlsx", 2)
+    checkpoint.save_chunk(0, np.array([1.0, 2.0]))
+    with open(tmp_path / ".a.xlsx.checkpoint", "a") as file:
+        file.write('{"chunk": 1, "predictions": [3.0')
+
+    resumed = Checkpoint.load(str(tmp_path), "a.xlsx", "key.xlsx", 2)
+
+    np.testing.assert_array_equal(resumed.get_chunk(0), [1.0, 2.0])
+    assert resumed.get_chunk(1) is None
+
+
+def test_remove_deletes_the_sidecar(tmp_path):
+    checkpoint = Checkpoint.load(str(tmp_path), "a.xlsx", "key.xlsx", 2)
+
+    checkpoint.remove()
+    checkpoint.remove()
+
+    assert not (tmp_path / ".a.xlsx.checkpoint").exists()
+
+
+def test_lock_file_serializes_holders(tmp_path):
+    file_path = tmp_path / "a.xlsx"
+    file_path.write_bytes(b"data")
+    acquired = threading.Event()
+
+    def second_holder():
+        with lock_file(str(file_path)):
+            acquired.set()
+
+    with lock_file(str(file_path)):
+        thread = threading.Thread(target=second_holder)
+        thread.start()
+        assert not acquired.wait(0.1)
+
+    assert acquired.wait(1.0)
+    thread.join()
+
+
+def test_lock_file_ignores_missing_files(tmp_path):
+    with lock_file(str(tmp_path / "missing.xlsx")):
+        pass
+
+
+def test_compute_file_digest(tmp_path):
+    file_path = tmp_path / "a.xlsx"
+    file_path.write_bytes(b"x" * 10_000)
+
+    digest = compute_file_digest(str(file_path), block_size=1024)
+
+    assert digest == hashlib.sha256(b"x" * 10_000).hexdigest()
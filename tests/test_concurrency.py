@@ -0,0 +1,75 @@
+"""
+Tests for the AIMD window of the AdaptiveConcurrencyLimiter.
+"""
+
+import threading
+import time
+
+from concurrency import AdaptiveConcurrencyLimiter
+
+
+def test_window_grows_by_one_per_window_of_healthy_responses():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1, max_limit=3)
+
+    limiter.release(limiter.acquire(), overloaded=False)
+    assert limiter.limit == 2
+
+    limiter.release(limiter.acquire(), overloaded=False)
+    assert limiter.limit == 2
+    limiter.release(limiter.acquire(), overloaded=False)
+    assert limiter.limit == 3
+
+    for _ in range(3):
+        limiter.release(limiter.acquire(), overloaded=False)
+    assert limiter.limit == 3
+
+
+def test_overload_halves_the_window_once_per_round():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+    admitted = [limiter.acquire() for _ in range(3)]
+
+    limiter.release(admitted[0], overloaded=True)
+    assert limiter.limit == 4
+
+    # Sent with the old window, before the cut
+    limiter.release(time.time() - 1.0, overloaded=True)
+    assert limiter.limit == 4
+
+    limiter.release(limiter.acquire(), overloaded=True)
+    assert limiter.limit == 2
+
+
+def test_window_never_drops_below_the_minimum():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, min_limit=2)
+
+    limiter.release(limiter.acquire(), overloaded=True)
+
+    assert limiter.limit == 2
+
+
+def test_latency_spike_cuts_the_window():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, latency_threshold=0.5)
+    for _ in range(4):
+        limiter.acquire()
+    slow_admission = time.time() - 1.0
+
+    for _ in range(4):
+        limiter.release(slow_admission, overloaded=False)
+
+    assert limiter.limit == 2
+    assert limiter.p95_latency() == 0.0
+
+
+def test_acquire_blocks_while_the_window_is_full():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+    admitted_at = limiter.acquire()
+    admitted = threading.Event()
+
+    thread = threading.Thread(target=lambda: (limiter.acquire(), admitted.set()))
+    thread.start()
+    assert not admitted.wait(0.1)
+
+    limiter.release(admitted_at, overloaded=False)
+    assert admitted.wait(1.0)
+    thread.join()
+    assert limiter.in_flight == 1
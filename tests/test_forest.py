@@ -0,0 +1,79 @@
+"""
+Tests for the FlatForest evaluator against the sklearn forest it is flattened from.
+A small forest is trained on synthetic data, so no ETL run is needed.
+"""
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+
+from ml.inference.forest import FlatForest
+
+
+@pytest.fixture(scope="module")
+def model_and_rows():
+    rng = np.random.default_rng(0)
+    rows = rng.normal(size=(400, 5)).astype(np.float32)
+    # An ordinal-encoded categorical feature, like the ETL's encoder output
+    rows[:, 4] = rng.integers(0, 6, size=len(rows))
+    target = 3 * rows[:, 0] + np.sin(rows[:, 1]) + rows[:, 4] ** 2
+    target += rng.normal(scale=0.1, size=len(rows))
+
+    # Unbounded depth, so the trees have leaves at many different depths
+    model = RandomForestRegressor(n_estimators=20, random_state=0)
+    model.fit(rows, target)
+    return model, rows
+
+
+def test_predictions_match_sklearn_on_training_rows(model_and_rows):
+    model, rows = model_and_rows
+    forest = FlatForest.from_sklearn(model)
+
+    np.testing.assert_allclose(forest.predict(rows), model.predict(rows), rtol=1e-6, atol=1e-6)
+
+
+def test_predictions_match_sklearn_on_unseen_rows(model_and_rows):
+    model, _ = model_and_rows
+    forest = FlatForest.from_sklearn(model)
+    rows = np.random.default_rng(1).normal(scale=2.0, size=(200, 5)).astype(np.float32)
+
+    np.testing.assert_allclose(forest.predict(rows), model.predict(rows), rtol=1e-6, atol=1e-6)
+
+
+def test_rows_on_a_threshold_go_left_like_sklearn(model_and_rows):
+    model, rows = model_and_rows
+    forest = FlatForest.from_sklearn(model)
+    is_split = forest.left != np.arange(len(forest.left))
+
+    # Place the tested feature of every row exactly on a split threshold
+    split_nodes = np.flatnonzero(is_split)[: len(rows)]
+    on_threshold = rows[: len(split_nodes)].copy()
+    on_threshold[np.arange(len(split_nodes)), forest.feature[split_nodes]] = (
+        forest.threshold[split_nodes]
+    )
+
+    np.testing.assert_allclose(
+        forest.predict(on_threshold), model.predict(on_threshold), rtol=1e-6, atol=1e-6
+    )
+
+
+def test_single_row(model_and_rows):
+    model, rows = model_and_rows
+    forest = FlatForest.from_sklearn(model)
+
+    prediction = forest.predict(rows[:1])
+
+    assert prediction.shape == (1,)
+    assert prediction[0] == pytest.approx(model.predict(rows[:1])[0], rel=1e-6)
+
+
+def test_save_and_load_round_trip(model_and_rows, tmp_path):
+    model, rows = model_and_rows
+    forest = FlatForest.from_sklearn(model)
+    file_path = tmp_path / "model.npz"
+
+    forest.save(str(file_path))
+    loaded = FlatForest.load(str(file_path))
+
+    assert loaded.max_depth == forest.max_depth
+    np.testing.assert_array_equal(loaded.predict(rows), forest.predict(rows))
@@ -0,0 +1,64 @@
+"""
+Tests for parsing batch jobs from RabbitMQ messages.
+"""
+
+import json
+
+import pytest
+
+from job import Job
+
+
+def test_parses_json_metadata():
+    body = json.dumps(
+        {
+            "filename": "cars.xlsx",
+            "file_size": 2048,
+            "row_estimate": 100,
+            "output_format": "CSV",
+            "priority": 7,
+        }
+    ).encode()
+
+    job = Job.from_message(body)
+
+    assert job.filename == "cars.xlsx"
+    assert job.file_size == 2048
+    assert job.row_estimate == 100
+    assert job.output_format == "csv"
+    assert job.priority == 7
+
+
+def test_missing_fields_get_defaults():
+    job = Job.from_message(b'{"filename": "cars.xlsx", "file_size": null}')
+
+    assert (job.file_size, job.row_estimate, job.output_format, job.priority) == (
+        0,
+        0,
+        "xlsx",
+        0,
+    )
+
+
+def test_accepts_a_bare_file_name():
+    job = Job.from_message(b"  cars.xlsx\n")
+
+    assert job.filename == "cars.xlsx"
+    assert job.output_format == "xlsx"
+
+
+def test_file_name_is_stripped_of_directories():
+    job = Job.from_message(b'{"filename": "../../etc/passwd"}')
+
+    assert job.filename == "passwd"
+
+
+@pytest.mark.parametrize("body", [b'{"filename": ""}', b'{"file_size": 10}', b"   "])
+def test_missing_file_name_raises(body):
+    with pytest.raises(ValueError, match="filename"):
+        Job.from_message(body)
+
+
+def test_unknown_output_format_raises():
+    with pytest.raises(ValueError, match="Unknown output format"):
+        Job.from_message(b'{"filename": "cars.xlsx", "output_format": "pdf"}')
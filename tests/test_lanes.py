@@ -0,0 +1,95 @@
+"""
+Tests for the TrafficLanes admission control of the inference service.
+"""
+
+import asyncio
+
+import pytest
+
+from ml.inference.lanes import LaneFullError, TrafficLanes
+
+
+def test_resolve_maps_unknown_classes_to_realtime():
+    lanes = TrafficLanes()
+
+    assert lanes.resolve(" Batch ") == TrafficLanes.BATCH
+    assert lanes.resolve("realtime") == TrafficLanes.REALTIME
+    assert lanes.resolve("bulk") == TrafficLanes.REALTIME
+    assert lanes.resolve(None) == TrafficLanes.REALTIME
+
+
+def test_batch_requests_are_limited_to_their_budget():
+    async def scenario():
+        lanes = TrafficLanes(total_concurrency=4, batch_concurrency=2)
+        await lanes.acquire(TrafficLanes.BATCH)
+        await lanes.acquire(TrafficLanes.BATCH)
+
+        waiter = asyncio.ensure_future(lanes.acquire(TrafficLanes.BATCH))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+
+        # The slots left over are still available to real-time requests
+        await lanes.acquire(TrafficLanes.REALTIME)
+        assert lanes.stats()[TrafficLanes.BATCH] == {"running": 2, "queued": 1, "budget": 2}
+
+        lanes.release(TrafficLanes.BATCH)
+        await asyncio.wait_for(waiter, 1)
+        assert lanes.stats()[TrafficLanes.BATCH]["running"] == 2
+
+    asyncio.run(scenario())
+
+
+def test_queued_realtime_requests_are_admitted_before_batch():
+    async def scenario():
+        lanes = TrafficLanes(total_concurrency=1, realtime_concurrency=1, batch_concurrency=1)
+        await lanes.acquire(TrafficLanes.BATCH)
+
+        admitted = []
+
+        async def request(traffic_class):
+            async with lanes.lane(traffic_class):
+                admitted.append(traffic_class)
+
+        batch = asyncio.ensure_future(request(TrafficLanes.BATCH))
+        await asyncio.sleep(0)
+        realtime = asyncio.ensure_future(request(TrafficLanes.REALTIME))
+        await asyncio.sleep(0)
+
+        lanes.release(TrafficLanes.BATCH)
+        await asyncio.wait_for(asyncio.gather(batch, realtime), 1)
+
+        assert admitted == [TrafficLanes.REALTIME, TrafficLanes.BATCH]
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_raises():
+    async def scenario():
+        lanes = TrafficLanes(total_concurrency=1, batch_concurrency=1, batch_queue_size=1)
+        await lanes.acquire(TrafficLanes.BATCH)
+        waiter = asyncio.ensure_future(lanes.acquire(TrafficLanes.BATCH))
+        await asyncio.sleep(0)
+
+        with pytest.raises(LaneFullError):
+            await lanes.acquire(TrafficLanes.BATCH)
+        waiter.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        lanes = TrafficLanes(total_concurrency=1)
+        await lanes.acquire(TrafficLanes.REALTIME)
+        waiter = asyncio.ensure_future(lanes.acquire(TrafficLanes.REALTIME))
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        assert lanes.stats()[TrafficLanes.REALTIME]["queued"] == 0
+        lanes.release(TrafficLanes.REALTIME)
+        assert lanes.stats()[TrafficLanes.REALTIME]["running"] == 0
+
+    asyncio.run(scenario())